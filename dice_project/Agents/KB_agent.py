@@ -1,13 +1,176 @@
+import json
+import os
+from typing import Dict, Iterator, List
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-API_URL = "http://localhost:8000/chatbot"
+from utils import llm_gateway, metrics
+from utils.lazy import LazyResource, registry
 
-def run_kb_agent(question: str):
-    try:
-        response = requests.post(API_URL, json={"query": question})
+# -----------------------------
+# Configuration
+# -----------------------------
+# "remote" POSTs to the KB API, "local" runs the QA pipeline in this process;
+# "auto" is local inside the API process (use_pipeline) and remote elsewhere
+KB_BACKEND = os.getenv("KB_BACKEND", "auto")
+API_URL = os.getenv("KB_API_URL", "http://localhost:8000/chatbot")
+KB_CONNECT_TIMEOUT_S = float(os.getenv("KB_CONNECT_TIMEOUT_S", "3"))
+# Covers the API's embed + search + LLM answer, or the gap between streamed tokens
+KB_READ_TIMEOUT_S = float(os.getenv("KB_READ_TIMEOUT_S", "60"))
+# Retries on connection errors and 502/503/504 (503 is the API's overload answer)
+KB_MAX_RETRIES = int(os.getenv("KB_MAX_RETRIES", "2"))
+KB_POOL_SIZE = int(os.getenv("KB_POOL_SIZE", "16"))
+ANSWER_MODEL = "llama-3.3-70b-versatile"
+
+
+def _answer(text: str, sources: List[Dict], backend: str) -> Dict:
+    # Failures stay {"error": str}, which the graph treats as "not answered"
+    return {"answer": text, "sources": sources or [], "backend": backend}
+
+
+# -----------------------------
+# Remote backend (KB API over HTTP)
+# -----------------------------
+def _session() -> requests.Session:
+    # /chatbot only reads, so POSTs are safe to retry; read timeouts are not
+    # retried (the answer is already being generated)
+    retry = Retry(
+        total=KB_MAX_RETRIES,
+        connect=KB_MAX_RETRIES,
+        read=0,
+        status=KB_MAX_RETRIES,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"POST"}),
+        backoff_factor=0.3,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=KB_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Keep-alive connections shared by every graph thread (batch questions, speculative branches)
+session = _session()
+TIMEOUT = (KB_CONNECT_TIMEOUT_S, KB_READ_TIMEOUT_S)
+
+
+def _run_remote(question: str) -> Dict:
+    with metrics.span("kb.http"):
+        response = session.post(API_URL, json={"query": question}, timeout=TIMEOUT)
+        response.raise_for_status()
+    # The API's embed / search / llm timings, shown under kb.* in the request trace
+    metrics.add_remote_spans("kb", metrics.parse_server_timing(response.headers.get("Server-Timing")))
+    body = response.json()
+    return _answer(body.get("results", "No results found"), body.get("sources"), "remote")
+
+
+def _stream_remote(question: str) -> Iterator[Dict]:
+    with metrics.span("kb.http"), \
+            session.post(API_URL, json={"query": question, "stream": True}, stream=True,
+                         timeout=TIMEOUT) as response:
         response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event["type"] == "error":
+                yield {"type": "done", "answer": {"error": f"Error contacting KB API: {event['error']}"}}
+                return
+            if event["type"] == "done":
+                metrics.add_remote_spans("kb", event.get("timings", {}))
+                yield {"type": "done",
+                       "answer": _answer(event.get("results", "No results found"), event.get("sources"), "remote")}
+                return
+            yield event
+
+
+# -----------------------------
+# Local backend (QA pipeline in this process)
+# -----------------------------
+def _load_pipeline():
+    from utils.qa_pipeline import QAPipeline
+    from utils.vector_store import get_vectorstore
+    from .embeddings import SentenceEmbeddings
+
+    # Same model as the routing / answer-cache embeddings, so no second copy is loaded
+    embeddings = SentenceEmbeddings()
+    return QAPipeline(
+        llm=llm_gateway.chat_model(model=ANSWER_MODEL, temperature=0.7),
+        embeddings=embeddings,
+        vectorstore=get_vectorstore(embeddings),
+    )
+
+
+kb_pipeline = LazyResource("kb_pipeline", _load_pipeline)
+_co_located = False
+
+
+def use_pipeline(resource: LazyResource) -> None:
+    """Answer from an existing pipeline (the KB API's own) instead of building a second one."""
+    global kb_pipeline, _co_located
+    registry.pop(kb_pipeline.name, None)
+    kb_pipeline = resource
+    _co_located = True
+
+
+def backend() -> str:
+    if KB_BACKEND == "auto":
+        return "local" if _co_located else "remote"
+    return KB_BACKEND
+
+
+def _run_local(question: str) -> Dict:
+    from utils.qa_pipeline import source_chunks
+    with metrics.span("kb.local"):
+        result, timings = kb_pipeline.get().invoke(question)
+    metrics.add_remote_spans("kb", timings, remote=False)
+    return _answer(result["result"], source_chunks(result["source_documents"]), "local")
+
+
+def _stream_local(question: str) -> Iterator[Dict]:
+    with metrics.span("kb.local"):
+        for event in kb_pipeline.get().stream(question):
+            if event["type"] == "done":
+                metrics.add_remote_spans("kb", event["timings"], remote=False)
+                yield {"type": "done", "answer": _answer(event["results"], event["sources"], "local")}
+                return
+            yield event
+
+
+# -----------------------------
+# Agent entry points
+# -----------------------------
+def run_kb_agent(question: str) -> Dict:
+    """Answer from the knowledge base.
+
+    Returns {"answer", "sources": [{"source", "page", "text"}], "backend"}, or {"error"}.
+    """
+    if backend() == "local":
+        try:
+            return _run_local(question)
+        except Exception as e:
+            return {"error": f"Error answering from the knowledge base: {e}"}
+    try:
+        result = _run_remote(question)
         print("KB Retrieval process")
-        # print(response.json().get("results", "No results found"))
-        return response.json().get("results", "No results found")  # Return the full JSON from the API
+        return result
     except requests.RequestException as e:
         return {"error": f"Error contacting KB API: {e}"}
+
+
+def stream_kb_agent(question: str) -> Iterator[Dict]:
+    """Yield {"type": "token"} events, then {"type": "done", "answer"} with run_kb_agent's result."""
+    if backend() == "local":
+        try:
+            yield from _stream_local(question)
+        except Exception as e:
+            yield {"type": "done", "answer": {"error": f"Error answering from the knowledge base: {e}"}}
+        return
+    try:
+        yield from _stream_remote(question)
+    except requests.RequestException as e:
+        yield {"type": "done", "answer": {"error": f"Error contacting KB API: {e}"}}
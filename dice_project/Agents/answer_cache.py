@@ -0,0 +1,297 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .database import file_version
+from .embeddings import embed_texts
+from utils import metrics
+
+# -----------------------------
+# Configuration
+# -----------------------------
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(PROJECT_DIR, "answer_cache.db"))
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question TEXT NOT NULL,
+    normalized TEXT NOT NULL,
+    route TEXT NOT NULL,
+    version TEXT NOT NULL,
+    embedding BLOB,
+    result TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_normalized ON answers(normalized);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+_UNSET = object()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", "", question.lower())).strip()
+
+
+def bump_kb_version(path: str = ANSWER_CACHE_PATH) -> None:
+    """Invalidate cached KB answers; called by the ingestion pipeline after new documents land."""
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO meta(key, value) VALUES('kb_version', '1') "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+    finally:
+        conn.close()
+
+
+# -----------------------------
+# Semantic answer cache
+# -----------------------------
+class AnswerCache:
+    """Nearest-neighbour cache of final graph answers, persisted to SQLite.
+
+    Entries carry the version of the source they were answered from: the DB
+    file's (and its -wal file's) mtime/size for "db" answers and the ingestion counter for "kb"
+    answers. A version mismatch is treated as a miss and the entry is dropped.
+
+    "How many customers are older than 30" and "... older than 40" embed
+    almost identically, so a "db" answer is only reused when `literals`
+    (e.g. db_agent.question_literals) finds the same typed values in both
+    questions; otherwise the lookup moves on to the next candidate.
+    """
+
+    def __init__(self, db_file: str, path: str = ANSWER_CACHE_PATH,
+                 threshold: float = SIMILARITY_THRESHOLD, ttl: float = TTL_SECONDS,
+                 max_entries: int = MAX_ENTRIES, literals: Optional[Callable[[str], List]] = None):
+        self.db_file = db_file
+        self.literals = literals
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._embeddings_available = True
+        self._lock = threading.Lock()
+        self._conn = _connect(path)
+
+        # In-memory index over the persisted embeddings
+        self._ids: List[int] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._load()
+
+    def _load(self) -> None:
+        rows = self._conn.execute(
+            "SELECT id, embedding FROM answers WHERE embedding IS NOT NULL ORDER BY id"
+        ).fetchall()
+        self._ids = [row[0] for row in rows]
+        if rows:
+            self._matrix = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        print(f"[Answer Cache] Loaded {len(rows)} cached answer(s)")
+
+    # -----------------------------
+    # Versions
+    # -----------------------------
+    def _db_version(self) -> str:
+        return file_version(self.db_file) or "missing"
+
+    def _kb_version(self) -> str:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'kb_version'").fetchone()
+        return str(row[0]) if row else "0"
+
+    def _version(self, route: str) -> str:
+        return self._db_version() if route == "db" else self._kb_version()
+
+    # -----------------------------
+    # Lookup / store
+    # -----------------------------
+    def _embed(self, question: str) -> Optional[np.ndarray]:
+        if not self._embeddings_available:
+            return None
+        try:
+            return embed_texts([question])[0]
+        except ImportError as e:
+            self._embeddings_available = False
+            print(f"[Answer Cache] Semantic lookup disabled, exact match only: {e}")
+            return None
+
+    def _literal_key(self, question: str) -> Optional[List]:
+        try:
+            return [(kind, str(text).lower()) for kind, text, *_ in self.literals(question)]
+        except Exception as e:
+            print(f"[Answer Cache] Could not extract literals, DB answers not reused: {e}")
+            return None
+
+    def _candidates(self, normalized: str, embedding: Optional[np.ndarray]) -> List[int]:
+        exact = [row[0] for row in self._conn.execute(
+            "SELECT id FROM answers WHERE normalized = ? ORDER BY id DESC", (normalized,)
+        )]
+        if embedding is None or not self._ids:
+            return exact
+        sims = self._matrix @ embedding
+        order = np.argsort(-sims)[:5]
+        return exact + [self._ids[i] for i in order if sims[i] >= self.threshold]
+
+    def lookup(self, question: str, embedding: Optional[np.ndarray] = None) -> Optional[Dict]:
+        normalized = normalize_question(question)
+        now = time.time()
+        literal_key = _UNSET  # extracted on the first "db" candidate
+        with self._lock:
+            for entry_id in self._candidates(normalized, embedding):
+                row = self._conn.execute(
+                    "SELECT question, route, version, result, created FROM answers WHERE id = ?", (entry_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                cached_question, route, version, result, created = row
+                if now - created > self.ttl or version != self._version(route):
+                    self._delete(entry_id)
+                    continue
+                if route == "db" and self.literals is not None:
+                    if literal_key is _UNSET:
+                        literal_key = self._literal_key(question)
+                    if literal_key is None or self._literal_key(cached_question) != literal_key:
+                        continue
+                with self._conn:
+                    self._conn.execute("UPDATE answers SET last_access = ? WHERE id = ?", (now, entry_id))
+                self.hits += 1
+                return json.loads(result)
+            self.misses += 1
+            return None
+
+    def store(self, question: str, result: Dict, embedding: Optional[np.ndarray] = None) -> None:
+        route = result.get("route", "kb")
+        now = time.time()
+        blob = embedding.astype(np.float32).tobytes() if embedding is not None else None
+        with self._lock:
+            with self._conn:
+                cur = self._conn.execute(
+                    "INSERT INTO answers(question, normalized, route, version, embedding, result, created, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (question, normalize_question(question), route, self._version(route), blob,
+                     json.dumps(result, default=str), now, now),
+                )
+            if embedding is not None:
+                self._ids.append(cur.lastrowid)
+                row = embedding.astype(np.float32)[None, :]
+                self._matrix = row if not self._matrix.size else np.vstack([self._matrix, row])
+            self._evict()
+
+    def _delete(self, entry_id: int) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM answers WHERE id = ?", (entry_id,))
+        if entry_id in self._ids:
+            idx = self._ids.index(entry_id)
+            del self._ids[idx]
+            self._matrix = np.delete(self._matrix, idx, axis=0)
+
+    def _evict(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        stale = self._conn.execute(
+            "SELECT id FROM answers ORDER BY last_access ASC LIMIT ?", (count - self.max_entries,)
+        ).fetchall()
+        for (entry_id,) in stale:
+            self._delete(entry_id)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class CachedApp:
+    """Wraps the compiled graph and answers repeat questions from the cache.
+
+    With cache=None it is a plain pass-through, so callers can always use
+    invoke() and stream_answer().
+    """
+
+    def __init__(self, graph, cache: Optional[AnswerCache],
+                 stream_fn: Optional[Callable[[Dict], Iterator[Dict]]] = None):
+        self.graph = graph
+        self.cache = cache
+        self.stream_fn = stream_fn
+
+    def _lookup(self, question: str):
+        if self.cache is None:
+            return None, None
+        start = time.perf_counter()
+        with metrics.span("answer_cache.lookup") as span:
+            embedding = self.cache._embed(question)
+            cached = self.cache.lookup(question, embedding)
+            span.set(hit=cached is not None)
+        metrics.cache_lookup("answer", cached is not None)
+        if cached is not None:
+            print(f"[Answer Cache] Hit in {(time.perf_counter() - start) * 1000:.1f} ms")
+            return {**cached, "question": question, "cache_hit": True}, embedding
+        return None, embedding
+
+    def _store(self, question: str, result: Dict, embedding) -> None:
+        if self.cache is not None and self._cacheable(result):
+            self.cache.store(question, dict(result), embedding)
+
+    def invoke(self, state: Dict, *args, **kwargs) -> Dict:
+        question = state["question"]
+        cached, embedding = self._lookup(question)
+        if cached is not None:
+            return cached
+
+        result = self.graph.invoke(state, *args, **kwargs)
+        self._store(question, result, embedding)
+        return result
+
+    def stream_answer(self, state: Dict) -> Iterator[Dict]:
+        """Event stream for one question; a cache hit yields a single "done" event."""
+        question = state["question"]
+        cached, embedding = self._lookup(question)
+        if cached is not None:
+            yield {"type": "done", "result": cached}
+            return
+
+        for event in self.stream_fn(state):
+            if event["type"] == "done":
+                self._store(question, event["result"], embedding)
+            yield event
+
+    @staticmethod
+    def _cacheable(result: Dict) -> bool:
+        answer = result.get("answer")
+        if not answer or result.get("sql_error") or isinstance(answer, dict):
+            return False
+        if str(result.get("relevance", "")).startswith("Routing error"):
+            return False
+        # Only read-only DB answers are safe to replay
+        return not result.get("sql_query") or result["sql_query"].strip().lower().startswith("select")
+
+    def __getattr__(self, name):
+        return getattr(self.graph, name)
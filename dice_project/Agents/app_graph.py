@@ -1,57 +1,100 @@
+import time
+from functools import partial, wraps
+from typing import Dict, Iterator
 from typing_extensions import TypedDict
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END
 
-from .router_agent import route_question
-from .db_agent import run_db_agent
-from .KB_agent import run_kb_agent
+from .router_agent import get_database_schema
+from .pre_router import llm_route, pre_route, pre_route_local
+from .db_agent import is_select, question_literals, stream_db_agent
+from .database import DATABASE_FILE
+from .KB_agent import run_kb_agent, stream_kb_agent
+from .answer_cache import AnswerCache, CachedApp, ANSWER_CACHE_ENABLED
+from .speculation import SPECULATIVE_ROUTING, run_branch, speculative_targets, stats, tracker
+from utils import metrics
 
 
 class AppState(TypedDict, total=False):
     question: str
     route: str             # "db" or "kb"
+    route_tier: str        # Router tier that decided: "keyword", "embedding" or "llm"
     sql_query: str         # SQL string if applicable
     query_result: str      # Formatted results or human-readable answer
-    query_rows: list       # Raw rows from DB
+    query_rows: list       # Raw rows from DB (capped at DB_RESULT_ROW_CAP)
+    row_count: int         # Rows in the full result
+    truncated: bool        # Result was larger than DB_PROFILE_MAX_ROWS
     answer: str            # KB answer or DB human-readable summary
+    kb_sources: list       # Chunks the KB answer was generated from: {"source", "page", "text"}
+    kb_backend: str        # "local" (in-process QA pipeline) or "remote" (KB API)
     attempts: int
     relevance: str
     sql_error: bool
+    db_path: str           # "template", "template+summary", "plan_cache" or "llm"
+    # Speculative routing (SPECULATIVE_ROUTING=true)
+    speculation_id: str    # Set when the branches start before the route is known
+    route_ms: float        # LLM routing time
+    db_branch: dict        # Speculative branch outcomes, cleared by the merge node
+    kb_branch: dict
+    speculation: dict      # Winner, branch timings and whether the loser was cancelled
+    streaming: bool        # Set by stream_answer: agents stream LLM tokens / KB answers as events
 
 
 # -----------------------------
 # Node functions
 # -----------------------------
-def router_node(state: AppState) -> AppState:
-    """Classify the question and decide which agent to route to."""
+def emit(event: Dict) -> None:
+    """Hand an event to graph.stream(stream_mode="custom") consumers; a no-op for invoke()."""
+    try:
+        get_stream_writer()(event)
+    except RuntimeError:
+        pass  # Called outside a graph run
+
+
+def emit_route(route: str, tier: str) -> None:
+    emit({"type": "route", "route": route, "route_tier": tier})
+
+
+def apply_route(state: AppState, decide) -> AppState:
     try:
-        decision = route_question(state["question"])
+        decision = decide(state["question"])
         state["route"] = decision.route
+        state["route_tier"] = decision.tier
         state["relevance"] = decision.route
     except Exception as e:
         # Fallback to KB route if routing fails
         state["route"] = "kb"
         state["relevance"] = f"Routing error: {e}"
+    emit_route(state["route"], state.get("route_tier", ""))
     return state
 
 
-def db_node(state: AppState) -> AppState:
-    """Execute database queries and store results."""
-    res = run_db_agent(state["question"])
-    
+def router_node(state: AppState) -> AppState:
+    """Classify the question and decide which agent to route to."""
+    return apply_route(state, pre_route)
+
+
+def apply_db_result(state: AppState, res: Dict) -> AppState:
     # Consistently map DB agent fields to AppState
     state["answer"] = res.get("answer", "")
     state["sql_query"] = res.get("sql_query", "")
     state["query_result"] = res.get("query_result", "")
     state["query_rows"] = res.get("query_rows", [])
+    state["row_count"] = res.get("row_count", len(state["query_rows"]))
+    state["truncated"] = res.get("truncated", False)
     state["sql_error"] = not res.get("ok", False)
-    
+    state["db_path"] = res.get("db_path", "llm")
     return state
 
 
-def kb_node(state: AppState) -> AppState:
-    """Call the KB API and store full JSON response."""
-    res = run_kb_agent(state["question"])
-    state["answer"] = res            # store full API JSON
+def apply_kb_result(state: AppState, res: Dict) -> AppState:
+    if "error" in res:
+        state["answer"] = res        # {"error": ...}, kept as a dict so it is never cached
+        state["kb_sources"] = []
+    else:
+        state["answer"] = res["answer"]
+        state["kb_sources"] = res.get("sources", [])
+        state["kb_backend"] = res.get("backend", "")
     state["sql_query"] = ""
     state["query_result"] = ""
     state["query_rows"] = []
@@ -59,6 +102,137 @@ def kb_node(state: AppState) -> AppState:
     return state
 
 
+def db_node(state: AppState) -> AppState:
+    """Execute database queries and store results; the SQL (and summary tokens when streaming) are emitted."""
+    for event in stream_db_agent(state["question"], stream_summary=state.get("streaming", False)):
+        if event["type"] == "done":
+            return apply_db_result(state, event["result"])
+        emit(event)
+    return state
+
+
+def kb_node(state: AppState) -> AppState:
+    """Answer from the knowledge base and store the answer and its sources."""
+    if not state.get("streaming"):
+        return apply_kb_result(state, run_kb_agent(state["question"]))
+    for event in stream_kb_agent(state["question"]):
+        if event["type"] == "done":
+            return apply_kb_result(state, event["answer"])
+        emit(event)
+    return state
+
+
+# -----------------------------
+# Speculative routing
+# -----------------------------
+def speculative_router_node(state: AppState) -> AppState:
+    """Local router tiers; when they are unsure, start the branches instead of waiting on the LLM."""
+    try:
+        decision = pre_route_local(state["question"])
+    except Exception as e:
+        print(f"[Speculation] Local routing failed: {e}")
+        decision = None
+    if decision is not None:
+        return apply_route(state, lambda _: decision)
+
+    spec_id = tracker.start()
+    if spec_id is None:
+        stats.skipped()
+        return apply_route(state, llm_route)
+    state["speculation_id"] = spec_id
+    state["route"] = ""
+    return state
+
+
+def llm_route_node(state: AppState) -> Dict:
+    """LLM routing, run next to the speculative branches; cancels the loser as soon as it decides."""
+    start = time.perf_counter()
+    try:
+        decision = llm_route(state["question"])
+        update = {"route": decision.route, "route_tier": decision.tier, "relevance": decision.route}
+        # Route first, so a streaming winner's held-back events follow it
+        emit_route(decision.route, decision.tier)
+        tracker.choose(state["speculation_id"], decision.route)
+    except Exception as e:
+        update = {"route": "", "relevance": f"Routing error: {e}"}
+    update["route_ms"] = (time.perf_counter() - start) * 1000
+    return update
+
+
+def _branch_streaming(state: AppState, branch: str) -> Dict:
+    """run_branch arguments that stream the branch's events once the router picks it."""
+    if not state.get("streaming"):
+        return {}
+    return {"won": tracker.won(state["speculation_id"], branch), "emit": emit}
+
+
+def db_speculative_node(state: AppState) -> Dict:
+    # Writes are never run speculatively; they wait for the routed DB node
+    defer = lambda event: event["type"] == "sql" and not is_select(event["sql_query"])
+    events = stream_db_agent(state["question"], stream_summary=state.get("streaming", False))
+    return {"db_branch": run_branch(events, tracker.flag(state["speculation_id"], "db"),
+                                    lambda event: event["result"], defer, **_branch_streaming(state, "db"))}
+
+
+def kb_speculative_node(state: AppState) -> Dict:
+    events = stream_kb_agent(state["question"])
+    return {"kb_branch": run_branch(events, tracker.flag(state["speculation_id"], "kb"),
+                                    lambda event: event["answer"], **_branch_streaming(state, "kb"))}
+
+
+def _db_answered(branch: Dict) -> bool:
+    result = branch.get("answer")
+    if not isinstance(result, dict) or not result.get("ok", False):
+        return False
+    return result.get("row_count", len(result.get("query_rows", []))) > 0
+
+
+def _kb_answered(branch: Dict) -> bool:
+    # The KB agent reports failures as {"error": ...}
+    return "answer" in branch and "error" not in branch["answer"]
+
+
+def merge_node(state: AppState) -> AppState:
+    """Take the routed branch's answer; without a route, keep whichever branch answered (or both)."""
+    tracker.finish(state["speculation_id"])
+    branches = {name: state.get(f"{name}_branch") for name in ("db", "kb") if state.get(f"{name}_branch")}
+    routing_failed = state.get("route") not in ("db", "kb")
+    combined = False
+    winner = state.get("route")
+    if routing_failed:
+        db_ok, kb_ok = _db_answered(branches.get("db", {})), _kb_answered(branches.get("kb", {}))
+        combined = db_ok and kb_ok
+        winner = "db" if db_ok else "kb"
+        state["route"] = winner
+
+    if combined:
+        apply_db_result(state, branches["db"]["answer"])
+        kb = branches["kb"]["answer"]
+        state["answer"] = (f"**From the database:**\n{state['answer']}\n\n"
+                           f"**From the knowledge base:**\n{kb['answer']}")
+        state["kb_sources"] = kb.get("sources", [])
+        state["kb_backend"] = kb.get("backend", "")
+    elif "answer" in branches.get(winner, {}):
+        if winner == "db":
+            apply_db_result(state, branches["db"]["answer"])
+        else:
+            apply_kb_result(state, branches["kb"]["answer"])
+
+    stats.record(winner, state.get("route_ms", 0.0), branches, routing_failed, combined)
+    state["speculation"] = {
+        "winner": winner,
+        "combined": combined,
+        "routing_failed": routing_failed,
+        "route_ms": round(state.get("route_ms", 0.0), 1),
+        "branches": {name: {k: v for k, v in branch.items() if k != "answer"} for name, branch in branches.items()},
+        # The winner was not speculated, was deferred or failed: run it now
+        "run_after": not combined and "answer" not in branches.get(winner, {}),
+    }
+    state["db_branch"] = {}
+    state["kb_branch"] = {}
+    return state
+
+
 # -----------------------------
 # Routing logic
 # -----------------------------
@@ -67,19 +241,55 @@ def route_router(state: AppState) -> str:
     return "db" if state.get("route") == "db" else "kb"
 
 
+def route_or_speculate(state: AppState):
+    """Fan out to the LLM router and the speculative branches, or go straight to the routed agent."""
+    if state.get("speculation_id"):
+        return ["route_llm", *speculative_targets()]
+    return route_router(state)
+
+
+def after_merge(state: AppState) -> str:
+    return route_router(state) if state["speculation"]["run_after"] else "end"
+
+
 # -----------------------------
 # Build and compile app graph
 # -----------------------------
-def build_app():
+def traced(name: str, node):
+    """Time a node into dice_span_seconds{span="node.<name>"} and the request trace."""
+    @wraps(node)
+    def run(state):
+        with metrics.span(f"node.{name}"):
+            return node(state)
+    return run
+
+
+def build_app(speculative: bool = SPECULATIVE_ROUTING):
+    # Introspect the schema once at startup so questions reuse the cached prompt blocks
+    get_database_schema()
+
     g = StateGraph(AppState)
 
     # Add nodes
-    g.add_node("route", router_node)
-    g.add_node("db", db_node)
-    g.add_node("kb", kb_node)
+    g.add_node("route", traced("route", speculative_router_node if speculative else router_node))
+    g.add_node("db", traced("db", db_node))
+    g.add_node("kb", traced("kb", kb_node))
 
-    # Conditional routing from route node
-    g.add_conditional_edges("route", route_router, {"db": "db", "kb": "kb"})
+    if speculative:
+        # route -> (route_llm | db_spec | kb_spec) in one parallel step -> merge -> END,
+        # or -> db/kb when the winner still has to run
+        g.add_node("route_llm", traced("route_llm", llm_route_node))
+        g.add_node("db_spec", traced("db_spec", db_speculative_node))
+        g.add_node("kb_spec", traced("kb_spec", kb_speculative_node))
+        g.add_node("merge", traced("merge", merge_node))
+        g.add_conditional_edges("route", route_or_speculate,
+                                ["db", "kb", "route_llm", "db_spec", "kb_spec"])
+        for node in ("route_llm", "db_spec", "kb_spec"):
+            g.add_edge(node, "merge")
+        g.add_conditional_edges("merge", after_merge, {"db": "db", "kb": "kb", "end": END})
+    else:
+        # Conditional routing from route node
+        g.add_conditional_edges("route", route_router, {"db": "db", "kb": "kb"})
     
     # End nodes
     g.add_edge("db", END)
@@ -89,3 +299,33 @@ def build_app():
     g.set_entry_point("route")
 
     return g.compile()
+
+
+# -----------------------------
+# Streaming path
+# -----------------------------
+def stream_answer(app, state: AppState) -> Iterator[Dict]:
+    """Run the compiled graph, yielding the events its nodes emit as they happen.
+
+    Yields {"type": "route"}, the chosen agent's "sql" / "token" events, and
+    finally {"type": "done", "result"} with the same state app.invoke returns.
+    Speculative branches hold their events back until the LLM router picks
+    one, which then streams like the routed agent; without a route (or when
+    the winner finished first) the answer arrives with "done".
+    """
+    result: Dict = {}
+    for mode, chunk in app.stream({**state, "streaming": True}, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            yield chunk
+        else:
+            result = chunk
+    result = dict(result)
+    result.pop("streaming", None)
+    yield {"type": "done", "result": result}
+
+
+def build_cached_app():
+    """Compiled graph behind the persistent semantic answer cache."""
+    graph = build_app()
+    cache = AnswerCache(db_file=DATABASE_FILE, literals=question_literals) if ANSWER_CACHE_ENABLED else None
+    return CachedApp(graph, cache, stream_fn=partial(stream_answer, graph))
@@ -0,0 +1,116 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional
+
+from .answer_cache import normalize_question
+from utils.metrics import trace_request
+
+# -----------------------------
+# Configuration
+# -----------------------------
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "200"))
+
+
+def initial_state(question: str) -> Dict:
+    return {
+        "question": question,
+        "route": "",
+        "answer": "",
+        "sql_query": "",
+        "query_result": "",
+        "query_rows": [],
+    }
+
+
+# -----------------------------
+# Batch runner
+# -----------------------------
+class BatchRunner:
+    """Runs many questions through the compiled graph on a bounded thread pool.
+
+    Questions that normalize to the same text are answered once; the result
+    carries the positions of every copy. The graph's nodes are synchronous
+    (SQLite, HTTP, LLM calls), so threads give the concurrency, and at most
+    `concurrency` questions are in flight at a time.
+    """
+
+    def __init__(self, app, concurrency: int = BATCH_CONCURRENCY, trace: bool = False):
+        self.app = app
+        self.concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+        self.trace = trace
+
+    @staticmethod
+    def dedupe(questions: List[str]) -> List[Dict]:
+        """Unique questions in first-seen order, each with the indices it answers; blanks are skipped."""
+        unique: Dict[str, Dict] = {}
+        for i, question in enumerate(questions):
+            if not question.strip():
+                continue
+            key = normalize_question(question)
+            if key in unique:
+                unique[key]["indices"].append(i)
+            else:
+                unique[key] = {"question": question.strip(), "indices": [i]}
+        return list(unique.values())
+
+    def _answer(self, item: Dict) -> Dict:
+        start = time.perf_counter()
+        with trace_request(self.trace) as trace:
+            try:
+                result = self.app.invoke(initial_state(item["question"]))
+                outcome = {"result": result}
+            except Exception as e:
+                outcome = {"error": str(e)}
+        if trace is not None:
+            outcome["trace"] = trace.to_dict()
+        return {
+            "question": item["question"],
+            "indices": item["indices"],
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+            **outcome,
+        }
+
+    def stream(self, questions: List[str]) -> Iterator[Dict]:
+        """Yield one result per unique question as soon as it finishes.
+
+        A question that fails yields {"error": ...} instead of "result"; the
+        rest of the batch keeps going.
+        """
+        pending_items = self.dedupe(questions)
+        if not pending_items:
+            return
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+            # Submit lazily so an abandoned stream does not leave the whole batch queued
+            items = iter(pending_items)
+            running = set()
+            for item in items:
+                running.add(pool.submit(self._answer, item))
+                if len(running) >= self.concurrency:
+                    break
+            try:
+                while running:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        next_item = next(items, None)
+                        if next_item is not None:
+                            running.add(pool.submit(self._answer, next_item))
+                        yield future.result()
+            finally:
+                for future in running:
+                    future.cancel()
+
+    def run(self, questions: List[str]) -> List[Dict]:
+        """All results, one per input question, in input order (None for blank questions)."""
+        ordered: List[Optional[Dict]] = [None] * len(questions)
+        for item in self.stream(questions):
+            for i in item["indices"]:
+                ordered[i] = item
+        return ordered
+
+
+def ask_batch(app, questions: List[str], concurrency: int = BATCH_CONCURRENCY) -> Iterator[Dict]:
+    """Stream answers for a list of questions; `app` is build_app() or build_cached_app()."""
+    return BatchRunner(app, concurrency).stream(questions)
@@ -0,0 +1,228 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+# -----------------------------
+# Configuration
+# -----------------------------
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATABASE_FILE = os.path.abspath(os.getenv("DATABASE_FILE", os.path.join(PROJECT_DIR, "customer_complaints.db")))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "4"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Wall-clock limit for one query, including fetching its rows
+DB_QUERY_TIMEOUT = float(os.getenv("DB_QUERY_TIMEOUT", "10"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", str(64 * 1024)))
+# Writes (INSERT/UPDATE/DELETE from generated SQL) are off unless explicitly enabled
+DB_ALLOW_WRITES = os.getenv("DB_ALLOW_WRITES", "false").lower() == "true"
+
+# SQLite calls the progress handler every N virtual machine instructions
+PROGRESS_STEPS = 10000
+
+
+class QueryTimeout(Exception):
+    """A query ran longer than DB_QUERY_TIMEOUT and was interrupted."""
+
+
+class WritesDisabled(Exception):
+    """A write was attempted while DB_ALLOW_WRITES is off."""
+
+
+# -----------------------------
+# Stats
+# -----------------------------
+class DatabaseStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+
+    def record(self, elapsed_ms: float) -> None:
+        with self._lock:
+            self.queries += 1
+            self.total_ms += elapsed_ms
+            self.slowest_ms = max(self.slowest_ms, elapsed_ms)
+
+    def record_error(self, timeout: bool) -> None:
+        with self._lock:
+            self.errors += 1
+            self.timeouts += int(timeout)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "mean_ms": round(self.total_ms / self.queries, 2) if self.queries else 0.0,
+                "slowest_ms": round(self.slowest_ms, 2),
+            }
+
+
+stats = DatabaseStats()
+
+
+# -----------------------------
+# Engines
+# -----------------------------
+def enable_wal(path: str = DATABASE_FILE) -> None:
+    """Switch the database to WAL, so readers never block on a writer.
+
+    The journal mode is stored in the file itself, so this is an explicit
+    admin step (python -m Agents.database --enable-wal), never run on import.
+    """
+    if not os.path.exists(path):
+        return
+    try:
+        conn = sqlite3.connect(path, timeout=DB_POOL_TIMEOUT)
+        try:
+            if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+                conn.execute("PRAGMA journal_mode=WAL")
+                print(f"[Database] Enabled WAL mode on {path}")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"[Database] Could not enable WAL mode: {e}")
+
+
+def file_version(path: str = DATABASE_FILE) -> Optional[str]:
+    """Changes with every committed write: mtime and size of the file and its -wal file.
+
+    In WAL mode a commit only appends to the -wal file; the main file changes
+    at the next checkpoint. None when the database file does not exist.
+    """
+    parts = []
+    for name in (path, f"{path}-wal"):
+        try:
+            st = os.stat(name)
+        except OSError:
+            if name == path:
+                return None
+            parts.append("-")
+            continue
+        parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+    return "/".join(parts)
+
+
+def _install_hooks(engine, read_only: bool, timeout: float) -> None:
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA busy_timeout={int(DB_POOL_TIMEOUT * 1000)}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=1")
+        cursor.close()
+
+        # The deadline is set per query and cleared when the connection is returned
+        deadline = record.info["deadline"] = [None]
+        dbapi_conn.set_progress_handler(
+            lambda: deadline[0] is not None and time.monotonic() > deadline[0], PROGRESS_STEPS
+        )
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_conn, record):
+        if "deadline" in record.info:
+            record.info["deadline"][0] = None
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        deadline = conn.connection.info.get("deadline")
+        if deadline is not None and timeout > 0:
+            deadline[0] = time.monotonic() + timeout
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("query_start", None)
+        if start is not None:
+            stats.record((time.perf_counter() - start) * 1000)
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        error = context.original_exception
+        timed_out = isinstance(error, sqlite3.OperationalError) and "interrupted" in str(error)
+        stats.record_error(timed_out)
+        if timed_out:
+            return QueryTimeout(f"Query exceeded the {timeout:g}s time limit and was interrupted.")
+
+
+def _create(path: str, read_only: bool, timeout: float):
+    mode = "mode=ro&" if read_only else ""
+    engine = create_engine(
+        f"sqlite:///file:{path}?{mode}uri=true",
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        connect_args={"check_same_thread": False, "timeout": DB_POOL_TIMEOUT},
+    )
+    _install_hooks(engine, read_only, timeout)
+    return engine
+
+
+read_engine = _create(DATABASE_FILE, read_only=True, timeout=DB_QUERY_TIMEOUT)
+_write_engine = None
+_write_lock = threading.Lock()
+
+
+def get_write_engine():
+    """Writable engine for generated DML; only available with DB_ALLOW_WRITES=true."""
+    global _write_engine
+    if not DB_ALLOW_WRITES:
+        raise WritesDisabled("Write queries are disabled. Set DB_ALLOW_WRITES=true to allow them.")
+    with _write_lock:
+        if _write_engine is None:
+            _write_engine = _create(DATABASE_FILE, read_only=False, timeout=DB_QUERY_TIMEOUT)
+        return _write_engine
+
+
+def _pool_stats(engine) -> Optional[Dict]:
+    if engine is None:
+        return None
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+
+
+def database_stats() -> Dict:
+    """Pool occupancy, query counts, latency and timeouts."""
+    return {
+        "database": DATABASE_FILE,
+        "query_timeout_s": DB_QUERY_TIMEOUT,
+        "writes_enabled": DB_ALLOW_WRITES,
+        "read_pool": _pool_stats(read_engine),
+        "write_pool": _pool_stats(_write_engine),
+        **stats.snapshot(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or change the database's journal mode.")
+    parser.add_argument("--enable-wal", action="store_true", help="Switch the database to WAL journal mode")
+    args = parser.parse_args()
+
+    if args.enable_wal:
+        enable_wal()
+    with read_engine.connect() as conn:
+        mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    print(f"[Database] {DATABASE_FILE}: journal_mode={mode}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,34 @@
-from typing import Dict, List
-from sqlalchemy import create_engine, inspect, text
+import os
+from typing import Dict, Iterator, List
+from sqlalchemy import text
 from pydantic import BaseModel, Field
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.schema import StrOutputParser
+from utils import metrics
+from utils.lazy import LazyResource
+
+from .schema_catalog import get_catalog
+from .database import DATABASE_FILE, get_write_engine, read_engine
+from .index_advisor import IndexAdvisor
+from .llm import groq_llm, llm_call
+from .plan_cache import PLAN_CACHE_ENABLED, PlanCache, question_shape
+from .result_profile import ResultProfile
+from .sql_templates import SQL_TEMPLATES_ENABLED, format_answer, match_template
+from .text_index import rewrite_like_queries
 
 # -----------------------------
 # Database setup
 # -----------------------------
-DATABASE_PATH = "sqlite:///./customer_complaints.db"
-engine = create_engine(DATABASE_PATH)
+engine = read_engine
+schema_catalog = get_catalog(engine)
 
-# -----------------------------
-# Groq LLM setup
-# -----------------------------
-groq_llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0.0)
+# Rows kept in state / shown in the UI; the rest is only profiled
+RESULT_ROW_CAP = int(os.getenv("DB_RESULT_ROW_CAP", "500"))
+# Rows scanned for the profile before the cursor is closed
+PROFILE_MAX_ROWS = int(os.getenv("DB_PROFILE_MAX_ROWS", "200000"))
+# Rows sent verbatim to the summary LLM next to the profile
+SUMMARY_SAMPLE_ROWS = int(os.getenv("DB_SUMMARY_SAMPLE_ROWS", "20"))
+FETCH_BATCH_SIZE = int(os.getenv("DB_FETCH_BATCH_SIZE", "1000"))
 
 # -----------------------------
 # Structured SQL output
@@ -26,16 +40,13 @@ class ConvertToSQL(BaseModel):
 # Schema tools
 # -----------------------------
 def get_table_names() -> List[str]:
-    inspector = inspect(engine)
-    return inspector.get_table_names()
+    return schema_catalog.table_names()
 
 def get_columns(table_name: str) -> Dict[str, str]:
-    inspector = inspect(engine)
-    return {col["name"]: str(col["type"]) for col in inspector.get_columns(table_name)}
+    return schema_catalog.columns(table_name)
 
 def get_schema_text(table_name: str) -> str:
-    cols = get_columns(table_name)
-    return "\n".join([f'- "{col}" {ctype}' for col, ctype in cols.items()])
+    return schema_catalog.columns_block(table_name)
 
 # -----------------------------
 # Question Regeneration / Enrichment
@@ -45,6 +56,15 @@ SYNONYMS = {
     "United Kingdom": ["United Kingdom", "UK", "GB"]
 }
 
+plan_cache = PlanCache(schema_catalog, SYNONYMS) if PLAN_CACHE_ENABLED else None
+index_advisor = IndexAdvisor(engine, schema_catalog)
+
+
+def question_literals(question: str, table_name: str = "customer_complaints") -> List:
+    """The question's typed literals (quoted text, synonyms, column values, numbers), as the plan cache finds them."""
+    return question_shape(question, schema_catalog.column_values(table_name), SYNONYMS)[1]
+
+
 def regenerate_question(question: str) -> str:
     """Expand question with known synonyms and abbreviations."""
     for key, variants in SYNONYMS.items():
@@ -53,10 +73,138 @@ def regenerate_question(question: str) -> str:
             question = question.replace(key, variants_str)
     return question
 
+# -----------------------------
+# Prompts
+# -----------------------------
+SUMMARY_SYSTEM_PROMPT = """
+You are a professional analyst. Convert SQL results into a narrative, story-like, executive summary.
+Highlight key patterns, trends, duplicates, and actionable insights.
+"""
+summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", SUMMARY_SYSTEM_PROMPT),
+    ("human", "SQL Query:\n{sql_query}\nResult:\n{query_result}")
+])
+summary_llm = LazyResource("summary_llm", lambda: summary_prompt | groq_llm.get() | StrOutputParser())
+
+
+def generate_sql(enriched_question: str, table_name: str = "customer_complaints") -> str:
+    cols_block = get_schema_text(table_name)
+    system_prompt = f"""
+You are an assistant that converts natural language questions into SQL queries.
+Database: "{table_name}"
+Columns:
+{cols_block}
+
+Rules:
+- Provide ONLY the SQL query, no explanations.
+- Use LIKE statements for partial matches if needed.
+"""
+    convert_prompt = ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("human", "Question: {question}")
+    ])
+    structured_llm = groq_llm.get().with_structured_output(ConvertToSQL)
+    sql_generator = convert_prompt | structured_llm
+    with llm_call("sql") as config:
+        result = sql_generator.invoke({"question": enriched_question}, config=config)
+    return result.sql_query
+
+
+def is_select(sql_query: str) -> bool:
+    return sql_query.strip().lower().startswith("select")
+
+
+def format_rows(columns: List[str], rows: List[Dict]) -> str:
+    header = ", ".join(columns)
+    formatted = "; ".join([", ".join([f"{k}: {v}" for k, v in row.items()]) for row in rows])
+    return f"{header}\n{formatted}"
+
+
+def indexed_sql(sql_query: str) -> str:
+    """The query as executed: LIKE '%...%' filters go through the FTS5 text index."""
+    return rewrite_like_queries(sql_query, DATABASE_FILE, schema_version=schema_catalog.loads)
+
+
+def execute_sql(sql_query: str, state: Dict) -> str:
+    """Run the query and store rows and the formatted result in state; returns the SQL as executed.
+
+    SELECT results are streamed from the cursor: at most RESULT_ROW_CAP rows
+    are kept, and results larger than SUMMARY_SAMPLE_ROWS are described by a
+    column profile plus a sample instead of every row.
+    """
+    if not is_select(sql_query):
+        # Raises WritesDisabled unless DB_ALLOW_WRITES=true
+        with metrics.span("sql.write"), get_write_engine().begin() as conn:
+            conn.execute(text(sql_query))
+        state["query_result"] = "Action completed successfully."
+        return sql_query
+
+    executed = indexed_sql(sql_query)
+    with metrics.span("sql.execute") as span, engine.connect() as conn:
+        res = conn.execution_options(stream_results=True, yield_per=FETCH_BATCH_SIZE).execute(text(executed))
+        cols = list(res.keys())
+        profile = ResultProfile(cols, sample_size=SUMMARY_SAMPLE_ROWS)
+        rows, truncated = [], False
+        for batch in res.partitions(FETCH_BATCH_SIZE):
+            if profile.rows >= PROFILE_MAX_ROWS:
+                truncated = True
+                break
+            if len(batch) > PROFILE_MAX_ROWS - profile.rows:
+                truncated = True
+                batch = batch[:PROFILE_MAX_ROWS - profile.rows]
+            profile.add(batch)
+            rows.extend(dict(zip(cols, row)) for row in batch[:RESULT_ROW_CAP - len(rows)])
+        res.close()
+
+        state["query_rows"] = rows
+        state["row_count"] = profile.rows
+        state["truncated"] = truncated
+        metrics.sql_rows.observe(profile.rows)
+        span.set(rows=profile.rows, truncated=truncated)
+        if not rows:
+            state["query_result"] = "No results found."
+        elif profile.rows <= SUMMARY_SAMPLE_ROWS:
+            state["query_result"] = format_rows(cols, rows)
+        else:
+            state["query_result"] = profile.to_text(truncated)
+            print(f"[DB Agent] Profiled {profile.rows} row(s){' (truncated)' if truncated else ''}, "
+                  f"kept {len(rows)}")
+    return executed
+
+
+def fetch_result_page(sql_query: str, page: int = 1, page_size: int = 50) -> Dict:
+    """One page of a SELECT result, for browsing results beyond RESULT_ROW_CAP."""
+    if not is_select(sql_query):
+        raise ValueError("Only SELECT results can be paginated.")
+    page = max(page, 1)
+    page_size = max(min(page_size, 1000), 1)
+    inner = indexed_sql(sql_query).strip().rstrip(";")
+    with engine.connect() as conn:
+        res = conn.execute(
+            text(f"SELECT * FROM ({inner}) LIMIT :limit OFFSET :offset"),
+            {"limit": page_size + 1, "offset": (page - 1) * page_size},
+        )
+        cols = list(res.keys())
+        rows = [dict(zip(cols, row)) for row in res.fetchall()]
+    return {
+        "columns": cols,
+        "rows": rows[:page_size],
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(rows) > page_size,
+    }
+
+
 # -----------------------------
 # DB Agent
 # -----------------------------
-def run_db_agent(question: str) -> Dict:
+def stream_db_agent(question: str, stream_summary: bool = True) -> Iterator[Dict]:
+    """Run the DB agent step by step, yielding events as they become available.
+
+    Events: {"type": "sql", "sql_query"} once the SQL is generated,
+    {"type": "token", "text"} for each summary token (if stream_summary),
+    and finally {"type": "done", "result"} with the same dict run_db_agent returns.
+    """
     state: Dict = {
         "question": question,
         "sql_query": "",
@@ -64,6 +212,9 @@ def run_db_agent(question: str) -> Dict:
         "query_rows": [],
         "query_result": "",
         "answer": "",
+        "row_count": 0,
+        "truncated": False,
+        "db_path": "llm",
     }
 
     # 1️⃣ Regenerate question
@@ -71,77 +222,89 @@ def run_db_agent(question: str) -> Dict:
     state["question"] = enriched_question
     print(f"[DB Agent] Enriched question: {enriched_question}")
 
-    # 2️⃣ Generate SQL
+    # 2️⃣ Generate SQL: deterministic template first, LLM otherwise
+    template = None
+    if SQL_TEMPLATES_ENABLED:
+        try:
+            template = match_template(enriched_question, schema_catalog)
+        except Exception as e:
+            print(f"[DB Agent] Template matching failed: {e}")
     try:
-        table_name = "customer_complaints"
-        cols_block = get_schema_text(table_name)
-        system_prompt = f"""
-You are an assistant that converts natural language questions into SQL queries.
-Database: "{table_name}"
-Columns:
-{cols_block}
-
-Rules:
-- Provide ONLY the SQL query, no explanations.
-- Use LIKE statements for partial matches if needed.
-"""
-        convert_prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", "Question: {question}")
-        ])
-        structured_llm = groq_llm.with_structured_output(ConvertToSQL)
-        sql_generator = convert_prompt | structured_llm
-        result = sql_generator.invoke({"question": enriched_question})
-        sql_query = result.sql_query
+        cached_sql = None
+        if template is None and plan_cache is not None:
+            cached_sql = plan_cache.lookup(question)
+            metrics.cache_lookup("plan", cached_sql is not None)
+        if template is not None:
+            sql_query = template.sql_query
+            state["db_path"] = "template"
+        elif cached_sql is not None:
+            sql_query = cached_sql
+            state["db_path"] = "plan_cache"
+        else:
+            sql_query = generate_sql(enriched_question)
         state["sql_query"] = sql_query
-        print(f"[DB Agent] Generated SQL: {sql_query}")
+        print(f"[DB Agent] Generated SQL ({state['db_path']}): {sql_query}")
     except Exception as e:
         state["sql_error"] = True
         state["query_result"] = f"Failed to generate SQL: {e}"
         state["answer"] = state["query_result"]
-        return {"route": "db", "ok": False, **state}
+        yield {"type": "done", "result": {"route": "db", "ok": False, **state}}
+        return
+    yield {"type": "sql", "sql_query": sql_query}
 
     # 3️⃣ Execute SQL
     try:
-        with engine.connect() as conn:
-            res = conn.execute(text(sql_query))
-            if sql_query.strip().lower().startswith("select"):
-                rows = res.fetchall()
-                cols = res.keys()
-                state["query_rows"] = [dict(zip(cols, row)) for row in rows]
-                if rows:
-                    header = ", ".join(cols)
-                    formatted = "; ".join([", ".join([f"{k}: {v}" for k, v in row.items()]) for row in state["query_rows"]])
-                    state["query_result"] = f"{header}\n{formatted}"
-                else:
-                    state["query_result"] = "No results found."
-            else:
-                conn.commit()
-                state["query_result"] = "Action completed successfully."
+        executed_sql = execute_sql(sql_query, state)
         state["sql_error"] = False
     except Exception as e:
+        metrics.sql_errors.inc(type(e).__name__)
+        if state["db_path"] == "plan_cache":
+            plan_cache.invalidate(question)
         state["query_result"] = f"Error executing SQL: {e}"
         state["sql_error"] = True
         state["answer"] = state["query_result"]
-        return {"route": "db", "ok": False, **state}
+        yield {"type": "done", "result": {"route": "db", "ok": False, **state}}
+        return
+
+    # Reuse validated LLM SQL for questions of the same shape; watch for full scans
+    if state["db_path"] == "llm" and plan_cache is not None and is_select(sql_query):
+        plan_cache.store(question, sql_query)
+    if is_select(sql_query):
+        index_advisor.observe(executed_sql)
 
-    # 4️⃣ Human-readable summary
+    # 4️⃣ Human-readable summary: local formatter for small template results
+    local_answer = format_answer(template, state["query_rows"]) if template is not None else None
+    if local_answer is not None:
+        state["answer"] = local_answer
+        print("[DB Agent] path=template (no LLM calls)")
+        metrics.db_paths.inc("template")
+        yield {"type": "done", "result": {"route": "db", "ok": True, **state}}
+        return
+    if template is not None:
+        state["db_path"] = "template+summary"
+    print(f"[DB Agent] path={state['db_path']}")
+    metrics.db_paths.inc(state["db_path"])
     try:
         if state["query_rows"]:
-            system_summary = """
-You are a professional analyst. Convert SQL results into a narrative, story-like, executive summary.
-Highlight key patterns, trends, duplicates, and actionable insights.
-"""
-            human_msg = f"SQL Query:\n{sql_query}\nResult:\n{state['query_result']}"
-            summary_prompt = ChatPromptTemplate.from_messages([
-                ("system", system_summary),
-                ("human", human_msg)
-            ])
-            summary_llm = summary_prompt | groq_llm | StrOutputParser()
-            state["answer"] = summary_llm.invoke({})
+            inputs = {"sql_query": sql_query, "query_result": state["query_result"]}
+            with llm_call("summary") as config:
+                if stream_summary:
+                    parts = []
+                    for token in summary_llm.get().stream(inputs, config=config):
+                        parts.append(token)
+                        yield {"type": "token", "text": token}
+                    state["answer"] = "".join(parts)
+                else:
+                    state["answer"] = summary_llm.get().invoke(inputs, config=config)
         else:
             state["answer"] = state["query_result"]
     except Exception as e:
         state["answer"] = state["query_result"]
 
-    return {"route": "db", "ok": True, **state}
+    yield {"type": "done", "result": {"route": "db", "ok": True, **state}}
+
+
+def run_db_agent(question: str) -> Dict:
+    for event in stream_db_agent(question, stream_summary=False):
+        if event["type"] == "done":
+            return event["result"]
@@ -0,0 +1,49 @@
+import os
+import threading
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.embedding_service import EMBEDDING_SOCKET, RemoteEmbeddings
+
+# -----------------------------
+# Local sentence embeddings
+# -----------------------------
+# Same model the KB ingestion uses, loaded lazily on first use so importing the
+# agents stays cheap. With EMBEDDING_SOCKET set, the embedding service encodes
+# instead and this process never loads the model.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+_model = None
+_model_lock = threading.Lock()
+_remote = RemoteEmbeddings(EMBEDDING_SOCKET, normalize=True) if EMBEDDING_SOCKET else None
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL)
+                print(f"[Embeddings] Loaded {EMBEDDING_MODEL}")
+    return _model
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Return L2-normalised float32 embeddings, one row per text."""
+    if EMBEDDING_SOCKET:
+        return _remote.encode(list(texts), normalize=True)
+    vectors = get_model().encode(list(texts), normalize_embeddings=True, show_progress_bar=False)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+class SentenceEmbeddings(Embeddings):
+    """LangChain view of embed_texts, so the in-process KB pipeline reuses this model."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return embed_texts(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return embed_texts([text])[0].tolist()
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+# -----------------------------
+# Configuration
+# -----------------------------
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_ADVISOR_PATH = os.getenv("INDEX_ADVISOR_PATH", os.path.join(PROJECT_DIR, "index_advisor.db"))
+INDEX_ADVISOR_ENABLED = os.getenv("INDEX_ADVISOR_ENABLED", "true").lower() == "true"
+# Full scans on the same filter columns before an index is recommended
+MIN_SCANS = int(os.getenv("INDEX_ADVISOR_MIN_SCANS", "3"))
+# Columns with fewer distinct values than this are too unselective to index
+MIN_DISTINCT = int(os.getenv("INDEX_ADVISOR_MIN_DISTINCT", "10"))
+MAX_INDEX_COLUMNS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    table_name TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    last_seen REAL NOT NULL,
+    example_sql TEXT NOT NULL,
+    PRIMARY KEY (table_name, columns)
+);
+"""
+
+CLAUSE_END = r"\b(?:GROUP\s+BY|ORDER\s+BY|LIMIT|HAVING|UNION)\b"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def index_name(table_name: str, columns: Tuple[str, ...]) -> str:
+    suffix = "_".join(re.sub(r"\W+", "_", c.lower()) for c in columns)
+    return f"idx_{table_name}_{suffix}"
+
+
+def create_index_sql(table_name: str, columns: Tuple[str, ...]) -> str:
+    cols = ", ".join(_quote(c) for c in columns)
+    return f"CREATE INDEX IF NOT EXISTS {_quote(index_name(table_name, columns))} ON {_quote(table_name)}({cols})"
+
+
+# -----------------------------
+# Index advisor
+# -----------------------------
+class IndexAdvisor:
+    """Records which filter columns keep causing full table scans.
+
+    Every executed SELECT is run through EXPLAIN QUERY PLAN (once per distinct
+    SQL string). When the plan scans a table while the WHERE clause filters it
+    with =, <, >, IN, BETWEEN or IS on selective columns, that column set is
+    counted; after MIN_SCANS such queries an index on it is recommended.
+    """
+
+    def __init__(self, engine, catalog, path: str = INDEX_ADVISOR_PATH,
+                 min_scans: int = MIN_SCANS, min_distinct: int = MIN_DISTINCT):
+        self.engine = engine
+        self.catalog = catalog
+        self.min_scans = min_scans
+        self.min_distinct = min_distinct
+        self._lock = threading.Lock()
+        self._explained: "OrderedDict[str, List[Tuple[str, Tuple[str, ...]]]]" = OrderedDict()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.executescript(SCHEMA)
+
+    def _filter_columns(self, sql: str, table_name: str) -> Tuple[str, ...]:
+        """Selective columns of the table used in index-friendly WHERE predicates, equality first."""
+        m = re.search(r"\bWHERE\b(.*?)(?:" + CLAUSE_END + r"|$)", sql, re.I | re.S)
+        if not m:
+            return ()
+        where = m.group(1)
+        values = self.catalog.column_values(table_name)
+        equality, ranges = [], []
+        for column in self.catalog.columns(table_name):
+            if column in values and len(values[column]) < self.min_distinct:
+                continue
+            ref = rf'(?:"{re.escape(column)}"|`{re.escape(column)}`|\[{re.escape(column)}\]|\b{re.escape(column)}\b)'
+            if re.search(ref + r"\s*(?:=|\bIN\b|\bIS\b)", where, re.I):
+                equality.append(column)
+            elif re.search(ref + r"\s*(?:<|>|\bBETWEEN\b)", where, re.I):
+                ranges.append(column)
+        # B-tree order: equality columns, then at most one range column
+        return tuple((equality + ranges[:1])[:MAX_INDEX_COLUMNS])
+
+    def explain(self, sql: str) -> List[Tuple[str, Tuple[str, ...]]]:
+        """(table, filter columns) for every full table scan in the query plan."""
+        with self.engine.connect() as conn:
+            plan = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        tables = set(self.catalog.table_names())
+        scans = []
+        for row in plan:
+            m = re.match(r"SCAN (?:TABLE )?(\w+)$", row[-1].strip())
+            if m and m.group(1) in tables:
+                columns = self._filter_columns(sql, m.group(1))
+                if columns:
+                    scans.append((m.group(1), columns))
+        return scans
+
+    def observe(self, sql: str) -> None:
+        """Check one executed query; never raises into the caller."""
+        if not INDEX_ADVISOR_ENABLED or not sql.strip().lower().startswith("select"):
+            return
+        try:
+            with self._lock:
+                scans = self._explained.get(sql)
+                if scans is not None:
+                    self._explained.move_to_end(sql)
+            if scans is None:
+                scans = self.explain(sql)
+                with self._lock:
+                    self._explained[sql] = scans
+                    if len(self._explained) > 1000:
+                        self._explained.popitem(last=False)
+            if not scans:
+                return
+            with self._lock, self._conn:
+                for table_name, columns in scans:
+                    self._conn.execute(
+                        "INSERT INTO scans(table_name, columns, count, last_seen, example_sql) VALUES (?, ?, 1, ?, ?) "
+                        "ON CONFLICT(table_name, columns) DO UPDATE SET count = count + 1, last_seen = excluded.last_seen, "
+                        "example_sql = excluded.example_sql",
+                        (table_name, json.dumps(columns), time.time(), sql),
+                    )
+            print(f"[Index Advisor] Full scan filtered on {[list(c) for _, c in scans]}")
+        except Exception as e:
+            print(f"[Index Advisor] Could not explain query: {e}")
+
+    def _existing_indexes(self, table_name: str) -> List[Tuple[str, ...]]:
+        with self.engine.connect() as conn:
+            names = [row[1] for row in conn.execute(text(f"PRAGMA index_list({_quote(table_name)})"))]
+            return [
+                tuple(row[2] for row in conn.execute(text(f"PRAGMA index_info({_quote(name)})")))
+                for name in names
+            ]
+
+    def recommendations(self) -> List[Dict]:
+        """Indexes worth creating, most frequently scanned first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT table_name, columns, count, example_sql FROM scans WHERE count >= ? ORDER BY count DESC",
+                (self.min_scans,),
+            ).fetchall()
+        recommended = []
+        existing: Dict[str, List[Tuple[str, ...]]] = {}
+        for table_name, columns_json, count, example in rows:
+            columns = tuple(json.loads(columns_json))
+            if table_name not in existing:
+                existing[table_name] = self._existing_indexes(table_name)
+            # An index whose leading columns match already serves the filter
+            if any(idx[:len(columns)] == columns for idx in existing[table_name]):
+                continue
+            recommended.append({
+                "table": table_name,
+                "columns": list(columns),
+                "scans": count,
+                "example_sql": example,
+                "create_sql": create_index_sql(table_name, columns),
+            })
+        return recommended
+
+    def apply(self, db_file: str, recommendations: Optional[List[Dict]] = None) -> List[str]:
+        """Create the recommended indexes (admin action; uses its own writable connection)."""
+        created = []
+        conn = sqlite3.connect(db_file, timeout=30)
+        try:
+            for rec in recommendations if recommendations is not None else self.recommendations():
+                start = time.perf_counter()
+                with conn:
+                    conn.execute(rec["create_sql"])
+                    conn.execute(f"ANALYZE {_quote(rec['table'])}")
+                print(f"[Index Advisor] {rec['create_sql']} ({time.perf_counter() - start:.1f}s)")
+                created.append(rec["create_sql"])
+        finally:
+            conn.close()
+        return created
+
+
+def main():
+    from .database import DATABASE_FILE, read_engine
+    from .schema_catalog import get_catalog
+
+    parser = argparse.ArgumentParser(description="Show or create indexes recommended from repeated full scans.")
+    parser.add_argument("--apply", action="store_true", help="Create the recommended indexes")
+    args = parser.parse_args()
+
+    advisor = IndexAdvisor(read_engine, get_catalog(read_engine))
+    recommendations = advisor.recommendations()
+    print(json.dumps(recommendations, indent=2))
+    if args.apply and recommendations:
+        advisor.apply(DATABASE_FILE, recommendations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from typing import Dict
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from utils import llm_gateway, metrics
+from utils.lazy import LazyResource
+
+# -----------------------------
+# Shared Groq client
+# -----------------------------
+# One client for the router and the SQL agent, built on first use so importing
+# the graph does not pay for langchain_groq up front. Its requests go through
+# the LLM gateway (shared pool, rate-limit budget, retries, coalescing)
+MODEL_NAME = "llama-3.3-70b-versatile"
+
+
+def _load_groq():
+    return llm_gateway.chat_model(model=MODEL_NAME, temperature=0.0)
+
+
+groq_llm = LazyResource("groq_llm", _load_groq)
+
+
+# -----------------------------
+# Instrumentation
+# -----------------------------
+class LLMUsage(BaseCallbackHandler):
+    """Records the token usage Groq reports for one call."""
+
+    def __init__(self, call: str, span):
+        self.call = call
+        self.span = span
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        usage: Dict = (response.llm_output or {}).get("token_usage") or {}
+        if not usage:
+            try:
+                meta = response.generations[0][0].message.usage_metadata or {}
+                usage = {"prompt_tokens": meta.get("input_tokens"), "completion_tokens": meta.get("output_tokens")}
+            except (AttributeError, IndexError):
+                return
+        prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        if prompt is not None:
+            metrics.llm_tokens.observe(prompt, self.call, "prompt")
+        if completion is not None:
+            metrics.llm_tokens.observe(completion, self.call, "completion")
+        self.span.set(prompt_tokens=prompt, completion_tokens=completion)
+
+
+@contextmanager
+def llm_call(call: str):
+    """Span llm.<call> around one LLM call; yields the invoke config that records its tokens.
+
+    The call name is also the gateway purpose, which sets its priority for rate-limit budget.
+
+    with llm_call("route") as config:
+        chain.invoke(inputs, config=config)
+    """
+    with llm_gateway.purpose(call), metrics.span(f"llm.{call}") as span:
+        if not metrics.METRICS_ENABLED and metrics.current_trace() is None:
+            yield None
+            return
+        try:
+            yield {"callbacks": [LLMUsage(call, span)]}
+        except Exception:
+            metrics.llm_calls.inc(call, "error")
+            raise
+        metrics.llm_calls.inc(call, "ok")
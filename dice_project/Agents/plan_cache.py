@@ -0,0 +1,232 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# -----------------------------
+# Configuration
+# -----------------------------
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", os.path.join(PROJECT_DIR, "plan_cache.db"))
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true"
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "2000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    shape TEXT NOT NULL,
+    schema_sig TEXT NOT NULL,
+    template TEXT NOT NULL,
+    example_question TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (shape, schema_sig)
+);
+"""
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+
+class Literal(NamedTuple):
+    kind: str                 # "number", "text", "synonym" or "value:<column>"
+    text: str                 # Value as it should be bound into SQL
+    variants: Tuple[str, ...] = ()  # Synonym expansions, e.g. ("Pakistan", "PK", "PAK")
+
+
+# -----------------------------
+# Question shapes
+# -----------------------------
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s<>:]", " ", text.lower())).strip()
+
+
+def question_shape(question: str, values: Dict[str, List[str]],
+                   synonyms: Dict[str, List[str]]) -> Tuple[str, List[Literal]]:
+    """Replace the literals of a question with typed placeholders.
+
+    "How many complaints from Pakistan by people over 40" and "... from United
+    Kingdom ... over 30" share the shape "how many complaints from <synonym>
+    by people over <number>" and differ only in their literal lists.
+    """
+    spans: List[Tuple[int, int, Literal]] = []
+
+    def free(start: int, end: int) -> bool:
+        return all(end <= s or start >= e for s, e, _ in spans)
+
+    def collect(pattern: str, make, flags=0) -> None:
+        for m in re.finditer(pattern, question, flags):
+            if free(m.start(), m.end()):
+                spans.append((m.start(), m.end(), make(m)))
+
+    collect(r"'([^']+)'|\"([^\"]+)\"", lambda m: Literal("text", m.group(1) or m.group(2)))
+    for key, variants in sorted(synonyms.items(), key=lambda kv: -len(kv[0])):
+        collect(rf"\b{re.escape(key)}\b", lambda m, k=key, v=variants: Literal("synonym", k, tuple(v)), re.I)
+    candidates = [(value, column) for column, vals in values.items() for value in vals if len(value) >= 3]
+    for value, column in sorted(candidates, key=lambda vc: -len(vc[0])):
+        collect(rf"\b{re.escape(value)}\b", lambda m, v=value, c=column: Literal(f"value:{c}", v), re.I)
+    collect(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])", lambda m: Literal("number", m.group(0)))
+
+    spans.sort(key=lambda s: s[0])
+    parts, pos = [], 0
+    for start, end, literal in spans:
+        parts.append(question[pos:start])
+        parts.append(f" <{literal.kind}> ")
+        pos = end
+    parts.append(question[pos:])
+    return _normalize("".join(parts)), [literal for _, _, literal in spans]
+
+
+# -----------------------------
+# SQL templates
+# -----------------------------
+def _marker(i: int, k: Optional[int] = None) -> str:
+    return f"{{{{p{i}}}}}" if k is None else f"{{{{p{i}.{k}}}}}"
+
+
+def parameterize(sql: str, literals: List[Literal]) -> Optional[str]:
+    """Swap each question literal in the SQL for a placeholder.
+
+    Returns None when a literal cannot be located in the SQL (or two literals
+    are identical), since the query could then not be safely re-bound.
+    """
+    if len({(l.kind, l.text.lower()) for l in literals}) != len(literals):
+        return None
+    found = [0] * len(literals)
+
+    def in_strings(text: str) -> str:
+        for i, literal in enumerate(literals):
+            if literal.kind == "number":
+                continue
+            variants = literal.variants or (literal.text,)
+            for k, variant in sorted(enumerate(variants), key=lambda kv: -len(kv[1])):
+                marker = _marker(i, k) if literal.variants else _marker(i)
+                text, n = re.subn(rf"(?<!\w){re.escape(variant.replace(chr(39), chr(39) * 2))}(?!\w)",
+                                  marker, text, flags=re.I)
+                found[i] += n
+        return text
+
+    def outside_strings(text: str) -> str:
+        for i, literal in enumerate(literals):
+            if literal.kind == "number":
+                text, n = re.subn(rf"(?<![\w.]){re.escape(literal.text)}(?![\w.])", _marker(i), text)
+                found[i] += n
+        return text
+
+    parts, pos = [], 0
+    for m in STRING_LITERAL.finditer(sql):
+        parts.append(outside_strings(sql[pos:m.start()]))
+        parts.append(in_strings(m.group(0)))
+        pos = m.end()
+    parts.append(outside_strings(sql[pos:]))
+    if not all(found):
+        return None
+    return "".join(parts)
+
+
+def bind(template: str, literals: List[Literal]) -> Optional[str]:
+    """Fill a template with a new question's literals; None if they don't fit."""
+    sql = template
+    for i, literal in enumerate(literals):
+        if literal.kind == "number":
+            sql = sql.replace(_marker(i), literal.text)
+        elif literal.variants:
+            for k, variant in enumerate(literal.variants):
+                sql = sql.replace(_marker(i, k), variant.replace("'", "''"))
+        else:
+            sql = sql.replace(_marker(i), literal.text.replace("'", "''"))
+    # A synonym with fewer variants than the cached one leaves markers behind
+    return None if "{{p" in sql else sql
+
+
+# -----------------------------
+# Plan cache
+# -----------------------------
+class PlanCache:
+    """Normalized question shape -> parameterized SQL, persisted to SQLite.
+
+    Only SQL that executed successfully is stored, and entries are keyed by a
+    signature of the table's columns so a schema change starts a fresh cache.
+    """
+
+    def __init__(self, catalog, synonyms: Dict[str, List[str]], table_name: str = "customer_complaints",
+                 path: str = PLAN_CACHE_PATH, max_entries: int = PLAN_CACHE_MAX_ENTRIES):
+        self.catalog = catalog
+        self.synonyms = synonyms
+        self.table_name = table_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def _schema_sig(self) -> str:
+        return hashlib.sha256(self.catalog.columns_block(self.table_name).encode("utf-8")).hexdigest()[:16]
+
+    def _shape(self, question: str) -> Tuple[str, List[Literal]]:
+        return question_shape(question, self.catalog.column_values(self.table_name), self.synonyms)
+
+    def lookup(self, question: str) -> Optional[str]:
+        """SQL for the question re-bound from a cached plan, or None."""
+        shape, literals = self._shape(question)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT template FROM plans WHERE shape = ? AND schema_sig = ?", (shape, self._schema_sig())
+            ).fetchone()
+            sql = bind(row[0], literals) if row else None
+            if sql is None:
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE plans SET hits = hits + 1, last_used = ? WHERE shape = ? AND schema_sig = ?",
+                    (time.time(), shape, self._schema_sig()),
+                )
+            self.hits += 1
+        print(f"[Plan Cache] Hit for shape '{shape}'")
+        return sql
+
+    def store(self, question: str, sql: str) -> bool:
+        """Remember a validated query; returns whether it could be parameterized."""
+        shape, literals = self._shape(question)
+        template = parameterize(sql, literals)
+        if template is None:
+            print(f"[Plan Cache] Not cached, literals not found in SQL for shape '{shape}'")
+            return False
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO plans(shape, schema_sig, template, example_question, hits, created, last_used) "
+                    "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                    (shape, self._schema_sig(), template, question, now, now),
+                )
+                self._conn.execute(
+                    "DELETE FROM plans WHERE rowid IN (SELECT rowid FROM plans ORDER BY last_used DESC "
+                    "LIMIT -1 OFFSET ?)", (self.max_entries,)
+                )
+            self.stores += 1
+        return True
+
+    def invalidate(self, question: str) -> None:
+        """Drop the plan a question was served from, e.g. after it failed to execute."""
+        shape, _ = self._shape(question)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM plans WHERE shape = ?", (shape,))
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
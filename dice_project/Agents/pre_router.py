@@ -0,0 +1,258 @@
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import Field
+
+from .router_agent import RouteDecision, route_question, schema_catalog
+from .embeddings import embed_texts
+from utils import metrics
+
+# -----------------------------
+# Configuration
+# -----------------------------
+PRE_ROUTER_ENABLED = os.getenv("PRE_ROUTER_ENABLED", "true").lower() == "true"
+KEYWORD_THRESHOLD = float(os.getenv("PRE_ROUTER_KEYWORD_THRESHOLD", "0.75"))
+EMBEDDING_THRESHOLD = float(os.getenv("PRE_ROUTER_EMBEDDING_THRESHOLD", "0.80"))
+# Used to estimate savings until the first real LLM routing call has been timed
+LLM_BASELINE_MS = float(os.getenv("PRE_ROUTER_LLM_BASELINE_MS", "500"))
+
+TABLE_NAME = "customer_complaints"
+
+# Words that usually mean the user wants numbers out of the table
+AGGREGATE_CUES = [
+    "how many", "number of", "count", "average", "avg", "mean", "total", "sum",
+    "maximum", "minimum", "oldest", "youngest", "percentage", "percent", "ratio",
+    "list", "show", "top", "most", "least", "per", "by gender", "breakdown",
+]
+
+# Extra surface forms for columns whose names rarely appear verbatim in questions
+COLUMN_ALIASES = {
+    "Complaint Resolved": ["resolved", "unresolved", "open complaints", "closed complaints", "pending"],
+    "Age": ["age", "aged", "older", "younger", "years old"],
+    "Gender": ["gender", "men", "women"],
+    "first_name": ["first name", "customer name", "customers named"],
+    "last_name": ["last name", "surname"],
+}
+
+EXEMPLARS = {
+    "db": [
+        "How many complaints are unresolved?",
+        "How many customers complained about their credit card?",
+        "Show complaints by gender",
+        "What is the average age of customers with complaints?",
+        "List all complaints from London",
+        "Which complaints have not been resolved yet?",
+        "How many female customers raised a complaint?",
+        "Give me the emails of customers whose complaint is resolved",
+        "What are the most common complaints?",
+        "Count complaints about delayed salary credit",
+        "Who is the oldest customer with an open complaint?",
+        "Show customers with the last name Johnson",
+    ],
+    "kb": [
+        "What is GlobalBank?",
+        "How do I open a savings account?",
+        "What documents do I need to apply for a loan?",
+        "What are the bank's opening hours?",
+        "How can I reset my online banking password?",
+        "What data does the bank store about me?",
+        "How long does an international transfer take?",
+        "What is the process to raise a complaint?",
+        "Does GlobalBank offer student accounts?",
+        "What are the fees for a debit card replacement?",
+        "Who founded GlobalBank?",
+        "How is my personal data protected?",
+    ],
+}
+
+
+class TieredDecision(RouteDecision):
+    tier: str = Field(default="llm", description="Which router tier produced the decision.")
+    confidence: float = Field(default=1.0, description="Confidence of the tier in its decision.")
+
+
+# -----------------------------
+# Stats
+# -----------------------------
+class RouterStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = {"keyword": 0, "embedding": 0, "llm": 0}
+        self.latency_ms: Dict[str, float] = {"keyword": 0.0, "embedding": 0.0, "llm": 0.0}
+
+    def record(self, tier: str, elapsed_ms: float) -> None:
+        with self._lock:
+            self.hits[tier] += 1
+            self.latency_ms[tier] += elapsed_ms
+
+    def llm_mean_ms(self) -> float:
+        if self.hits["llm"]:
+            return self.latency_ms["llm"] / self.hits["llm"]
+        return LLM_BASELINE_MS
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            total = sum(self.hits.values())
+            llm_mean = self.llm_mean_ms()
+            tiers = {}
+            for tier, hits in self.hits.items():
+                mean = self.latency_ms[tier] / hits if hits else 0.0
+                saved = 0.0 if tier == "llm" else hits * max(llm_mean - mean, 0.0)
+                tiers[tier] = {
+                    "hits": hits,
+                    "hit_rate": hits / total if total else 0.0,
+                    "mean_ms": round(mean, 3),
+                    "saved_ms": round(saved, 1),
+                }
+            return {
+                "questions": total,
+                "llm_mean_ms": round(llm_mean, 1),
+                "local_hit_rate": (total - self.hits["llm"]) / total if total else 0.0,
+                "tiers": tiers,
+            }
+
+
+# -----------------------------
+# Tiered router
+# -----------------------------
+def _tokens(question: str) -> List[str]:
+    # Inner "." and "'" keep emails, decimals and contractions whole; sentence
+    # punctuation and quotes around a word are stripped so "unresolved." still matches
+    tokens = (token.strip(".'") for token in re.findall(r"[a-z0-9@.']+", question.lower()))
+    return [token for token in tokens if token]
+
+
+def _phrases(tokens: List[str], max_len: int = 3) -> set:
+    return {" ".join(tokens[i:i + n]) for n in range(1, max_len + 1) for i in range(len(tokens) - n + 1)}
+
+
+class TieredRouter:
+    """Keyword match, then exemplar embeddings, then the LLM router."""
+
+    def __init__(self, keyword_threshold: float = KEYWORD_THRESHOLD,
+                 embedding_threshold: float = EMBEDDING_THRESHOLD):
+        self.keyword_threshold = keyword_threshold
+        self.embedding_threshold = embedding_threshold
+        self.stats = RouterStats()
+        self._exemplars: Optional[Tuple[np.ndarray, List[str]]] = None
+        self._embeddings_available = True
+        self._vocab: Optional[Tuple[int, set, set]] = None
+        self._lock = threading.Lock()
+
+    # Tier 1: column names and values of customer_complaints
+    def _vocabulary(self) -> Tuple[set, set]:
+        schema_catalog.refresh()
+        if self._vocab is not None and self._vocab[0] == schema_catalog.loads:
+            return self._vocab[1], self._vocab[2]
+        columns = set()
+        for name in schema_catalog.columns(TABLE_NAME):
+            columns.add(name.lower().replace("_", " "))
+            columns.update(alias.lower() for alias in COLUMN_ALIASES.get(name, []))
+        values = {
+            value.lower()
+            for col_values in schema_catalog.column_values(TABLE_NAME).values()
+            for value in col_values
+            if len(value) > 2
+        }
+        self._vocab = (schema_catalog.loads, columns, values)
+        return columns, values
+
+    def keyword_score(self, question: str) -> float:
+        phrases = _phrases(_tokens(question))
+        columns, values = self._vocabulary()
+        column_hits = len(phrases & columns)
+        value_hits = len(phrases & values)
+        if not column_hits and not value_hits:
+            return 0.0
+        text = question.lower()
+        cue_hits = sum(1 for cue in AGGREGATE_CUES if re.search(rf"\b{re.escape(cue)}\b", text))
+        score = 0.25 * column_hits + 0.35 * value_hits + 0.3 * min(cue_hits, 2)
+        if "customer" in text or "complaints" in text:
+            score += 0.2
+        return min(score, 1.0)
+
+    # Tier 2: nearest labelled exemplar questions
+    def _exemplar_matrix(self) -> Tuple[np.ndarray, List[str]]:
+        if self._exemplars is None:
+            with self._lock:
+                if self._exemplars is None:
+                    labels = [label for label, qs in EXEMPLARS.items() for _ in qs]
+                    questions = [q for qs in EXEMPLARS.values() for q in qs]
+                    self._exemplars = (embed_texts(questions), labels)
+        return self._exemplars
+
+    def embedding_score(self, question: str) -> Tuple[str, float]:
+        matrix, labels = self._exemplar_matrix()
+        sims = matrix @ embed_texts([question])[0]
+        best = {}
+        for label in EXEMPLARS:
+            label_sims = np.sort(sims[[i for i, l in enumerate(labels) if l == label]])[-3:]
+            best[label] = float(label_sims.mean())
+        # Softmax over the per-label top-3 similarity with a sharp temperature
+        route = max(best, key=best.get)
+        scores = np.array(list(best.values())) / 0.05
+        probs = np.exp(scores - scores.max())
+        return route, float(probs.max() / probs.sum())
+
+    def route_local(self, question: str) -> Optional[TieredDecision]:
+        """Keyword and embedding tiers only; None when neither is confident enough."""
+        if not PRE_ROUTER_ENABLED:
+            return None
+        start = time.perf_counter()
+        try:
+            score = self.keyword_score(question)
+            if score >= self.keyword_threshold:
+                return self._decide("db", "keyword", score, start)
+        except Exception as e:
+            print(f"[Pre-Router] Keyword tier failed: {e}")
+
+        if self._embeddings_available:
+            try:
+                route, confidence = self.embedding_score(question)
+                if confidence >= self.embedding_threshold:
+                    return self._decide(route, "embedding", confidence, start)
+            except ImportError as e:
+                self._embeddings_available = False
+                print(f"[Pre-Router] Embedding tier disabled: {e}")
+            except Exception as e:
+                print(f"[Pre-Router] Embedding tier failed: {e}")
+        return None
+
+    def route_llm(self, question: str) -> TieredDecision:
+        start = time.perf_counter()
+        decision = route_question(question)
+        return self._decide(decision.route, "llm", 1.0, start)
+
+    def route(self, question: str) -> TieredDecision:
+        return self.route_local(question) or self.route_llm(question)
+
+    def _decide(self, route: str, tier: str, confidence: float, start: float) -> TieredDecision:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats.record(tier, elapsed_ms)
+        metrics.route_decisions.inc(tier, route)
+        print(f"[Pre-Router] tier={tier} route={route} confidence={confidence:.2f} ({elapsed_ms:.1f} ms)")
+        return TieredDecision(route=route, tier=tier, confidence=confidence)
+
+
+tiered_router = TieredRouter()
+
+
+def pre_route(question: str) -> TieredDecision:
+    return tiered_router.route(question)
+
+
+def pre_route_local(question: str) -> Optional[TieredDecision]:
+    return tiered_router.route_local(question)
+
+
+def llm_route(question: str) -> TieredDecision:
+    return tiered_router.route_llm(question)
+
+
+def router_stats() -> Dict:
+    """Hit rate, mean latency and estimated LLM time saved per tier."""
+    return tiered_router.stats.snapshot()
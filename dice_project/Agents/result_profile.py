@@ -0,0 +1,113 @@
+from collections import Counter
+from typing import Any, Dict, List, Sequence
+
+
+# -----------------------------
+# Incremental column statistics
+# -----------------------------
+class ColumnProfile:
+    """Running statistics for one result column, updated a batch at a time.
+
+    Distinct values are tracked exactly up to max_distinct; past that the
+    distinct count is reported as a lower bound and top values only keep
+    counting the values already seen.
+    """
+
+    def __init__(self, name: str, max_distinct: int = 1000, top_k: int = 5):
+        self.name = name
+        self.max_distinct = max_distinct
+        self.top_k = top_k
+        self.count = 0
+        self.nulls = 0
+        self.minimum: Any = None
+        self.maximum: Any = None
+        self.total = 0.0
+        self.numeric = 0
+        self.values: Counter = Counter()
+        self.overflow = False
+
+    def add(self, values: Sequence[Any]) -> None:
+        """Fold a batch of values into the statistics."""
+        self.count += len(values)
+        present = [v for v in values if v is not None]
+        self.nulls += len(values) - len(present)
+        if not present:
+            return
+        numbers = [v for v in present if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        self.total += sum(numbers)
+        self.numeric += len(numbers)
+        candidates = present if self.minimum is None else present + [self.minimum, self.maximum]
+        try:
+            self.minimum, self.maximum = min(candidates), max(candidates)
+        except TypeError:
+            # Mixed types in one column (SQLite allows it): fall back to text order
+            as_text = [str(v) for v in candidates]
+            self.minimum, self.maximum = min(as_text), max(as_text)
+        if not self.overflow and len(self.values) + len(present) <= self.max_distinct:
+            self.values.update(present)
+            return
+        for i, value in enumerate(present):
+            if value not in self.values:
+                if len(self.values) >= self.max_distinct:
+                    self.overflow = True
+                    # Full: from here on only count values already tracked
+                    self.values.update([v for v in present[i:] if v in self.values])
+                    return
+            self.values[value] += 1
+
+    def to_dict(self) -> Dict:
+        profile = {
+            "column": self.name,
+            "count": self.count,
+            "nulls": self.nulls,
+            "distinct": f"{len(self.values)}+" if self.overflow else len(self.values),
+            "min": self.minimum,
+            "max": self.maximum,
+        }
+        if self.numeric:
+            profile["mean"] = round(self.total / self.numeric, 3)
+        # Top values only say something when values repeat
+        if self.values and self.values.most_common(1)[0][1] > 1:
+            profile["top_values"] = [[value, n] for value, n in self.values.most_common(self.top_k)]
+        return profile
+
+
+class ResultProfile:
+    """Row count, per-column statistics and a leading sample of a query result."""
+
+    def __init__(self, columns: Sequence[str], sample_size: int = 20,
+                 max_distinct: int = 1000, top_k: int = 5):
+        self.columns = list(columns)
+        self.sample_size = sample_size
+        self.rows = 0
+        self.sample: List[Dict] = []
+        self._profiles = [ColumnProfile(c, max_distinct, top_k) for c in self.columns]
+
+    def add(self, rows: Sequence[Sequence]) -> None:
+        """Fold a batch of rows into the profile."""
+        if not rows:
+            return
+        self.rows += len(rows)
+        for profile, values in zip(self._profiles, zip(*rows)):
+            profile.add(values)
+        for row in rows[:self.sample_size - len(self.sample)]:
+            self.sample.append(dict(zip(self.columns, row)))
+
+    def to_dict(self) -> Dict:
+        return {"rows": self.rows, "columns": [p.to_dict() for p in self._profiles]}
+
+    def to_text(self, truncated: bool = False) -> str:
+        """Compact description for the summary prompt instead of the full result."""
+        total = f"at least {self.rows:,}" if truncated else f"{self.rows:,}"
+        lines = [f"{total} rows, columns: {', '.join(self.columns)}", "Column profile:"]
+        for p in self._profiles:
+            stats = p.to_dict()
+            line = f"- {p.name}: distinct={stats['distinct']}, nulls={stats['nulls']}, min={stats['min']}, max={stats['max']}"
+            if "mean" in stats:
+                line += f", mean={stats['mean']}"
+            if "top_values" in stats:
+                line += ", top=" + ", ".join(f"{v} ({n})" for v, n in stats["top_values"])
+            lines.append(line)
+        lines.append(f"First {len(self.sample)} rows:")
+        lines.extend(", ".join(f"{k}: {v}" for k, v in row.items()) for row in self.sample)
+        return "\n".join(lines)
@@ -1,10 +1,12 @@
 import os
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from sqlalchemy import create_engine, inspect
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 
+from .database import read_engine
+from .llm import groq_llm, llm_call
+from .schema_catalog import get_catalog
+
 # Load environment variables
 load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -12,9 +14,9 @@ if not GROQ_API_KEY:
     raise EnvironmentError("GROQ_API_KEY not found in environment variables.")
 os.environ["GROQ_API_KEY"] = GROQ_API_KEY
 
-# Database setup
-DATABASE_PATH = "sqlite:///./customer_complaints.db"
-engine = create_engine(DATABASE_PATH)
+# Database setup (shared read-only engine)
+engine = read_engine
+schema_catalog = get_catalog(engine)
 
 # Define structured output model
 class RouteDecision(BaseModel):
@@ -23,28 +25,8 @@ class RouteDecision(BaseModel):
     )
 
 def get_database_schema() -> str:
-    """Retrieve and format the database schema as a string."""
-    inspector = inspect(engine)
-    schema_lines = []
-    
-    for table_name in inspector.get_table_names():
-        schema_lines.append(f"Table: {table_name}")
-        for column in inspector.get_columns(table_name):
-            col_type = str(column["type"])
-            if column.get("primary_key"):
-                col_type += ", Primary Key"
-            if column.get("foreign_keys"):
-                fk = list(column["foreign_keys"])[0]
-                col_type += f", Foreign Key to {fk.column.table.name}.{fk.column.name}"
-            schema_lines.append(f"- {column['name']}: {col_type}")
-        schema_lines.append("")  # Blank line between tables
-    
-    schema = "\n".join(schema_lines)
-    print("Retrieved database schema.")
-    return schema
-
-# Initialize LLM
-groq_llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0.0)
+    """Return the cached, formatted database schema string."""
+    return schema_catalog.router_schema()
 
 def route_question(question: str) -> RouteDecision:
     """
@@ -71,9 +53,10 @@ Respond with only "db" if from database or "kb" if not from database.
         ]
     )
 
-    structured_llm = groq_llm.with_structured_output(RouteDecision)
+    structured_llm = groq_llm.get().with_structured_output(RouteDecision)
     relevance_checker = check_prompt | structured_llm
 
-    result: RouteDecision = relevance_checker.invoke({})
+    with llm_call("route") as config:
+        result: RouteDecision = relevance_checker.invoke({}, config=config)
     print(f"Relevance determined: {result.route}")
     return result
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+
+from .database import file_version
+
+# -----------------------------
+# Schema catalog
+# -----------------------------
+# Introspects the database once and keeps the rendered prompt blocks in memory.
+# The snapshot is rebuilt only when the database file (or its -wal file) or
+# PRAGMA schema_version changes, so prompt text stays byte-identical between
+# requests.
+SCHEMA_CHECK_INTERVAL = float(os.getenv("SCHEMA_CHECK_INTERVAL", "5"))
+
+
+class SchemaCatalog:
+    def __init__(self, engine, check_interval: float = SCHEMA_CHECK_INTERVAL):
+        self.engine = engine
+        self.check_interval = check_interval
+        self.db_file = engine.url.database
+        if self.db_file and self.db_file.startswith("file:"):
+            self.db_file = self.db_file[len("file:"):]  # URI connection (uri=true)
+        self._lock = threading.Lock()
+        self._fingerprint: Optional[Tuple] = None
+        self._file_state: Optional[str] = None
+        self._last_check = 0.0
+        self._tables: List[str] = []
+        self._columns: Dict[str, List[dict]] = {}
+        self._column_blocks: Dict[str, str] = {}
+        self._router_schema = ""
+        self._values: Dict[Tuple[str, int], Dict[str, List[str]]] = {}
+        self.loads = 0
+
+    # -----------------------------
+    # Invalidation
+    # -----------------------------
+    def _file_state_now(self) -> Optional[str]:
+        if not self.db_file or self.db_file == ":memory:":
+            return None
+        return file_version(self.db_file)
+
+    def _schema_version(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(text("PRAGMA schema_version")).scalar()
+
+    def _is_stale(self) -> bool:
+        if self._fingerprint is None:
+            return True
+        state = self._file_state_now()
+        now = time.monotonic()
+        # Only pay for the PRAGMA when the file changed or the interval elapsed
+        if state == self._file_state and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        self._file_state = state
+        return (state, self._schema_version()) != self._fingerprint
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._fingerprint = None
+
+    def refresh(self) -> None:
+        """Re-introspect the database if it changed since the last snapshot."""
+        with self._lock:
+            if self._is_stale():
+                self._load()
+
+    # -----------------------------
+    # Introspection
+    # -----------------------------
+    def _load(self) -> None:
+        file_state = self._file_state_now()
+        version = self._schema_version()
+        inspector = inspect(self.engine)
+
+        hidden = self._virtual_tables()
+        tables = [t for t in inspector.get_table_names() if t not in hidden]
+        columns = {table: inspector.get_columns(table) for table in tables}
+
+        self._tables = tables
+        self._columns = columns
+        self._column_blocks = {
+            table: "\n".join([f'- "{col["name"]}" {col["type"]}' for col in cols])
+            for table, cols in columns.items()
+        }
+        self._router_schema = self._render_router_schema(tables, columns)
+        self._values = {}
+        self._file_state = file_state
+        self._fingerprint = (file_state, version)
+        self._last_check = time.monotonic()
+        self.loads += 1
+        print(f"[Schema Catalog] Loaded {len(tables)} table(s), schema_version={version}")
+
+    def _virtual_tables(self) -> set:
+        """Virtual tables (e.g. the FTS5 text index) and their shadow tables; not part of the schema prompt."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'table'")).fetchall()
+        virtual = [name for name, sql in rows if (sql or "").upper().startswith("CREATE VIRTUAL TABLE")]
+        return {name for name, _ in rows if any(name == v or name.startswith(f"{v}_") for v in virtual)}
+
+    @staticmethod
+    def _render_router_schema(tables: List[str], columns: Dict[str, List[dict]]) -> str:
+        schema_lines = []
+        for table_name in tables:
+            schema_lines.append(f"Table: {table_name}")
+            for column in columns[table_name]:
+                col_type = str(column["type"])
+                if column.get("primary_key"):
+                    col_type += ", Primary Key"
+                if column.get("foreign_keys"):
+                    fk = list(column["foreign_keys"])[0]
+                    col_type += f", Foreign Key to {fk.column.table.name}.{fk.column.name}"
+                schema_lines.append(f"- {column['name']}: {col_type}")
+            schema_lines.append("")  # Blank line between tables
+        return "\n".join(schema_lines)
+
+    # -----------------------------
+    # Accessors
+    # -----------------------------
+    def table_names(self) -> List[str]:
+        self.refresh()
+        return list(self._tables)
+
+    def columns(self, table_name: str) -> Dict[str, str]:
+        self.refresh()
+        return {col["name"]: str(col["type"]) for col in self._columns[table_name]}
+
+    def columns_block(self, table_name: str) -> str:
+        self.refresh()
+        return self._column_blocks[table_name]
+
+    def router_schema(self) -> str:
+        self.refresh()
+        return self._router_schema
+
+    def column_values(self, table_name: str, max_distinct: int = 50) -> Dict[str, List[str]]:
+        """Distinct values of the low-cardinality text columns of a table."""
+        self.refresh()
+        key = (table_name, max_distinct)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = self._load_values(table_name, max_distinct)
+            return self._values[key]
+
+    def _load_values(self, table_name: str, max_distinct: int) -> Dict[str, List[str]]:
+        values = {}
+        with self.engine.connect() as conn:
+            for col in self._columns[table_name]:
+                col_type = str(col["type"]).upper()
+                if "CHAR" not in col_type and "TEXT" not in col_type:
+                    continue
+                rows = conn.execute(text(
+                    f'SELECT DISTINCT "{col["name"]}" FROM "{table_name}" '
+                    f'WHERE "{col["name"]}" IS NOT NULL LIMIT {max_distinct + 1}'
+                )).fetchall()
+                if len(rows) <= max_distinct:
+                    values[col["name"]] = [str(row[0]) for row in rows]
+        return values
+
+
+_catalogs: Dict[str, SchemaCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(engine) -> SchemaCatalog:
+    """Return the process-wide catalog for an engine, creating it on first use."""
+    key = str(engine.url)
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog = SchemaCatalog(engine)
+            _catalogs[key] = catalog
+        return catalog
@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# Start the DB and KB branches alongside the LLM router when the local router tiers are unsure
+SPECULATIVE_ROUTING = os.getenv("SPECULATIVE_ROUTING", "false").lower() == "true"
+# Branches started before the route is known; the other one runs after routing as usual
+SPECULATIVE_BRANCHES = [b.strip() for b in os.getenv("SPECULATIVE_BRANCHES", "db,kb").split(",") if b.strip()]
+# Questions speculating at once; beyond this, questions route first and run one branch
+SPECULATION_MAX_IN_FLIGHT = int(os.getenv("SPECULATION_MAX_IN_FLIGHT", "4"))
+STALE_SECONDS = 600
+
+
+# -----------------------------
+# Cancellation
+# -----------------------------
+class SpeculationTracker:
+    """Per-question cancel and winner flags shared by the router and the speculative branches.
+
+    LangGraph runs the branches as separate nodes, so they find their flags
+    through the speculation id kept in the graph state.
+    """
+
+    def __init__(self, max_in_flight: int = SPECULATION_MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        # spec id -> (started, cancel flags, winner flags), each keyed by branch
+        self._active: Dict[str, Tuple[float, Dict[str, threading.Event], Dict[str, threading.Event]]] = {}
+
+    def start(self) -> Optional[str]:
+        """A new speculation id, or None when too many questions are already speculating."""
+        now = time.time()
+        with self._lock:
+            # A run that died between fan-out and merge must not hold its slot forever
+            for key in [k for k, (started, *_) in self._active.items() if now - started > STALE_SECONDS]:
+                del self._active[key]
+            if len(self._active) >= self.max_in_flight:
+                return None
+            spec_id = uuid.uuid4().hex
+            self._active[spec_id] = (now, {"db": threading.Event(), "kb": threading.Event()},
+                                     {"db": threading.Event(), "kb": threading.Event()})
+            return spec_id
+
+    def flag(self, spec_id: str, branch: str) -> threading.Event:
+        with self._lock:
+            entry = self._active.get(spec_id)
+        # An unknown id (finished or purged) behaves as already cancelled
+        if entry is None:
+            event = threading.Event()
+            event.set()
+            return event
+        return entry[1][branch]
+
+    def won(self, spec_id: str, branch: str) -> threading.Event:
+        """Set once the router picked this branch."""
+        with self._lock:
+            entry = self._active.get(spec_id)
+        return entry[2][branch] if entry is not None else threading.Event()
+
+    def cancel(self, spec_id: str, branch: str) -> None:
+        self.flag(spec_id, branch).set()
+
+    def choose(self, spec_id: str, branch: str) -> None:
+        """The router decided: cancel the other branch and let this one stream."""
+        self.cancel(spec_id, "kb" if branch == "db" else "db")
+        self.won(spec_id, branch).set()
+
+    def finish(self, spec_id: str) -> None:
+        with self._lock:
+            self._active.pop(spec_id, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._active)
+
+
+def run_branch(events: Iterator[Dict], cancel: threading.Event, answer: Callable[[Dict], object],
+               defer: Optional[Callable[[Dict], bool]] = None, won: Optional[threading.Event] = None,
+               emit: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """Drain an agent's event stream until its "done" event or until cancelled.
+
+    The flag is checked between events (SQL generated, each summary or KB
+    token), and closing the generator stops the LLM stream or KB request.
+    When defer(event) is true the branch stops too, leaving the work to the
+    routed (non-speculative) node. With emit, events are held back until the
+    router picks this branch (won), then passed on, earlier ones first.
+    """
+    start = time.perf_counter()
+    held: List[Dict] = []
+
+    def release() -> None:
+        for held_event in held:
+            emit(held_event)
+        held.clear()
+
+    try:
+        for event in events:
+            if cancel.is_set():
+                events.close()
+                return {"cancelled": True, "elapsed_ms": (time.perf_counter() - start) * 1000}
+            if defer is not None and defer(event):
+                events.close()
+                return {"deferred": True, "elapsed_ms": (time.perf_counter() - start) * 1000}
+            won_now = emit is not None and won is not None and won.is_set()
+            if won_now:
+                release()
+            if event["type"] == "done":
+                return {"answer": answer(event), "elapsed_ms": (time.perf_counter() - start) * 1000}
+            if won_now:
+                emit(event)
+            elif emit is not None:
+                held.append(event)
+        return {"error": "Branch ended without an answer", "elapsed_ms": (time.perf_counter() - start) * 1000}
+    except Exception as e:
+        return {"error": str(e), "elapsed_ms": (time.perf_counter() - start) * 1000}
+
+
+# -----------------------------
+# Stats
+# -----------------------------
+class SpeculationStats:
+    """How often speculation ran and what it bought.
+
+    saved_ms: latency hidden by overlapping routing with the winning branch
+    (sequential would have been route + branch, speculative is the longer of
+    the two). wasted_ms: time spent in losing branches before they stopped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.speculated = 0
+        self.skipped_busy = 0
+        self.winners = {"db": 0, "kb": 0}
+        self.routing_failures = 0
+        self.combined = 0
+        self.losers_cancelled = 0
+        self.losers_finished = 0
+        self.not_speculated_winner = 0
+        self.saved_ms = 0.0
+        self.wasted_ms = 0.0
+
+    def record(self, winner: Optional[str], route_ms: float, branches: Dict[str, Dict],
+               routing_failed: bool, combined: bool) -> None:
+        with self._lock:
+            self.speculated += 1
+            self.routing_failures += routing_failed
+            self.combined += combined
+            if winner:
+                self.winners[winner] += 1
+                if winner in branches and "answer" in branches[winner]:
+                    self.saved_ms += min(route_ms, branches[winner]["elapsed_ms"])
+                else:
+                    self.not_speculated_winner += 1
+            for name, branch in branches.items():
+                if name == winner or combined:
+                    continue
+                self.wasted_ms += branch.get("elapsed_ms", 0.0)
+                if branch.get("cancelled") or branch.get("deferred"):
+                    self.losers_cancelled += 1
+                else:
+                    self.losers_finished += 1
+
+    def skipped(self) -> None:
+        with self._lock:
+            self.skipped_busy += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": SPECULATIVE_ROUTING,
+                "branches": SPECULATIVE_BRANCHES,
+                "speculated": self.speculated,
+                "skipped_busy": self.skipped_busy,
+                "winners": dict(self.winners),
+                "routing_failures": self.routing_failures,
+                "combined": self.combined,
+                "losers_cancelled": self.losers_cancelled,
+                "losers_finished": self.losers_finished,
+                "winner_not_speculated": self.not_speculated_winner,
+                "saved_ms": round(self.saved_ms, 1),
+                "wasted_ms": round(self.wasted_ms, 1),
+                "mean_saved_ms": round(self.saved_ms / self.speculated, 1) if self.speculated else 0.0,
+                "mean_wasted_ms": round(self.wasted_ms / self.speculated, 1) if self.speculated else 0.0,
+            }
+
+
+tracker = SpeculationTracker()
+stats = SpeculationStats()
+
+
+def speculation_stats() -> Dict:
+    return dict(stats.snapshot(), in_flight=tracker.in_flight())
+
+
+def speculative_targets() -> List[str]:
+    return [f"{branch}_spec" for branch in SPECULATIVE_BRANCHES if branch in ("db", "kb")]
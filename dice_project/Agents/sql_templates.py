@@ -0,0 +1,262 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+# -----------------------------
+# Configuration
+# -----------------------------
+SQL_TEMPLATES_ENABLED = os.getenv("SQL_TEMPLATES_ENABLED", "true").lower() == "true"
+# Larger results still go to the summary LLM
+TEMPLATE_MAX_ROWS = int(os.getenv("SQL_TEMPLATE_MAX_ROWS", "20"))
+
+# Surface forms for grouping / aggregating by a column, on top of its own name
+COLUMN_ALIASES = {
+    "Complaint Resolved": ["resolution status", "resolution", "status", "resolved status"],
+    "Complaint": ["complaint type", "complaint types", "issue", "issues", "complaint"],
+    "Gender": ["gender", "sex"],
+    "Age": ["age"],
+}
+
+# Phrases that select a value of a low-cardinality column
+VALUE_ALIASES = {
+    "Complaint Resolved": {
+        "not resolved": "No", "unresolved": "No", "open": "No", "pending": "No", "outstanding": "No",
+        "resolved": "Yes", "closed": "Yes",
+    },
+    "Gender": {
+        "female": "Female", "females": "Female", "women": "Female", "woman": "Female",
+        "male": "Male", "males": "Male", "men": "Male", "man": "Male",
+    },
+}
+
+AGGREGATES = {
+    "average": "AVG", "avg": "AVG", "mean": "AVG",
+    "minimum": "MIN", "min": "MIN", "lowest": "MIN",
+    "maximum": "MAX", "max": "MAX", "highest": "MAX",
+    "total": "SUM", "sum": "SUM",
+}
+AGGREGATE_WORDS = {"AVG": "average", "MIN": "minimum", "MAX": "maximum", "SUM": "total"}
+
+COUNT_CUES = ["how many", "number of", "count of", "count", "total number of"]
+GROUP_CUES = ["broken down by", "breakdown by", "grouped by", "for each", "by", "per", "across"]
+
+# Words that may appear around a template without changing its meaning.
+# Anything else means the question says more than the template can express.
+FILLER = {
+    "what", "whats", "is", "are", "was", "were", "the", "of", "a", "an", "there", "do", "does",
+    "we", "i", "have", "has", "had", "been", "with", "who", "whose", "that", "which", "in", "on",
+    "all", "and", "show", "me", "give", "tell", "please", "customer", "customers", "complaint",
+    "complaints", "raised", "filed", "made", "submitted", "still", "yet", "currently", "now",
+    "total", "overall", "s", "for", "it", "its", "their", "our", "database", "table", "records",
+    "rows", "people", "users", "clients", "many", "how", "value", "distribution", "split", "among",
+}
+
+AGE_FILTERS = [
+    (r"\b(?:between|aged between) (\d+) and (\d+)\b", "BETWEEN"),
+    (r"\b(?:over|above|older than|more than|greater than) (\d+)(?: years old| years)?\b", ">"),
+    (r"\b(?:under|below|younger than|less than) (\d+)(?: years old| years)?\b", "<"),
+    (r"\b(?:aged|age) (\d+)\b", "="),
+]
+
+
+class TemplateMatch(BaseModel):
+    sql_query: str = Field(description="SQL produced by the template.")
+    kind: str = Field(description="'count', 'aggregate' or 'group'.")
+    column: str = Field(default="", description="Aggregated or grouped column.")
+    function: str = Field(default="", description="Aggregate function (COUNT, AVG, MIN, MAX, SUM).")
+    aggregate_column: str = Field(default="", description="Column the function is applied to, if not COUNT.")
+    filters: List[str] = Field(default_factory=list, description="Readable WHERE conditions.")
+    limit: Optional[int] = None
+
+
+# -----------------------------
+# Matching
+# -----------------------------
+def _normalize(question: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", question.lower().replace("'", ""))).strip()
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _consume(text: str, phrase: str) -> Tuple[str, bool]:
+    """Remove the first whole-word occurrence of phrase from text."""
+    new, n = re.subn(rf"\b{re.escape(phrase)}\b", " ", text, count=1)
+    return new, bool(n)
+
+
+def _column_phrases(columns: Dict[str, str]) -> List[Tuple[str, str]]:
+    """(phrase, column) pairs, longest phrase first so "complaint resolved" beats "complaint"."""
+    pairs = []
+    for name in columns:
+        pairs.append((name.lower().replace("_", " "), name))
+        pairs.extend((alias, name) for alias in COLUMN_ALIASES.get(name, []))
+    return sorted(pairs, key=lambda p: -len(p[0]))
+
+
+def _is_numeric(col_type: str) -> bool:
+    return any(t in col_type.upper() for t in ("INT", "REAL", "FLOA", "DOUB", "NUM", "DEC"))
+
+
+def match_template(question: str, catalog, table_name: str = "customer_complaints") -> Optional[TemplateMatch]:
+    """Map a simple count / aggregate / group-by question to SQL, or None.
+
+    Only matches when every word of the question is accounted for by the
+    template, a filter, or harmless filler, so anything more specific falls
+    through to the LLM.
+    """
+    columns = catalog.columns(table_name)
+    if not columns:
+        return None
+    values = catalog.column_values(table_name)
+    phrases = _column_phrases(columns)
+    text = f" {_normalize(question)} "
+
+    # Filters: known values of low-cardinality columns, then age ranges
+    where, filters = [], []
+    for column, aliases in VALUE_ALIASES.items():
+        if column not in values:
+            continue
+        for phrase, value in sorted(aliases.items(), key=lambda p: -len(p[0])):
+            if value not in values[column]:
+                continue
+            text, hit = _consume(text, phrase)
+            if hit:
+                where.append(f"{_quote(column)} = {_literal(value)}")
+                filters.append(f"{column} is {value}")
+                break
+    for column, col_values in values.items():
+        for value in sorted(col_values, key=len, reverse=True):
+            if column in VALUE_ALIASES or len(value) < 3:
+                continue
+            text, hit = _consume(text, _normalize(value))
+            if hit:
+                where.append(f"{_quote(column)} = {_literal(value)}")
+                filters.append(f"{column} is {value}")
+                break
+    if "Age" in columns:
+        for pattern, op in AGE_FILTERS:
+            m = re.search(pattern, text)
+            if not m:
+                continue
+            text = text[:m.start()] + " " + text[m.end():]
+            if op == "BETWEEN":
+                where.append(f'"Age" BETWEEN {int(m.group(1))} AND {int(m.group(2))}')
+                filters.append(f"Age between {m.group(1)} and {m.group(2)}")
+            else:
+                where.append(f'"Age" {op} {int(m.group(1))}')
+                filters.append(f"Age {op} {m.group(1)}")
+            break
+
+    # Group-by column ("by gender", "top 5 complaints", "most common complaints")
+    group_col, limit = None, None
+    m = re.search(r"\b(?:top (\d+)|most common|most frequent)\b", text)
+    if m:
+        limit = int(m.group(1)) if m.group(1) else 5
+        text = text[:m.start()] + " " + text[m.end():]
+        for phrase, name in phrases:
+            text, hit = _consume(text, phrase)
+            if hit:
+                group_col = name
+                break
+        if group_col is None:
+            group_col = "Complaint" if "Complaint" in columns else None
+    else:
+        for cue in GROUP_CUES:
+            for phrase, name in phrases:
+                text, hit = _consume(text, f"{cue} {phrase}")
+                if hit:
+                    group_col = name
+                    break
+            if group_col:
+                break
+
+    # Aggregate over a numeric column ("average age")
+    function, agg_col = None, None
+    numeric = [name for name, col_type in columns.items() if _is_numeric(col_type)]
+    for word, fn in AGGREGATES.items():
+        for phrase, name in phrases:
+            if name not in numeric:
+                continue
+            text, hit = _consume(text, f"{word} {phrase}")
+            if hit:
+                function, agg_col = fn, name
+                break
+        if function:
+            break
+
+    counted = False
+    for cue in COUNT_CUES:
+        text, hit = _consume(text, cue)
+        counted = counted or hit
+
+    if group_col is None and function is None and not counted:
+        return None
+    leftover = [w for w in text.split() if w not in FILLER]
+    if leftover:
+        return None
+
+    where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+    table = _quote(table_name)
+    if group_col:
+        measure = f"ROUND({function}({_quote(agg_col)}), 1)" if function else "COUNT(*)"
+        alias = f"{AGGREGATE_WORDS[function]}_{agg_col.lower()}" if function else "complaints"
+        sql = (f"SELECT {_quote(group_col)}, {measure} AS {alias} FROM {table}{where_sql} "
+               f"GROUP BY {_quote(group_col)} ORDER BY {alias} DESC")
+        if limit:
+            sql += f" LIMIT {limit}"
+        return TemplateMatch(sql_query=sql, kind="group", column=group_col, function=function or "COUNT",
+                             aggregate_column=agg_col or "", filters=filters, limit=limit)
+    if function:
+        sql = f"SELECT ROUND({function}({_quote(agg_col)}), 1) AS value FROM {table}{where_sql}"
+        return TemplateMatch(sql_query=sql, kind="aggregate", column=agg_col, function=function, filters=filters)
+    sql = f"SELECT COUNT(*) AS complaints FROM {table}{where_sql}"
+    return TemplateMatch(sql_query=sql, kind="count", filters=filters)
+
+
+# -----------------------------
+# Local answer formatting
+# -----------------------------
+def _where_text(filters: List[str]) -> str:
+    return f" where {' and '.join(filters)}" if filters else ""
+
+
+def _number(value) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return f"{value:,.1f}"
+    return f"{int(value):,}" if value is not None else "n/a"
+
+
+def format_answer(match: TemplateMatch, rows: List[Dict]) -> Optional[str]:
+    """Plain-language answer for a template result, or None if it is too large to format."""
+    if match.kind == "count":
+        count = rows[0]["complaints"] if rows else 0
+        noun = "complaint" if count == 1 else "complaints"
+        return f"There {'is' if count == 1 else 'are'} **{_number(count)}** {noun}{_where_text(match.filters)}."
+
+    if match.kind == "aggregate":
+        value = rows[0]["value"] if rows else None
+        word = AGGREGATE_WORDS[match.function]
+        return f"The {word} {match.column} is **{_number(value)}**{_where_text(match.filters)}."
+
+    if not rows or len(rows) > TEMPLATE_MAX_ROWS:
+        return None
+    measure = [key for key in rows[0] if key != match.column][0]
+    header = f"| {match.column} | {measure.replace('_', ' ').capitalize()} |"
+    lines = [header, "|---|---:|"] + [f"| {row[match.column]} | {_number(row[measure])} |" for row in rows]
+    if match.function == "COUNT":
+        total = sum(row[measure] or 0 for row in rows)
+        lead = f"{_number(total)} complaints by {match.column}{_where_text(match.filters)}"
+        if match.limit:
+            lead = f"Top {len(rows)} {match.column} values{_where_text(match.filters)}"
+    else:
+        lead = (f"{AGGREGATE_WORDS[match.function].capitalize()} {match.aggregate_column} "
+                f"by {match.column}{_where_text(match.filters)}")
+    return f"{lead}:\n\n" + "\n".join(lines)
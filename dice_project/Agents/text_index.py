@@ -0,0 +1,278 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# -----------------------------
+# Configuration
+# -----------------------------
+TEXT_INDEX_ENABLED = os.getenv("TEXT_INDEX_ENABLED", "true").lower() == "true"
+# Trigram tokens make FTS5 answer substring queries, which is what LIKE '%...%' asks for
+FTS_TOKENIZER = "trigram"
+MIN_PATTERN_LENGTH = 3  # shortest substring a trigram index can look up
+# Comma-separated columns to index; empty means every text column. Trigram
+# indexes are large (~0.7 KB/row over all text columns), so narrow this on big tables.
+TEXT_INDEX_COLUMNS = [c.strip() for c in os.getenv("TEXT_INDEX_COLUMNS", "").split(",") if c.strip()]
+
+
+def fts_table(table_name: str) -> str:
+    return f"{table_name}_fts"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _text_columns(conn: sqlite3.Connection, table_name: str) -> List[str]:
+    rows = conn.execute(f"PRAGMA table_info({_quote(table_name)})").fetchall()
+    columns = [row[1] for row in rows if "CHAR" in row[2].upper() or "TEXT" in row[2].upper() or row[2] == ""]
+    if TEXT_INDEX_COLUMNS:
+        columns = [c for c in columns if c in TEXT_INDEX_COLUMNS]
+    return columns
+
+
+def _indexed_columns(conn: sqlite3.Connection, table_name: str) -> Optional[List[str]]:
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table(table_name),)
+    ).fetchone()
+    if not exists:
+        return None
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(fts_table(table_name))})")]
+
+
+def _in_sync(conn: sqlite3.Connection, table_name: str) -> bool:
+    """Whether the index still refers to the table's rows.
+
+    The index points at rows by rowid, and VACUUM renumbers the rowids of a
+    table without an INTEGER PRIMARY KEY, after which MATCH returns the wrong
+    rows. Count, max and sum of the rowids on both sides catch that in one
+    pass over each, far cheaper than FTS5's integrity-check.
+    """
+    docsize = _quote(fts_table(table_name) + "_docsize")
+    indexed = conn.execute(f"SELECT COUNT(*), MAX(id), TOTAL(id) FROM {docsize}").fetchone()
+    table = conn.execute(f"SELECT COUNT(*), MAX(rowid), TOTAL(rowid) FROM {_quote(table_name)}").fetchone()
+    return indexed == table
+
+
+# -----------------------------
+# Index maintenance
+# -----------------------------
+def _trigger_sql(table_name: str, columns: List[str]) -> List[str]:
+    fts, src = _quote(fts_table(table_name)), _quote(table_name)
+    cols = ", ".join(_quote(c) for c in columns)
+    new = ", ".join(f"new.{_quote(c)}" for c in columns)
+    old = ", ".join(f"old.{_quote(c)}" for c in columns)
+    name = fts_table(table_name)
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old});"
+    insert_new = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.rowid, {new});"
+    return [
+        f"CREATE TRIGGER {_quote(name + '_ai')} AFTER INSERT ON {src} BEGIN {insert_new} END",
+        f"CREATE TRIGGER {_quote(name + '_ad')} AFTER DELETE ON {src} BEGIN {delete_old} END",
+        f"CREATE TRIGGER {_quote(name + '_au')} AFTER UPDATE ON {src} BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def _drop(conn: sqlite3.Connection, table_name: str) -> None:
+    name = fts_table(table_name)
+    for suffix in ("_ai", "_ad", "_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {_quote(name + suffix)}")
+    conn.execute(f"DROP TABLE IF EXISTS {_quote(name)}")
+
+
+def ensure_text_index(db_file: str, table_name: str = "customer_complaints", rebuild: bool = False) -> bool:
+    """Create (or recreate after a schema change) the FTS5 shadow index of a table's text columns.
+
+    The index is an external-content FTS5 table kept in sync by insert/update/
+    delete triggers, so after the first build it is maintained incrementally,
+    at the cost of extra work on every write to the table. Building it writes
+    to the database and takes minutes on millions of rows, so it is an admin
+    step (python -m Agents.text_index), never run while answering a question.
+    An index left out of sync by a VACUUM is rebuilt. Returns whether the
+    index is usable.
+    """
+    if not TEXT_INDEX_ENABLED or not os.path.exists(db_file):
+        return False
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        columns = _text_columns(conn, table_name)
+        if not columns:
+            return False
+        if not rebuild and _indexed_columns(conn, table_name) == columns and _in_sync(conn, table_name):
+            return True
+
+        start = time.perf_counter()
+        fts, cols = _quote(fts_table(table_name)), ", ".join(_quote(c) for c in columns)
+        with conn:
+            _drop(conn, table_name)
+            conn.execute(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content={_quote(table_name)}, "
+                f"content_rowid='rowid', tokenize='{FTS_TOKENIZER}')"
+            )
+            for statement in _trigger_sql(table_name, columns):
+                conn.execute(statement)
+            conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        print(f"[Text Index] Built {fts_table(table_name)} over {len(columns)} column(s) "
+              f"in {time.perf_counter() - start:.1f}s")
+        return True
+    except sqlite3.Error as e:
+        # FTS5 or the trigram tokenizer (SQLite >= 3.34) may be missing from the build
+        print(f"[Text Index] Disabled, LIKE queries will scan: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def vacuum(db_file: str, table_name: str = "customer_complaints") -> bool:
+    """VACUUM the database and rebuild the text index it renumbered, as one admin step."""
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    print(f"[Text Index] Vacuumed {os.path.basename(db_file)} in {time.perf_counter() - start:.1f}s")
+    return ensure_text_index(db_file, table_name, rebuild=True)
+
+
+# -----------------------------
+# Query rewriting
+# -----------------------------
+class LikeRewriter:
+    """Turns substring LIKE filters on indexed columns into FTS5 MATCH lookups.
+
+    Only rewrites single-table queries over the indexed table whose WHERE
+    clause is a single pattern of the form '%literal%' with a literal long
+    enough for trigram lookup. With further filters, or for unordered LIMIT
+    queries, the scan is as fast or faster (benchmarks/text_search.py), so
+    those are left for SQLite to scan as before.
+    """
+
+    def __init__(self, table_name: str, columns: List[str]):
+        self.table_name = table_name
+        self.fts = fts_table(table_name)
+        self.columns = {c.lower(): c for c in columns}
+        table = re.escape(table_name)
+        self._from = re.compile(
+            rf'\bFROM\s+(?:"{table}"|`{table}`|\[{table}\]|{table})\s*(?:$|;|\)|WHERE\b|GROUP\b|ORDER\b|LIMIT\b|HAVING\b)',
+            re.I,
+        )
+        column = r'(?:"[^"]+"|`[^`]+`|\[[^\]]+\]|[A-Za-z_]\w*)'
+        # NOT LIKE is left alone: NOT IN would also return rows whose column is NULL
+        self._like = re.compile(
+            rf"(?<![\w\"])(?:LOWER\s*\(\s*(?P<lcol>{column})\s*\)|(?P<col>{column}))\s+"
+            r"(?<!NOT )LIKE\s+'%(?P<text>(?:[^'%_]|'')+)%'",
+            re.I,
+        )
+        self._where = re.compile(
+            r"\bWHERE\b(?P<condition>.*?)(?:\bGROUP\s+BY\b|\bHAVING\b|\bORDER\s+BY\b|\bLIMIT\b|;|$)",
+            re.I | re.S,
+        )
+
+    def _applies(self, sql: str) -> bool:
+        if re.search(r"\bJOIN\b", sql, re.I):
+            return False
+        # An unordered LIMIT query stops scanning at the first matches, which
+        # beats collecting every index hit first
+        if re.search(r"\bLIMIT\b", sql, re.I) and not re.search(
+            r"\b(?:ORDER\s+BY|GROUP\s+BY|DISTINCT|COUNT|SUM|AVG|MIN|MAX)\b", sql, re.I
+        ):
+            return False
+        froms = re.findall(r"\bFROM\b", sql, re.I)
+        return len(froms) == 1 and self._from.search(sql) is not None and self._sole_predicate(sql)
+
+    def _sole_predicate(self, sql: str) -> bool:
+        """Whether the WHERE clause is one LIKE and nothing else."""
+        where = self._where.search(sql)
+        if where is None:
+            return False
+        condition = where.group("condition").strip()
+        while condition.startswith("(") and condition.endswith(")"):
+            condition = condition[1:-1].strip()
+        return self._like.fullmatch(condition) is not None
+
+    def _replace(self, m: re.Match) -> str:
+        column = self.columns.get((m.group("lcol") or m.group("col")).strip('"`[]').lower())
+        literal = m.group("text").replace("''", "'")
+        if column is None or len(literal) < MIN_PATTERN_LENGTH:
+            return m.group(0)
+        phrase = '"' + literal.replace('"', '""') + '"'
+        query = f"{_quote(column)} : {phrase}".replace("'", "''")
+        return f"rowid IN (SELECT rowid FROM {_quote(self.fts)} WHERE {_quote(self.fts)} MATCH '{query}')"
+
+    def rewrite(self, sql: str) -> str:
+        if not self._applies(sql):
+            return sql
+        return self._like.sub(self._replace, sql)
+
+
+def find_rewriter(db_file: str, table_name: str = "customer_complaints") -> Optional[LikeRewriter]:
+    """A rewriter for the table's existing, in-sync text index, or None; read-only, never builds the index."""
+    if not TEXT_INDEX_ENABLED or not os.path.exists(db_file):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+        try:
+            columns = _indexed_columns(conn, table_name)
+            if columns and not _in_sync(conn, table_name):
+                print(f"[Text Index] {fts_table(table_name)} is out of sync with {table_name} (VACUUM?), "
+                      "LIKE queries will scan; rebuild it with python -m Agents.text_index --rebuild")
+                return None
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"[Text Index] Could not check for {fts_table(table_name)}: {e}")
+        return None
+    return LikeRewriter(table_name, columns) if columns else None
+
+
+_rewriters: Dict[str, Tuple[int, Optional[LikeRewriter]]] = {}
+_rewriters_lock = threading.Lock()
+
+
+def rewrite_like_queries(sql: str, db_file: str, table_name: str = "customer_complaints",
+                         schema_version: int = 0) -> str:
+    """Rewrite LIKE '%...%' filters to use the FTS5 index, if one has been built.
+
+    Whether the index exists is checked on first use and again whenever
+    schema_version changes, e.g. the schema catalog's load counter.
+    """
+    cached = _rewriters.get(table_name)
+    if cached is None or cached[0] != schema_version:
+        with _rewriters_lock:
+            cached = _rewriters.get(table_name)
+            if cached is None or cached[0] != schema_version:
+                cached = _rewriters[table_name] = (schema_version, find_rewriter(db_file, table_name))
+    rewriter = cached[1]
+    if rewriter is None:
+        return sql
+    rewritten = rewriter.rewrite(sql)
+    if rewritten != sql:
+        print(f"[Text Index] Rewrote LIKE to MATCH: {rewritten}")
+    return rewritten
+
+
+def main():
+    from .database import DATABASE_FILE, DB_ALLOW_WRITES
+
+    parser = argparse.ArgumentParser(description="Build the FTS5 trigram index used for LIKE '%...%' queries.")
+    parser.add_argument("--table", default="customer_complaints")
+    parser.add_argument("--rebuild", action="store_true", help="Drop and rebuild an existing index")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="VACUUM the database, then rebuild the index (VACUUM renumbers the rows it points at)")
+    args = parser.parse_args()
+
+    if not DB_ALLOW_WRITES:
+        raise SystemExit("[Text Index] Building the index writes to the database; set DB_ALLOW_WRITES=true.")
+    if args.vacuum:
+        built = vacuum(DATABASE_FILE, args.table)
+    else:
+        built = ensure_text_index(DATABASE_FILE, args.table, rebuild=args.rebuild)
+    if not built:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,26 @@
 import requests
 import streamlit as st
-from Agents.app_graph import build_app
+from Agents.app_graph import build_cached_app
+from Agents.db_agent import fetch_result_page, index_advisor, plan_cache
+from Agents.database import database_stats
+from Agents.pre_router import router_stats
+from Agents.speculation import speculation_stats
+from utils.metrics import start_metrics_server, trace_request
 
 st.set_page_config(page_title="DB & KB Chatbot", page_icon="🤖", layout="wide")
 st.title("🤖 Chatbot with Database & Knowledge Base Agents")
 
 API_URL = "http://localhost:8000/ingestion-pipeline"
+JOBS_URL = "http://localhost:8000/ingestion-jobs"
 
 # -----------------------------
 # Graph (Cached)
 # -----------------------------
 @st.cache_resource
 def get_graph():
-    return build_app()
+    # Prometheus scrape target for this process when METRICS_PORT is set
+    start_metrics_server()
+    return build_cached_app()
 
 graph = get_graph()
 
@@ -22,8 +30,12 @@ graph = get_graph()
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
-if "upload_progress" not in st.session_state:
-    st.session_state.upload_progress = 0
+if "ingestion_jobs" not in st.session_state:
+    st.session_state.ingestion_jobs = []
+
+# Result pages already fetched for the chat history: (sql, page, page_size) -> page
+if "result_pages" not in st.session_state:
+    st.session_state.result_pages = {}
 
 if "uploading_files" not in st.session_state:
     st.session_state.uploading_files = False
@@ -39,33 +51,91 @@ with st.sidebar:
 
     def ingest_files(files):
         st.session_state.uploading_files = True
-        for i, f in enumerate(files, start=1):
+        for f in files:
             try:
-                files_data = {"file": (f.name, f.read(), f.type)}
+                # Stream the upload instead of copying it into a bytes object first
+                files_data = {"file": (f.name, f, f.type)}
                 response = requests.post(API_URL, files=files_data)
-                if response.status_code == 200:
-                    st.success(f"✅ {f.name} ingested successfully!")
+                if response.status_code in (200, 202):
+                    job_id = response.json()["job_id"]
+                    st.session_state.ingestion_jobs.append({"job_id": job_id, "name": f.name})
                 else:
                     detail = response.json().get("detail", response.text)
-                    st.error(f"❌ Failed to ingest {f.name}: {detail}")
+                    st.error(f"❌ Failed to queue {f.name}: {detail}")
             except Exception as e:
                 st.error(f"⚠️ Error ingesting {f.name}: {e}")
-            st.session_state.upload_progress = i / len(files)
-        st.balloons()
-        st.session_state.upload_progress = 0
         st.session_state.uploading_files = False
 
+    def jobs_pending():
+        return any("final" not in job for job in st.session_state.ingestion_jobs)
+
+    def show_ingestion_jobs(polling):
+        """Poll the job API and show each upload's progress; finished jobs are not polled again."""
+        finished = 0
+        for job in st.session_state.ingestion_jobs:
+            status = job.get("final")
+            if status is None:
+                try:
+                    status = requests.get(f"{JOBS_URL}/{job['job_id']}", timeout=5).json()
+                except Exception as e:
+                    st.warning(f"⚠️ {job['name']}: status unavailable ({e})")
+                    continue
+                if status.get("status") in ("done", "failed"):
+                    job["final"] = status
+            if status.get("status") == "done":
+                finished += 1
+                st.success(f"✅ {job['name']} ingested ({status['chunks']} chunks)")
+            elif status.get("status") == "failed":
+                finished += 1
+                st.error(f"❌ Failed to ingest {job['name']}: {status.get('error')}")
+            else:
+                chunks = f" ({status['chunks']} chunks so far)" if status.get("chunks") else ""
+                st.info(f"⏳ {job['name']}: {status.get('stage', 'queued')}{chunks}")
+        st.progress(finished / len(st.session_state.ingestion_jobs))
+        if polling and not jobs_pending():
+            # Everything finished: rerun the app so the fragment is registered without its timer
+            st.rerun()
+
     if uploaded_files:
         if not st.session_state.uploading_files:
             st.button("Start Upload", on_click=ingest_files, args=(uploaded_files,))
-        if st.session_state.upload_progress > 0:
-            st.progress(st.session_state.upload_progress)
+
+    if st.session_state.ingestion_jobs:
+        # Refresh every 2 s only while a job is queued or running
+        polling = jobs_pending()
+        st.fragment(run_every="2s" if polling else None)(show_ingestion_jobs)(polling)
+        if st.button("Clear upload list"):
+            st.session_state.ingestion_jobs = []
+            st.rerun()
 
 # -----------------------------
 # Chat Layout
 # -----------------------------
 chat_col, control_col = st.columns([3, 1])
 
+def show_result_pages(idx, answer, page_size=50):
+    """Browse the full result of a DB answer page by page."""
+    total = answer["row_count"]
+    label = f"at least {total:,}" if answer.get("truncated") else f"{total:,}"
+    with st.expander(f"📄 Results (Q{idx}, {label} rows)"):
+        # Every rerun redraws the whole history, so rows are only queried on request and each page once
+        if not st.toggle("Show rows", key=f"show_rows_{idx}"):
+            return
+        page = st.number_input("Page", min_value=1, value=1, step=1, key=f"result_page_{idx}")
+        key = (answer["sql_query"], int(page), page_size)
+        if key not in st.session_state.result_pages:
+            try:
+                st.session_state.result_pages[key] = fetch_result_page(
+                    answer["sql_query"], page=int(page), page_size=page_size
+                )
+            except Exception as e:
+                st.warning(f"⚠️ Results unavailable: {e}")
+                return
+        result = st.session_state.result_pages[key]
+        st.dataframe(result["rows"], use_container_width=True)
+        if not result["has_more"]:
+            st.caption("Last page")
+
 with chat_col:
     st.subheader("💬 Chat with Knowledge Base")
     for idx, chat in enumerate(st.session_state.chat_history, start=1):
@@ -74,12 +144,48 @@ with chat_col:
         if chat["answer"].get("sql_query"):
             with st.expander(f"🔎 SQL Query (Q{idx})"):
                 st.code(chat["answer"]["sql_query"], language="sql")
+            if chat["answer"].get("row_count"):
+                show_result_pages(idx, chat["answer"])
+        if chat["answer"].get("kb_sources"):
+            with st.expander(f"📚 Sources (Q{idx})"):
+                for source in chat["answer"]["kb_sources"]:
+                    page = f", page {int(source['page']) + 1}" if source.get("page") is not None else ""
+                    st.markdown(f"**{source.get('source') or 'Unknown document'}**{page}")
+                    st.caption(source.get("text", ""))
+        if chat.get("trace"):
+            with st.expander(f"⏱️ Trace (Q{idx}, {chat['trace']['total_ms']:.0f} ms)"):
+                st.dataframe(chat["trace"]["spans"], use_container_width=True)
+
+def render_stream(question, state):
+    """Render the answer in the chat column as events arrive; returns the final state."""
+    with chat_col:
+        st.chat_message("user").markdown(question)
+        with st.chat_message("assistant"):
+            status = st.empty()
+            sql_box = st.empty()
+            answer_box = st.empty()
+            status.caption("🤔 Routing...")
+            text, result = "", {}
+            for event in graph.stream_answer(state):
+                if event["type"] == "route":
+                    status.caption(f"Routed to {event['route'].upper()} ({event['route_tier']})")
+                elif event["type"] == "sql":
+                    sql_box.code(event["sql_query"], language="sql")
+                elif event["type"] == "token":
+                    text += event["text"]
+                    answer_box.markdown(text + "▌")
+                elif event["type"] == "done":
+                    result = event["result"]
+            answer_box.markdown(str(result.get("answer", "")))
+    return result
 
 # -----------------------------
 # Control Column
 # -----------------------------
 with control_col:
     st.subheader("Controls")
+    stream_answers = st.toggle("Stream answers", value=True)
+    show_trace = st.toggle("Show request trace", value=False)
 
     # Form with clear_on_submit=True automatically clears input
     with st.form("chat_form", clear_on_submit=True):
@@ -87,17 +193,40 @@ with control_col:
         submitted = st.form_submit_button("Send")
 
         if submitted and q.strip():
-            with st.spinner("🤔 Thinking..."):
-                res = graph.invoke({
-                    "question": q.strip(),
-                    "route": "",
-                    "answer": "",
-                    "sql_query": "",
-                    "query_result": "",
-                    "query_rows": []
-                })
-            st.session_state.chat_history.append({"question": q.strip(), "answer": res})
+            initial_state = {
+                "question": q.strip(),
+                "route": "",
+                "answer": "",
+                "sql_query": "",
+                "query_result": "",
+                "query_rows": []
+            }
+            with trace_request(show_trace) as trace:
+                if stream_answers:
+                    res = render_stream(q.strip(), initial_state)
+                else:
+                    with st.spinner("🤔 Thinking..."):
+                        res = graph.invoke(initial_state)
+            st.session_state.chat_history.append({
+                "question": q.strip(), "answer": res, "trace": trace.to_dict() if trace else None,
+            })
 
     if st.button("🗑️ Clear Chat History"):
         st.session_state.chat_history = []
+        st.session_state.result_pages = {}
         st.success("Chat history cleared!")
+
+    with st.expander("⚡ Routing stats"):
+        st.json(router_stats())
+        st.caption("Speculative DB/KB branches")
+        st.json(speculation_stats())
+
+    with st.expander("🗄️ Database stats"):
+        st.json(database_stats())
+        if plan_cache is not None:
+            st.caption("SQL plan cache")
+            st.json(plan_cache.stats())
+        recommendations = index_advisor.recommendations()
+        if recommendations:
+            st.caption("Recommended indexes (create with `python -m Agents.index_advisor --apply`)")
+            st.code(";\n".join(r["create_sql"] for r in recommendations), language="sql")
@@ -0,0 +1,112 @@
+"""Unique questions/sec of the batch runner against a stubbed LLM and KB API.
+
+Every LLM call (routing, SQL generation, summary) sleeps --llm-ms and the
+KB agent sleeps --kb-ms instead of calling the API, so only the graph,
+SQLite and the concurrency machinery are measured:
+
+    python benchmarks/batch_questions.py --questions 64 --concurrency 1,4,8,16
+
+--speculative also runs the graph with SPECULATIVE_ROUTING and reports
+per-question latency for both, with the speculation stats.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="batch-bench-")
+shutil.copy(os.path.join(PROJECT_DIR, "customer_complaints.db"), os.path.join(WORKDIR, "customer_complaints.db"))
+# Throwaway stores, and no caches or local shortcuts that would skip the LLM
+os.environ.update({
+    "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "benchmark"),
+    "DATABASE_FILE": os.path.join(WORKDIR, "customer_complaints.db"),
+    "PLAN_CACHE_PATH": os.path.join(WORKDIR, "plan_cache.db"),
+    "INDEX_ADVISOR_PATH": os.path.join(WORKDIR, "index_advisor.db"),
+    "ANSWER_CACHE_PATH": os.path.join(WORKDIR, "answer_cache.db"),
+    "ANSWER_CACHE_ENABLED": "false",
+    "PLAN_CACHE_ENABLED": "false",
+    "SQL_TEMPLATES_ENABLED": "false",
+    "PRE_ROUTER_ENABLED": "false",
+})
+
+sys.path.insert(0, PROJECT_DIR)
+import Agents.app_graph as app_graph
+from Agents.batch import BatchRunner
+from Agents.llm import groq_llm
+from Agents.speculation import speculation_stats
+from benchmarks.fakes import StubLLM, stub_kb_agent, stub_kb_stream
+
+
+def questions(n: int, duplicate_every: int) -> list:
+    out = []
+    for i in range(n):
+        if duplicate_every and i % duplicate_every == duplicate_every - 1:
+            out.append(out[i // 2])
+        elif i % 2:
+            out.append(f"List complaints from customers older than {20 + i}")
+        else:
+            out.append(f"What does the savings policy say about case {i}?")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=64)
+    parser.add_argument("--duplicate-every", type=int, default=4, help="Every Nth question repeats an earlier one")
+    parser.add_argument("--concurrency", default="1,4,8,16")
+    parser.add_argument("--llm-ms", type=float, default=200)
+    parser.add_argument("--kb-ms", type=float, default=300)
+    parser.add_argument("--speculative", action="store_true", help="Compare against speculative routing")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    groq_llm.set(StubLLM(responses=["Stub summary of the rows."], latency_s=args.llm_ms / 1000))
+    app_graph.run_kb_agent = stub_kb_agent(args.kb_ms / 1000)
+    app_graph.stream_kb_agent = stub_kb_stream(args.kb_ms / 1000)
+    graphs = {"sequential": app_graph.build_app(speculative=False)}
+    if args.speculative:
+        graphs["speculative"] = app_graph.build_app(speculative=True)
+    batch = questions(args.questions, args.duplicate_every)
+
+    results = []
+    try:
+        for (mode, graph), concurrency in [(g, int(x)) for g in graphs.items() for x in args.concurrency.split(",")]:
+            runner = BatchRunner(graph, concurrency)
+            start = time.perf_counter()
+            first_ms, failed, latencies = None, 0, []
+            for item in runner.stream(batch):
+                if first_ms is None:
+                    first_ms = (time.perf_counter() - start) * 1000
+                failed += "error" in item
+                latencies.append(item["elapsed_ms"])
+            elapsed = time.perf_counter() - start
+            result = {
+                "mode": mode,
+                "concurrency": runner.concurrency,
+                "questions": len(batch),
+                "unique": len(runner.dedupe(batch)),
+                "failed": failed,
+                "elapsed_s": round(elapsed, 2),
+                # Same definition as /ask/batch: duplicates are answered for free, so they don't count
+                "unique_questions_per_s": round(len(runner.dedupe(batch)) / elapsed, 2),
+                "first_result_ms": round(first_ms, 1),
+                "mean_latency_ms": round(sum(latencies) / len(latencies), 1),
+            }
+            print(json.dumps(result))
+            results.append(result)
+        if args.speculative:
+            print(json.dumps({"speculation": speculation_stats()}))
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Synthetic customer_complaints tables and document corpora for the benchmarks.
+
+Rows and pages are written in batches as they are generated, so millions of
+rows or thousands of pages take no more memory than a few:
+
+    python benchmarks/datagen.py complaints --rows 1000000 --output complaints.db
+    python benchmarks/datagen.py corpus --docs 20 --pages 50 --output corpus/
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+import zipfile
+from typing import Callable, List
+
+import numpy as np
+
+# -----------------------------
+# customer_complaints
+# -----------------------------
+TABLE = "customer_complaints"
+# Same columns as the shipped customer_complaints.db
+SCHEMA = (
+    f'CREATE TABLE IF NOT EXISTS "{TABLE}" ("Gender" TEXT, "Age" INTEGER, "Address" TEXT, "Email" TEXT, '
+    '"Complaint" TEXT, "Security Question" TEXT, "Security Answer" TEXT, "Complaint Resolved" TEXT, '
+    '"first_name" TEXT, "last_name" TEXT)'
+)
+COMPLAINTS = [
+    "Direct debit taken twice in same month.",
+    "Incorrect PAYE tax deduction shown in account.",
+    "Error redeeming premium bonds.",
+    "Barclays app crashes when checking balance.",
+    "Salary credit delayed in current account.",
+    "Unable to transfer funds via online banking.",
+    "Savings interest not credited to account.",
+    "ISA maturity date is incorrect.",
+    "Credit card charged a foreign transaction fee.",
+    "Mortgage overpayment not applied.",
+]
+CITIES = ["London", "Manchester", "Leeds", "Sheffield", "Cambridge", "Southampton", "Bristol", "York"]
+STREETS = ["High Street", "Park Lane", "King's Road", "Baker Street", "Station Road"]
+SECURITY_QUESTIONS = [
+    ("What was the name of your first pet?", ["Buster", "Molly", "Charlie", "Daisy"]),
+    ("What is your mother's maiden name?", ["Smith", "Jones", "Taylor", "Brown"]),
+    ("What city were you born in?", CITIES),
+]
+WORDS = "please urgent again still branch phone called waiting weeks refund manager".split()
+# One row in RARE_EVERY carries this phrase: a selective text search
+RARE_PHRASE = "Escalated to ombudsman."
+RARE_EVERY = 50_000
+
+
+def write_complaints(path: str, rows: int, seed: int = 7, batch: int = 100_000) -> float:
+    """Append `rows` synthetic complaints to the table at `path`; returns seconds taken."""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.execute(SCHEMA)
+    start = time.perf_counter()
+    for offset in range(0, rows, batch):
+        size = min(batch, rows - offset)
+        complaints = rng.integers(0, len(COMPLAINTS), size)
+        extras = rng.integers(0, len(WORDS), (size, 2))
+        ages = rng.integers(18, 80, size)
+        out = []
+        for i in range(size):
+            n = offset + i
+            text = f"{COMPLAINTS[complaints[i]]} {WORDS[extras[i, 0]]} {WORDS[extras[i, 1]]}"
+            if n % RARE_EVERY == 7:
+                text += " " + RARE_PHRASE
+            question, answers = SECURITY_QUESTIONS[n % len(SECURITY_QUESTIONS)]
+            out.append((
+                "Female" if n % 2 else "Male", int(ages[i]),
+                f"{n % 200} {STREETS[n % len(STREETS)]}, {CITIES[n % len(CITIES)]}",
+                f"user{n}@email.co.uk", text, question, answers[n % len(answers)],
+                "Yes" if n % 3 else "No", f"Name{n % 97}", f"Surname{n % 89}",
+            ))
+        conn.executemany(f'INSERT INTO "{TABLE}" VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', out)
+        conn.commit()
+    conn.close()
+    return time.perf_counter() - start
+
+
+# -----------------------------
+# Documents
+# -----------------------------
+LINES_PER_PAGE = 40
+LINE = "Customer {} reported that the savings interest for account {} was not credited on time."
+POLICY_TOPICS = ["savings accounts", "ISA transfers", "mortgage overpayments", "credit card fees",
+                 "direct debits", "premium bonds", "online banking", "complaint handling"]
+POLICY_LINES = [
+    "Section {n}: the bank reviews {topic} requests within {days} working days.",
+    "Customers may ask for a written summary of the {topic} terms at any branch.",
+    "Fees for {topic} are waived for accounts opened before {year}.",
+    "A {topic} complaint not resolved within {days} days can be referred to the ombudsman.",
+    "Interest on {topic} is calculated daily and paid on the {day}th of each month.",
+]
+
+
+def page_lines(page: int) -> List[str]:
+    return [LINE.format(page * LINES_PER_PAGE + i, 10000 + page) for i in range(LINES_PER_PAGE)]
+
+
+def policy_lines(doc: int) -> Callable[[int], List[str]]:
+    """Page text of a policy document; each document covers one topic, with varying details."""
+    topic = POLICY_TOPICS[doc % len(POLICY_TOPICS)]
+
+    def lines(page: int) -> List[str]:
+        out = []
+        for i in range(LINES_PER_PAGE):
+            n = (doc * 1000 + page) * LINES_PER_PAGE + i
+            out.append(POLICY_LINES[n % len(POLICY_LINES)].format(
+                n=n, topic=topic, days=5 + n % 25, year=2000 + n % 24, day=1 + n % 28))
+        return out
+    return lines
+
+
+def write_pdf(path: str, pages: int, lines: Callable[[int], List[str]] = page_lines) -> None:
+    """Plain-text PDF written object by object, so generating it takes no memory either."""
+    offsets = []
+    with open(path, "wb") as f:
+        def obj(body: bytes):
+            offsets.append(f.tell())
+            f.write(f"{len(offsets)} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(pages))
+        obj(b"<< /Type /Catalog /Pages 2 0 R >>")
+        obj(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+        obj(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for i in range(pages):
+            obj(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+            text = "".join(f"({line}) Tj T* " for line in lines(i))
+            stream = f"BT /F1 9 Tf 11 TL 36 760 Td {text}ET".encode()
+            obj(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+        xref = f.tell()
+        f.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+def write_docx(path: str, pages: int, lines: Callable[[int], List[str]] = page_lines) -> None:
+    ns = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>'))
+        with archive.open("word/document.xml", "w") as xml:
+            xml.write(f'<?xml version="1.0" encoding="UTF-8"?><w:document {ns}><w:body>'.encode())
+            for i in range(pages):
+                body = "".join(f"<w:p><w:r><w:t>{line}</w:t></w:r></w:p>" for line in lines(i))
+                xml.write((body + '<w:p><w:r><w:br w:type="page"/></w:r></w:p>').encode())
+            xml.write(b"</w:body></w:document>")
+
+
+def write_txt(path: str, pages: int, lines: Callable[[int], List[str]] = page_lines) -> None:
+    with open(path, "w") as f:
+        for i in range(pages):
+            f.write("\n".join(lines(i)) + "\n\n")
+
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx, "txt": write_txt}
+
+
+def write_corpus(directory: str, docs: int, pages: int, fmt: str = "pdf") -> List[str]:
+    """`docs` policy documents of `pages` pages each; returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for doc in range(docs):
+        path = os.path.join(directory, f"policy-{doc:04d}.{fmt}")
+        WRITERS[fmt](path, pages, policy_lines(doc))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    complaints = sub.add_parser("complaints", help="customer_complaints SQLite database")
+    complaints.add_argument("--rows", type=int, default=1_000_000)
+    complaints.add_argument("--seed", type=int, default=7)
+    complaints.add_argument("--output", required=True)
+    corpus = sub.add_parser("corpus", help="Directory of policy documents")
+    corpus.add_argument("--docs", type=int, default=20)
+    corpus.add_argument("--pages", type=int, default=50)
+    corpus.add_argument("--format", choices=sorted(WRITERS), default="pdf")
+    corpus.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    if args.command == "complaints":
+        elapsed = write_complaints(args.output, args.rows, seed=args.seed)
+        print(json.dumps({"rows": args.rows, "elapsed_s": round(elapsed, 1),
+                          "db_mb": round(os.path.getsize(args.output) / 1e6, 1)}))
+    else:
+        start = time.perf_counter()
+        paths = write_corpus(args.output, args.docs, args.pages, args.format)
+        print(json.dumps({"docs": len(paths), "pages": args.docs * args.pages,
+                          "elapsed_s": round(time.perf_counter() - start, 1),
+                          "corpus_mb": round(sum(os.path.getsize(p) for p in paths) / 1e6, 1)}))
+
+
+if __name__ == "__main__":
+    main()
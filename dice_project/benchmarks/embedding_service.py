@@ -0,0 +1,169 @@
+"""RSS per worker and embedding throughput: per-process models vs the shared service.
+
+Starts N worker processes that each embed the same workload, first with their
+own copy of the model, then through one embedding service process:
+
+    python benchmarks/embedding_service.py --workers 1,4,8
+    python benchmarks/embedding_service.py --workers 1,4,8 --fake
+
+--fake swaps the sentence-transformer for a model of the same size
+(MiniLM vocabulary x 384 floats plus six dense layers), for machines
+without the model or torch installed.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from utils.embedding_service import RemoteEmbeddings, load_model
+
+DIM = 384
+VOCAB = 30522  # bert-base-uncased, as used by all-MiniLM-L6-v2
+TEXT = "Savings interest was not credited to my account after the fixed term ended {}"
+
+
+# -----------------------------
+# Stand-in model
+# -----------------------------
+class FakeModel:
+    """Hashing bag-of-words encoder with MiniLM's memory footprint and some real compute."""
+
+    def __init__(self, layers: int = 6, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.tokens = rng.normal(size=(VOCAB, DIM)).astype(np.float32)
+        self.layers = [rng.normal(scale=DIM ** -0.5, size=(DIM, DIM)).astype(np.float32) for _ in range(layers)]
+
+    def encode(self, texts, batch_size: int = 64, normalize_embeddings: bool = False, **_):
+        ids = [[zlib.crc32(w.encode()) % VOCAB for w in text.lower().split()] or [0] for text in texts]
+        out = np.empty((len(texts), DIM), dtype=np.float32)
+        for i in range(0, len(texts), batch_size):
+            batch = ids[i:i + batch_size]
+            length = max(len(x) for x in batch)
+            # Token-level dense layers, like a (very) small transformer
+            hidden = np.zeros((len(batch), length, DIM), dtype=np.float32)
+            for j, x in enumerate(batch):
+                hidden[j, :len(x)] = self.tokens[x]
+            for weights in self.layers:
+                hidden = np.tanh(hidden @ weights)
+            out[i:i + len(batch)] = hidden.mean(axis=1)
+        if normalize_embeddings:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
+
+
+def fake_model():
+    return FakeModel()
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def worker(mode: str, address: str, fake: bool, requests: int, batch: int, ready, go, results) -> None:
+    if mode == "service":
+        embeddings = RemoteEmbeddings(address)
+        embeddings.stats()  # connect before the clock starts
+        encode = embeddings.encode
+    else:
+        model = fake_model() if fake else load_model()
+        encode = lambda texts: model.encode(texts, show_progress_bar=False)
+    ready.wait()
+    go.wait()
+    start = time.time()
+    for i in range(requests):
+        encode([TEXT.format(os.getpid() * 100000 + i * batch + j) for j in range(batch)])
+    results.put({"start": start, "end": time.time(), "texts": requests * batch, "rss_mb": rss_mb(os.getpid())})
+
+
+def run(mode: str, workers: int, args, workdir: str) -> dict:
+    ctx = mp.get_context("spawn")
+    address = os.path.join(workdir, "embeddings.sock")
+    service = None
+    if mode == "service":
+        cmd = [sys.executable, "-m", "utils.embedding_service", "--socket", address,
+               "--max-wait-ms", str(args.max_wait_ms)]
+        if args.fake:
+            cmd += ["--factory", "benchmarks.embedding_service:fake_model"]
+        service = subprocess.Popen(cmd, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL)
+        probe = RemoteEmbeddings(address)
+        for _ in range(600):
+            try:
+                probe.stats()
+                break
+            except (OSError, EOFError):
+                time.sleep(0.1)
+
+    ready, go, results = ctx.Barrier(workers + 1), ctx.Barrier(workers + 1), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, address, args.fake, args.requests, args.batch, ready, go, results))
+             for _ in range(workers)]
+    try:
+        for p in procs:
+            p.start()
+        ready.wait(timeout=600)
+        go.wait()
+        reports = [results.get(timeout=600) for _ in procs]
+        for p in procs:
+            p.join()
+        result = {
+            "mode": mode,
+            "workers": workers,
+            "texts_per_s": round(sum(r["texts"] for r in reports)
+                                 / (max(r["end"] for r in reports) - min(r["start"] for r in reports)), 1),
+            "worker_rss_mb": round(float(np.mean([r["rss_mb"] for r in reports])), 1),
+        }
+        if service is not None:
+            result["service_rss_mb"] = round(rss_mb(service.pid), 1)
+            result["service"] = RemoteEmbeddings(address).stats()
+        result["total_rss_mb"] = round(result["worker_rss_mb"] * workers + result.get("service_rss_mb", 0.0), 1)
+        return result
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,4,8")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per worker")
+    parser.add_argument("--batch", type=int, default=1, help="Texts per request (1 = query traffic)")
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--fake", action="store_true", help="Use the same-sized stand-in model")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="embedding-bench-")
+    results = []
+    try:
+        for n in [int(x) for x in args.workers.split(",")]:
+            for mode in ("in_process", "service"):
+                result = run(mode, n, args, workdir)
+                print(json.dumps(result))
+                results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
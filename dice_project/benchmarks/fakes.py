@@ -0,0 +1,182 @@
+"""Deterministic stand-ins for Groq, the embedding model and Pinecone.
+
+Each fake answers after a fixed, configurable delay with canned or
+hash-derived output, so two runs of a benchmark do the same work and only the
+code under test changes. They plug into the same seams the app uses:
+groq_llm.set(StubLLM(...)), LazyResource.set() on the API's resources, and
+the LangChain Embeddings / VectorStore interfaces.
+"""
+import asyncio
+import math
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from utils.vector_store import LocalIndex, LocalVectorStore
+
+DIM = 384  # all-MiniLM-L6-v2
+STUB_SQL = 'SELECT first_name, last_name, "Complaint" FROM customer_complaints WHERE Age > 30 LIMIT 20'
+
+
+def stable_hash(text: str) -> int:
+    """crc32, unlike hash(), is the same in every process and run."""
+    return zlib.crc32(text.encode("utf-8"))
+
+
+# -----------------------------
+# Groq
+# -----------------------------
+class StubLLM(FakeListChatModel):
+    """Chat model that answers after a fixed delay; structured output is canned.
+
+    Routing sends questions containing one of db_cues to "db" and everything
+    else to "kb". SQL generation picks one of sql_queries by a stable hash of
+    the prompt, so the same question always gets the same query.
+    """
+
+    responses: List[str] = ["Stub answer."]
+    latency_s: float = 0.2
+    db_cues: Tuple[str, ...] = ("complaint", "customer")
+    sql_queries: List[str] = [STUB_SQL]
+
+    def _call(self, *args, **kwargs) -> str:
+        time.sleep(self.latency_s)
+        return super()._call(*args, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # Like ChatGroq, async calls wait without holding a thread
+        await asyncio.sleep(self.latency_s)
+        text = FakeListChatModel._call(self, messages, stop=stop, **kwargs)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def with_structured_output(self, schema, **kwargs):
+        def answer(prompt):
+            time.sleep(self.latency_s)
+            text = prompt.to_string()
+            if schema.__name__ == "RouteDecision":
+                question = text.lower().rsplit("question:", 1)[-1]
+                return schema(route="db" if any(cue in question for cue in self.db_cues) else "kb")
+            return schema(sql_query=self.sql_queries[stable_hash(text) % len(self.sql_queries)])
+        return RunnableLambda(answer)
+
+
+def stub_kb_answer(question: str) -> dict:
+    """Agents.KB_agent's answer shape, with one canned source chunk."""
+    return {"answer": f"Stub KB answer to: {question}",
+            "sources": [{"source": "stub.pdf", "page": 0, "text": "Stub source chunk."}],
+            "backend": "stub"}
+
+
+def stub_kb_agent(latency_s: float):
+    def run_kb_agent(question: str) -> dict:
+        time.sleep(latency_s)
+        return stub_kb_answer(question)
+    return run_kb_agent
+
+
+def stub_kb_stream(latency_s: float, tokens: int = 10):
+    def stream_kb_agent(question: str):
+        for _ in range(tokens):
+            time.sleep(latency_s / tokens)
+            yield {"type": "token", "text": "stub "}
+        yield {"type": "done", "answer": stub_kb_answer(question)}
+    return stream_kb_agent
+
+
+# -----------------------------
+# Embedding model
+# -----------------------------
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors: texts sharing words get similar vectors, no model needed.
+
+    Each call (a query or a batch of documents) waits latency_s, standing in
+    for the model's forward pass.
+    """
+
+    def __init__(self, dim: int = DIM, latency_s: float = 0.0, seed: int = 0):
+        self.dim = dim
+        self.latency_s = latency_s
+        self.seed = seed
+        self._words = {}
+        self._lock = threading.Lock()
+
+    def _word(self, word: str) -> np.ndarray:
+        vector = self._words.get(word)
+        if vector is None:
+            rng = np.random.default_rng((self.seed, stable_hash(word)))
+            vector = rng.standard_normal(self.dim).astype(np.float32)
+            with self._lock:
+                self._words[word] = vector
+        return vector
+
+    def encode(self, texts: List[str], normalize: bool = True) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                out[i] += self._word(word)
+        if normalize:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Agents.embeddings.embed_texts replacement (L2-normalised float32 rows)."""
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return self.encode(list(texts))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_texts(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_texts([text])[0].tolist()
+
+
+# -----------------------------
+# Pinecone
+# -----------------------------
+class FakeVectorStore(LocalVectorStore):
+    """The numpy store with Pinecone's round trips added.
+
+    Queries and deletes wait query_latency_s; upserts wait upsert_latency_s per
+    round of pool_threads concurrent batches, as Pinecone's pooled upsert does.
+    """
+
+    def __init__(self, index: LocalIndex, embedding: Embeddings, query_latency_s: float = 0.03,
+                 upsert_latency_s: float = 0.05, pool_threads: int = 4):
+        super().__init__(index, embedding)
+        self.query_latency_s = query_latency_s
+        self.upsert_latency_s = upsert_latency_s
+        self.pool_threads = max(1, pool_threads)
+
+    def add_texts(self, texts, metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None,
+                  batch_size: int = 1000, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if ids is None:
+            ids = [uuid.uuid4().hex for _ in texts]
+        rounds = math.ceil(math.ceil(len(texts) / batch_size) / self.pool_threads)
+        time.sleep(self.upsert_latency_s * rounds)
+        return super().add_texts(texts, metadatas=metadatas, ids=ids, batch_size=batch_size)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        time.sleep(self.query_latency_s)
+        return super().delete(ids=ids)
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               **kwargs: Any) -> List[Tuple]:
+        time.sleep(self.query_latency_s)
+        return super().similarity_search_by_vector_with_score(embedding, k=k)
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5, **kwargs: Any):
+        time.sleep(self.query_latency_s)
+        return super().max_marginal_relevance_search_by_vector(embedding, k=k, fetch_k=fetch_k,
+                                                               lambda_mult=lambda_mult)
@@ -0,0 +1,140 @@
+"""A burst of agent LLM calls against a rate-limited mock Groq: direct ChatGroq vs the LLM gateway.
+
+Routing, SQL generation and summary calls (the real agent functions, a share
+of them duplicates) are fired at once at benchmarks/mock_groq.py with a
+tokens-per-minute limit. "direct" is a plain ChatGroq with the SDK's own
+retries; "gateway" is utils.llm_gateway.chat_model. Each mode runs in a fresh
+process with its own mock server:
+
+    python benchmarks/llm_gateway.py --calls 60 --concurrency 20 --tpm 6000
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+PURPOSES = ["route", "sql", "summary"]
+QUERY_RESULT = "\n".join(f"Name{i} | Surname{i} | Savings interest not credited to account." for i in range(20))
+
+
+def workload(calls: int, duplicate_every: int) -> list:
+    out = []
+    for i in range(calls):
+        n = i // duplicate_every if duplicate_every else i
+        out.append((PURPOSES[n % len(PURPOSES)], f"How many complaints from customers older than {20 + n}?"))
+    return out
+
+
+# -----------------------------
+# One measured run (child process)
+# -----------------------------
+def run_once(mode: str, args) -> dict:
+    from benchmarks.mock_groq import start
+    server, mock = start(0, tpm=args.tpm, latency_s=args.latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    from Agents.db_agent import generate_sql, summary_llm
+    from Agents.llm import MODEL_NAME, groq_llm, llm_call
+    from Agents.router_agent import route_question
+    from utils.llm_gateway import chat_model, gateway_stats
+
+    if mode == "gateway":
+        groq_llm.set(chat_model(model=MODEL_NAME, temperature=0.0, base_url=base_url))
+    else:
+        from langchain_groq import ChatGroq
+        groq_llm.set(ChatGroq(model=MODEL_NAME, temperature=0.0, base_url=base_url))
+
+    def summary(question: str) -> str:
+        with llm_call("summary") as config:
+            return summary_llm.get().invoke({"sql_query": question, "query_result": QUERY_RESULT}, config=config)
+
+    calls = {"route": route_question, "sql": generate_sql, "summary": summary}
+
+    def one(item):
+        purpose, question = item
+        start = time.perf_counter()
+        try:
+            calls[purpose](question)
+            ok = True
+        except Exception:
+            ok = False
+        return purpose, ok, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, workload(args.calls, args.duplicate_every)))
+    elapsed = time.perf_counter() - start
+
+    by_purpose = {}
+    for purpose in PURPOSES:
+        latencies = sorted(ms for p, ok, ms in results if p == purpose and ok)
+        by_purpose[purpose] = {
+            "failed": sum(1 for p, ok, _ in results if p == purpose and not ok),
+            "mean_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1) if latencies else None,
+        }
+    server.shutdown()
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "failed": sum(1 for _, ok, _ in results if not ok),
+        "upstream_requests": mock.stats["requests"],
+        "upstream_429": mock.stats["rate_limited"],
+        "by_purpose": by_purpose,
+        "gateway": gateway_stats() if mode == "gateway" else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duplicate-every", type=int, default=2, help="Questions repeat in runs of N")
+    parser.add_argument("--tpm", type=int, default=6000, help="Mock server's tokens-per-minute limit")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--modes", default="direct,gateway")
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    parser.add_argument("--run", metavar="MODE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_once(args.run, args)))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="gateway-bench-")
+    shutil.copy(os.path.join(PROJECT_DIR, "customer_complaints.db"), os.path.join(workdir, "customer_complaints.db"))
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_KEY": env.get("GROQ_API_KEY", "benchmark"),
+        "DATABASE_FILE": os.path.join(workdir, "customer_complaints.db"),
+        "PLAN_CACHE_PATH": os.path.join(workdir, "plan_cache.db"),
+        "INDEX_ADVISOR_PATH": os.path.join(workdir, "index_advisor.db"),
+    })
+    results = []
+    try:
+        for mode in args.modes.split(","):
+            out = subprocess.run(
+                [sys.executable, __file__, "--run", mode] + sys.argv[1:],
+                capture_output=True, text=True, check=True, env=env,
+            )
+            result = {"mode": mode, "calls": args.calls, "concurrency": args.concurrency, "tpm": args.tpm}
+            result.update(json.loads(out.stdout.strip().splitlines()[-1]))
+            print(json.dumps(result))
+            results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Concurrent load test for the /chatbot endpoint.
+
+Run it against a running API, once on the old build and once on the new one,
+to compare latency under concurrency:
+
+    python benchmarks/load_test_chatbot.py --url http://localhost:8000/chatbot --requests 100
+"""
+import argparse
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+QUESTIONS = [
+    "What is GlobalBank?",
+    "How do I open a savings account?",
+    "What data does the bank store about me?",
+    "How can I raise a complaint?",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_level(url: str, concurrency: int, total: int, timeout: float) -> dict:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            response = session.post(url, json={"query": QUESTIONS[i % len(QUESTIONS)]}, timeout=timeout)
+            status = response.status_code
+        except requests.RequestException:
+            status = 0
+        return (time.perf_counter() - start) * 1000, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - start
+
+    latencies = [ms for ms, status in results if status == 200]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": len(latencies),
+        "overloaded_503": sum(1 for _, status in results if status == 503),
+        "errors": sum(1 for _, status in results if status not in (200, 503)),
+        "p50_ms": round(statistics.median(latencies), 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 1) if latencies else None,
+        "throughput_rps": round(len(latencies) / wall, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/chatbot")
+    parser.add_argument("--levels", default="1,10,50", help="Comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per level")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = []
+    for level in [int(x) for x in args.levels.split(",")]:
+        result = run_level(args.url, level, max(args.requests, level), args.timeout)
+        print(json.dumps(result))
+        results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
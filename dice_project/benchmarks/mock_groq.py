@@ -0,0 +1,198 @@
+"""Local stand-in for the Groq chat completions API, including its rate limiting.
+
+Serves POST /openai/v1/chat/completions (plain, tool-call and streaming
+responses) after a fixed latency, and enforces a tokens-per-minute budget the
+way Groq does: 429 with Retry-After and x-ratelimit-* headers. GET /stats
+returns request counts. Point the app or a benchmark at it with GROQ_API_BASE:
+
+    python benchmarks/mock_groq.py --port 8090 --tpm 6000 --latency-ms 200
+    GROQ_API_BASE=http://127.0.0.1:8090 uvicorn kbc-ingestion:app
+"""
+import argparse
+import json
+import math
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+STUB_SQL = 'SELECT first_name, last_name, "Complaint" FROM customer_complaints WHERE Age > 30 LIMIT 20'
+MODEL = "llama-3.3-70b-versatile"
+
+
+class MockGroq:
+    """Answers and budget of the mock server; one instance is shared by its handler threads."""
+
+    def __init__(self, tpm: int = 6000, latency_s: float = 0.2, answer: str = "Mock answer from the stub model.",
+                 sql: str = STUB_SQL, db_cues: Tuple[str, ...] = ("complaint", "customer")):
+        self.tpm = tpm
+        self.latency_s = latency_s
+        self.answer = answer
+        self.sql = sql
+        self.db_cues = db_cues
+        self._lock = threading.Lock()
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self.stats: Dict[str, int] = {"requests": 0, "ok": 0, "rate_limited": 0, "streamed": 0, "tool_calls": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def admit(self, cost: int) -> Tuple[bool, Dict[str, str]]:
+        """Take cost tokens from the per-minute budget; the rate-limit headers either way."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.tpm, self._tokens + (now - self._updated) * self.tpm / 60)
+            self._updated = now
+            ok = self._tokens >= cost
+            if ok:
+                self._tokens -= cost
+            reset = max(0.0, (min(cost, self.tpm) - self._tokens) * 60 / self.tpm) if not ok else \
+                (self.tpm - self._tokens) * 60 / self.tpm
+            headers = {
+                "x-ratelimit-limit-tokens": str(self.tpm),
+                "x-ratelimit-remaining-tokens": str(max(0, int(self._tokens))),
+                "x-ratelimit-reset-tokens": f"{reset:.2f}s",
+            }
+            if not ok:
+                headers["retry-after"] = str(max(1, math.ceil(reset)))
+        return ok, headers
+
+    def reply(self, body: Dict) -> Tuple[Optional[Dict], str]:
+        """(tool call or None, text) for a request."""
+        messages = body.get("messages", [])
+        last = str(messages[-1].get("content") if messages else "").lower()
+        tools = body.get("tools") or []
+        if not tools:
+            return None, self.answer
+        name = tools[0]["function"]["name"]
+        if name == "RouteDecision":
+            question = last.rsplit("question:", 1)[-1]
+            arguments = {"route": "db" if any(cue in question for cue in self.db_cues) else "kb"}
+        elif name == "ConvertToSQL":
+            arguments = {"sql_query": self.sql}
+        else:
+            arguments = {}
+        return {"id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)}}, ""
+
+
+def prompt_tokens(body: Dict) -> int:
+    return sum(len(str(m.get("content") or "")) for m in body.get("messages", [])) // 4 + 1
+
+
+def make_handler(mock: MockGroq):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, payload: Dict, headers: Dict[str, str]) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                with mock._lock:
+                    stats = dict(mock.stats)
+                self._send_json(200, stats, {})
+            else:
+                self._send_json(404, {"error": {"message": "Not found"}}, {})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found"}}, {})
+                return
+            mock._count("requests")
+            tool_call, text = mock.reply(body)
+            prompt = prompt_tokens(body)
+            completion = max(1, len(text) // 4) if text else 10
+            ok, headers = mock.admit(prompt + completion)
+            if not ok:
+                mock._count("rate_limited")
+                self._send_json(429, {"error": {
+                    "message": f"Rate limit reached for model `{MODEL}` on tokens per minute (TPM): "
+                               f"Limit {mock.tpm}. Please try again in {headers['x-ratelimit-reset-tokens']}.",
+                    "type": "tokens", "code": "rate_limit_exceeded"}}, headers)
+                return
+            mock._count("ok")
+            usage = {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+            base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": MODEL,
+                    "system_fingerprint": None}
+            if body.get("stream"):
+                mock._count("streamed")
+                self._stream(base, text, usage, headers)
+                return
+            time.sleep(mock.latency_s)
+            message = {"role": "assistant", "content": text or None}
+            if tool_call is not None:
+                mock._count("tool_calls")
+                message["tool_calls"] = [tool_call]
+            self._send_json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0, "message": message, "logprobs": None,
+                "finish_reason": "tool_calls" if tool_call else "stop"}]), headers)
+
+        def _stream(self, base: Dict, text: str, usage: Dict, headers: Dict[str, str]) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+
+            def event(payload) -> None:
+                data = f"data: {payload}\n\n".encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            words = text.split(" ")
+            for i, word in enumerate(words):
+                time.sleep(mock.latency_s / len(words))
+                delta = {"role": "assistant", "content": word if i == 0 else " " + word}
+                event(json.dumps(dict(base, object="chat.completion.chunk",
+                                      choices=[{"index": 0, "delta": delta, "finish_reason": None}])))
+            event(json.dumps(dict(base, object="chat.completion.chunk", x_groq={"usage": usage},
+                                  choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])))
+            event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start(port: int = 0, **kwargs) -> Tuple[ThreadingHTTPServer, MockGroq]:
+    """Serve a MockGroq on a background thread; port 0 picks a free one (server.server_port)."""
+    mock = MockGroq(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(mock))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-groq", daemon=True).start()
+    return server, mock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--tpm", type=int, default=6000, help="Tokens per minute before answering 429")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    args = parser.parse_args()
+
+    server, _ = start(args.port, tpm=args.tpm, latency_s=args.latency_ms / 1000)
+    print(f"[Mock Groq] Serving on http://127.0.0.1:{server.server_port} ({args.tpm} TPM)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Pages/sec and peak RSS of document parsing: whole-file load vs the streaming parser.
+
+Generates PDF, DOCX and TXT files of each size, then parses every file in a
+fresh process (so peak RSS is per run). "load" is the old path (PyPDFLoader
+.load() then split_documents, PDF only); "stream" is utils.ingestion
+.iter_chunks, with PDFs fanned out across a process pool:
+
+    python benchmarks/parsing.py --pages 10,500,5000 --formats pdf,docx,txt
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from benchmarks.datagen import WRITERS
+
+
+# -----------------------------
+# One measured run (child process)
+# -----------------------------
+def run_once(path: str, fmt: str, mode: str, pages: int, workers: int) -> dict:
+    from utils.ingestion import iter_chunks, text_splitter
+
+    start = time.perf_counter()
+    chunks = 0
+    if mode == "load":
+        from langchain_community.document_loaders import PyPDFLoader
+        chunks = len(text_splitter.split_documents(PyPDFLoader(path).load()))
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers) if fmt == "pdf" else None
+        try:
+            # Chunks are consumed and dropped, as the ingestion job upserts and forgets them
+            for _ in iter_chunks(fmt, path, executor=executor, window=workers + 1):
+                chunks += 1
+        finally:
+            if executor is not None:
+                executor.shutdown()
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "pages_per_s": round(pages / elapsed, 1),
+        "chunks": chunks,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "worker_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", default="10,500,5000")
+    parser.add_argument("--formats", default="pdf,docx,txt")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    parser.add_argument("--run", nargs=4, metavar=("PATH", "FORMAT", "MODE", "PAGES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        path, fmt, mode, pages = args.run
+        print(json.dumps(run_once(path, fmt, mode, int(pages), args.workers)))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="parse-bench-")
+    results = []
+    try:
+        for fmt in args.formats.split(","):
+            for pages in [int(x) for x in args.pages.split(",")]:
+                path = os.path.join(workdir, f"doc-{pages}.{fmt}")
+                WRITERS[fmt](path, pages)
+                for mode in (["load", "stream"] if fmt == "pdf" else ["stream"]):
+                    out = subprocess.run(
+                        [sys.executable, __file__, "--run", path, fmt, mode, str(pages), "--workers", str(args.workers)],
+                        capture_output=True, text=True, check=True,
+                    )
+                    run = json.loads(out.stdout.strip().splitlines()[-1])
+                    result = {
+                        "format": fmt, "pages": pages, "mode": mode,
+                        "file_mb": round(os.path.getsize(path) / 1e6, 2),
+                        **run,
+                    }
+                    print(json.dumps(result))
+                    results.append(result)
+                os.remove(path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
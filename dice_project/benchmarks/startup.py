@@ -0,0 +1,152 @@
+"""Import time of the agent graph and the API, and API time-to-ready.
+
+Each measurement runs in a fresh interpreter against throwaway copies of the
+databases, so results are cold-import numbers and the repo stays untouched:
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --runs 3 --server --warmup
+
+The server run reports when uvicorn first answers /test (accepting requests)
+and when /ready first returns 200 or the warm-up fails.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UTILS_DIR = os.path.join(PROJECT_DIR, "utils")
+
+IMPORTS = {
+    "Agents.app_graph": (PROJECT_DIR, "import Agents.app_graph"),
+    "kbc-ingestion": (UTILS_DIR, "import importlib; importlib.import_module('kbc-ingestion')"),
+}
+
+
+def isolated_env(workdir: str, warmup: bool) -> dict:
+    """Point every persistent store at workdir so runs neither share caches nor touch the repo."""
+    shutil.copy(os.path.join(PROJECT_DIR, "customer_complaints.db"), os.path.join(workdir, "customer_complaints.db"))
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "benchmark")
+    env.setdefault("VECTOR_BACKEND", "numpy")
+    env.update({
+        "DATABASE_FILE": os.path.join(workdir, "customer_complaints.db"),
+        "PLAN_CACHE_PATH": os.path.join(workdir, "plan_cache.db"),
+        "INDEX_ADVISOR_PATH": os.path.join(workdir, "index_advisor.db"),
+        "ANSWER_CACHE_PATH": os.path.join(workdir, "answer_cache.db"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.db"),
+        "DOCUMENT_MANIFEST_PATH": os.path.join(workdir, "document_manifest.db"),
+        "INGESTION_JOBS_PATH": os.path.join(workdir, "ingestion_jobs.db"),
+        "VECTOR_STORE_DIR": os.path.join(workdir, "vector_store"),
+        "STARTUP_WARMUP": "true" if warmup else "false",
+    })
+    return env
+
+
+def time_import(cwd: str, statement: str, env: dict) -> float:
+    code = (
+        "import time; start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print('IMPORT_MS', (time.perf_counter() - start) * 1000)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+    for line in out.stdout.splitlines():
+        if line.startswith("IMPORT_MS"):
+            return float(line.split()[1])
+    raise RuntimeError(f"Import failed:\n{out.stderr[-2000:]}")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str):
+    """(status, body) of a GET, or None while the server is not accepting connections."""
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return None
+
+
+def time_server(env: dict, timeout: float) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "kbc-ingestion:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=UTILS_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    result = {"accepting_ms": None, "ready_ms": None, "ready": False}
+    try:
+        while time.perf_counter() - start < timeout and process.poll() is None:
+            if result["accepting_ms"] is None and _get(f"{base}/test") is not None:
+                result["accepting_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            if result["accepting_ms"] is not None:
+                status, report = _get(f"{base}/ready") or (None, {})
+                if status == 200 or report.get("warm_up", {}).get("status") == "failed":
+                    result["ready_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                    result["ready"] = status == 200
+                    result["warm_up"] = report["warm_up"]
+                    result["components"] = report["components"]
+                    break
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return result
+
+
+def _summary(values: list) -> dict:
+    return {"median_ms": round(float(np.median(values)), 1), "min_ms": round(min(values), 1),
+            "max_ms": round(max(values), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--server", action="store_true", help="Also time uvicorn startup and readiness")
+    parser.add_argument("--warmup", action="store_true", help="Enable the background warm-up in the server run")
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="startup-bench-")
+    results = {"imports": {}}
+    try:
+        env = isolated_env(workdir, args.warmup)
+        for name, (cwd, statement) in IMPORTS.items():
+            results["imports"][name] = _summary([time_import(cwd, statement, env) for _ in range(args.runs)])
+            print(json.dumps({name: results["imports"][name]}))
+        if args.server:
+            runs = [time_server(env, args.timeout) for _ in range(args.runs)]
+            results["server"] = {
+                "warmup": args.warmup,
+                "accepting": _summary([r["accepting_ms"] for r in runs if r["accepting_ms"] is not None] or [0.0]),
+                "ready": _summary([r["ready_ms"] for r in runs if r["ready_ms"] is not None] or [0.0]),
+                "last_run": runs[-1],
+            }
+            print(json.dumps({"server": results["server"]}))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
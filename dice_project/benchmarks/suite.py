@@ -0,0 +1,423 @@
+"""Offline benchmark suite: routing, the DB agent, ingestion and /chatbot, with no network.
+
+Groq, the embedding model and Pinecone are replaced by the fakes in
+benchmarks/fakes.py (fixed latencies, deterministic outputs) and the data by
+benchmarks/datagen.py (a synthetic customer_complaints table and a corpus of
+policy PDFs), so the same command gives comparable numbers on any Linux box:
+
+    python benchmarks/suite.py --output base.json
+    python benchmarks/suite.py --scenarios routing,db_agent --rows 1000000 --output new.json --compare base.json
+
+Scenarios:
+  routing    decisions/s of the tiered router (keyword, embedding, stub LLM)
+  db_agent   run_db_agent end to end: stub LLM SQL + summary over the synthetic table
+  ingestion  run_ingestion_job over the PDF corpus: chunks/s and pages/s
+  chatbot    /chatbot latency and throughput at each concurrency level, in process over ASGI
+
+--compare exits with status 1 when a throughput (*_per_s) drops or a latency
+(*_ms) grows by more than --tolerance against an earlier results file.
+load_test_chatbot.py remains the tool for load-testing a deployed API.
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UTILS_DIR = os.path.join(PROJECT_DIR, "utils")
+WORKDIR = tempfile.mkdtemp(prefix="suite-bench-")
+DATABASE_FILE = os.path.join(WORKDIR, "customer_complaints.db")
+# Every store in the workdir, the local vector backend, and no caches that would skip the code under test
+os.environ.update({
+    "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "benchmark"),
+    "DATABASE_FILE": DATABASE_FILE,
+    "PLAN_CACHE_PATH": os.path.join(WORKDIR, "plan_cache.db"),
+    "INDEX_ADVISOR_PATH": os.path.join(WORKDIR, "index_advisor.db"),
+    "ANSWER_CACHE_PATH": os.path.join(WORKDIR, "answer_cache.db"),
+    "EMBEDDING_CACHE_PATH": os.path.join(WORKDIR, "embedding_cache.db"),
+    "DOCUMENT_MANIFEST_PATH": os.path.join(WORKDIR, "document_manifest.db"),
+    "INGESTION_JOBS_PATH": os.path.join(WORKDIR, "ingestion_jobs.db"),
+    "VECTOR_STORE_DIR": os.path.join(WORKDIR, "vector_store"),
+    "VECTOR_BACKEND": "numpy",
+    "EMBEDDING_SOCKET": "",
+    "STARTUP_WARMUP": "false",
+    "ANSWER_CACHE_ENABLED": "false",
+    "PLAN_CACHE_ENABLED": "false",
+    "SQL_TEMPLATES_ENABLED": "false",
+})
+
+sys.path.insert(0, PROJECT_DIR)
+from benchmarks.datagen import CITIES, COMPLAINTS, POLICY_TOPICS, TABLE, write_complaints, write_corpus
+from benchmarks.fakes import FakeEmbeddings, FakeVectorStore, StubLLM
+from utils.vector_store import LocalIndex
+
+SQL_QUERIES = [
+    f'SELECT "Complaint", COUNT(*) AS n FROM {TABLE} GROUP BY "Complaint" ORDER BY n DESC',
+    f'SELECT first_name, last_name, "Complaint" FROM {TABLE} WHERE Age > 30 LIMIT 20',
+    f"SELECT COUNT(*) FROM {TABLE} WHERE \"Complaint Resolved\" = 'No' AND Address LIKE '%York%'",
+    f"SELECT first_name, last_name, Email FROM {TABLE} WHERE Complaint LIKE '%premium bonds%' LIMIT 50",
+]
+SUMMARY = "Stub summary of the rows."
+ANSWER = "Stub answer from the policy documents."
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+@contextlib.contextmanager
+def quiet(verbose: bool):
+    """Silence the agents' per-call log lines, which would otherwise dominate small scenarios."""
+    if verbose:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict:
+    if not latencies_ms:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    ordered = sorted(latencies_ms)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 2)
+    return {"p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99),
+            "mean_ms": round(statistics.fmean(ordered), 2)}
+
+
+def timed_map(fn: Callable, items: List, concurrency: int) -> tuple:
+    """Run fn over items on `concurrency` threads; returns (results, per-item ms, wall seconds)."""
+    def one(item):
+        start = time.perf_counter()
+        result = fn(item)
+        return result, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        out = list(pool.map(one, items))
+    return [r for r, _ in out], [ms for _, ms in out], time.perf_counter() - start
+
+
+def load_api():
+    """The FastAPI module, imported in the workdir (it creates Documents/ in its cwd)."""
+    os.chdir(WORKDIR)
+    if UTILS_DIR not in sys.path:
+        sys.path.insert(0, UTILS_DIR)
+    return importlib.import_module("kbc-ingestion")
+
+
+def routing_questions(n: int) -> List[str]:
+    """Clear database questions, clear policy questions and vague ones the local tiers should pass on."""
+    out = []
+    for i in range(n):
+        city, complaint = CITIES[i % len(CITIES)], COMPLAINTS[i % len(COMPLAINTS)].rstrip(".").lower()
+        topic = POLICY_TOPICS[i % len(POLICY_TOPICS)]
+        out.append([
+            f"How many customers in {city} complained that {complaint}?",
+            f"What does the bank's policy say about {topic}?",
+            f"Average age of customers whose complaint is not resolved in {city}",
+            f"Can you help me with my {topic} problem from last week?",
+        ][i % 4])
+    return out
+
+
+def db_questions(n: int) -> List[str]:
+    return [f"Show complaints from customers in {CITIES[i % len(CITIES)]} older than {20 + i % 50}"
+            for i in range(n)]
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+def scenario_routing(args) -> Dict:
+    import Agents.pre_router as pre_router
+    from Agents.llm import groq_llm
+
+    groq_llm.set(StubLLM(latency_s=args.llm_ms / 1000))
+    pre_router.embed_texts = FakeEmbeddings(latency_s=args.embed_ms / 1000).embed_texts
+    router = pre_router.TieredRouter()
+    questions = routing_questions(args.questions)
+    router.route(questions[0])  # vocabulary and exemplar embeddings
+
+    decisions, latencies, wall = timed_map(router.route, questions, args.concurrency)
+    tiers = {}
+    for decision in decisions:
+        tiers[decision.tier] = tiers.get(decision.tier, 0) + 1
+    return {
+        "questions": len(questions),
+        "concurrency": args.concurrency,
+        "decisions_per_s": round(len(decisions) / wall, 1),
+        "tiers": tiers,
+        "routes": {route: sum(d.route == route for d in decisions) for route in ("db", "kb")},
+        **latency_summary(latencies),
+    }
+
+
+def scenario_db_agent(args) -> Dict:
+    from Agents.db_agent import run_db_agent
+    from Agents.llm import groq_llm
+
+    groq_llm.set(StubLLM(responses=[SUMMARY], latency_s=args.llm_ms / 1000, sql_queries=SQL_QUERIES))
+    questions = db_questions(args.questions)
+    run_db_agent(questions[0])  # schema catalog, engines
+
+    results, latencies, wall = timed_map(run_db_agent, questions, args.concurrency)
+    paths = {}
+    for result in results:
+        paths[result["db_path"]] = paths.get(result["db_path"], 0) + 1
+    return {
+        "rows": args.rows,
+        "questions": len(questions),
+        "concurrency": args.concurrency,
+        "failed": sum(not result["ok"] for result in results),
+        "questions_per_s": round(len(results) / wall, 2),
+        "mean_rows_returned": round(statistics.fmean(result["row_count"] for result in results), 1),
+        "paths": paths,
+        **latency_summary(latencies),
+    }
+
+
+class _Report:
+    """JobReporter stand-in that keeps the job details."""
+
+    def __init__(self):
+        self.result = {}
+
+    def stage(self, name: str, **fields) -> None:
+        pass
+
+    def progress(self, **fields) -> None:
+        pass
+
+    def details(self, **details) -> None:
+        self.result.update(details)
+
+
+def scenario_ingestion(args) -> Dict:
+    api = load_api()
+    embeddings = FakeEmbeddings(latency_s=args.embed_ms / 1000)
+    index = LocalIndex(os.path.join(WORKDIR, "vector_store", "ingestion"))
+    store = FakeVectorStore(index, embeddings, args.vector_ms / 1000, args.upsert_ms / 1000)
+    api.hugging_face_embeddings.set(embeddings)
+    api.vectorstore.set(store)
+    # The job opens its own store for upserts (pooled on Pinecone); hand it the fake over the same index
+    api.get_vectorstore = lambda embedding, pool_threads=4, **kwargs: FakeVectorStore(
+        index, embedding, args.vector_ms / 1000, args.upsert_ms / 1000, pool_threads)
+
+    corpus = write_corpus(os.path.join(WORKDIR, "corpus"), args.docs, args.pages)
+    staged = []
+    for path in corpus:
+        # The job deletes its file when done
+        copy = path + ".job"
+        shutil.copy(path, copy)
+        staged.append((os.path.basename(path), copy))
+
+    start = time.perf_counter()
+    chunks = 0
+    for filename, file_path in staged:
+        report = _Report()
+        api.run_ingestion_job(
+            {"file_path": file_path, "filename": filename, "content_type": "application/pdf"}, report)
+        chunks += report.result.get("upserted", 0)
+    elapsed = time.perf_counter() - start
+    api.cpu_pool.shutdown()
+    return {
+        "docs": len(corpus),
+        "pages": args.docs * args.pages,
+        "chunks": chunks,
+        "elapsed_s": round(elapsed, 2),
+        "chunks_per_s": round(chunks / elapsed, 1),
+        "pages_per_s": round(args.docs * args.pages / elapsed, 1),
+        "vectors": index.count(),
+    }
+
+
+async def _chatbot_level(client, concurrency: int, total: int, questions: List[str]) -> Dict:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            start = time.perf_counter()
+            response = await client.post("/chatbot", json={"query": questions[i % len(questions)]})
+            return (time.perf_counter() - start) * 1000, response.status_code
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(total)))
+    wall = time.perf_counter() - start
+    latencies = [ms for ms, status in results if status == 200]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": len(latencies),
+        "overloaded_503": sum(status == 503 for _, status in results),
+        "errors": sum(status not in (200, 503) for _, status in results),
+        "requests_per_s": round(len(latencies) / wall, 2),
+        **latency_summary(latencies),
+    }
+
+
+def scenario_chatbot(args) -> Dict:
+    import httpx
+
+    api = load_api()
+    embeddings = FakeEmbeddings(latency_s=args.embed_ms / 1000)
+    index = LocalIndex(os.path.join(WORKDIR, "vector_store", "chatbot"))
+    store = FakeVectorStore(index, embeddings, args.vector_ms / 1000, args.upsert_ms / 1000)
+    if index.count() == 0:
+        # Chunk-sized passages of the policy corpus, embedded directly (no parsing)
+        from benchmarks.datagen import policy_lines
+        texts = [" ".join(policy_lines(doc)(page)[i:i + 4])
+                 for doc in range(args.docs) for page in range(args.pages) for i in range(0, 40, 4)]
+        store.add_texts(texts, metadatas=[{"source": "corpus"} for _ in texts], batch_size=1000)
+    api.hugging_face_embeddings.set(embeddings)
+    api.vectorstore.set(store)
+    api.llm.set(StubLLM(responses=[ANSWER], latency_s=args.llm_ms / 1000))
+    questions = [f"What does the policy say about {topic}?" for topic in POLICY_TOPICS]
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://suite", timeout=300) as client:
+            await client.post("/chatbot", json={"query": questions[0]})  # build the pipeline
+            return [await _chatbot_level(client, level, max(args.requests, level), questions)
+                    for level in [int(x) for x in args.levels.split(",")]]
+
+    return {"vectors": index.count(), "levels": asyncio.run(run())}
+
+
+SCENARIOS = {
+    "routing": scenario_routing,
+    "db_agent": scenario_db_agent,
+    "ingestion": scenario_ingestion,
+    "chatbot": scenario_chatbot,
+}
+
+
+# -----------------------------
+# Comparison
+# -----------------------------
+def flatten(value, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves keyed by path; list items are keyed by their concurrency when they have one."""
+    out = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            out.update(flatten(item, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            key = f"c{item['concurrency']}" if isinstance(item, dict) and "concurrency" in item else str(i)
+            out.update(flatten(item, f"{prefix}.{key}"))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """Throughputs that fell or latencies that grew by more than tolerance (a fraction)."""
+    new, old = flatten(results), flatten(baseline)
+    regressions = []
+    for key, before in old.items():
+        after = new.get(key)
+        if after is None or not before:
+            continue
+        change = (after - before) / before
+        if (key.endswith("_per_s") and change < -tolerance) or (key.endswith("_ms") and change > tolerance):
+            regressions.append({"metric": key, "baseline": before, "current": after,
+                                "change_pct": round(change * 100, 1)})
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows in the synthetic complaints table")
+    parser.add_argument("--questions", type=int, default=200, help="Questions per routing / DB agent run")
+    parser.add_argument("--concurrency", type=int, default=4, help="Threads for routing and the DB agent")
+    parser.add_argument("--docs", type=int, default=10, help="PDFs in the corpus")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per PDF")
+    parser.add_argument("--levels", default="1,8,32", help="/chatbot concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="/chatbot requests per level")
+    parser.add_argument("--llm-ms", type=float, default=200, help="Latency of each stub LLM call")
+    parser.add_argument("--embed-ms", type=float, default=5, help="Latency of each fake embedding call")
+    parser.add_argument("--vector-ms", type=float, default=30, help="Latency of each fake vector query")
+    parser.add_argument("--upsert-ms", type=float, default=50, help="Latency of each fake upsert round")
+    parser.add_argument("--output", help="JSON file for the results")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative change for --compare")
+    parser.add_argument("--verbose", action="store_true", help="Keep the agents' log output")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    report = {
+        "meta": {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "verbose")},
+        },
+        "setup": {},
+        "results": {},
+    }
+    try:
+        # Built up front, as an admin would: the agents only use an index that already exists
+        from Agents.text_index import ensure_text_index
+        report["setup"]["complaints_load_s"] = round(write_complaints(DATABASE_FILE, args.rows), 2)
+        start = time.perf_counter()
+        ensure_text_index(DATABASE_FILE, TABLE)
+        report["setup"]["text_index_s"] = round(time.perf_counter() - start, 2)
+        for name in names:
+            with quiet(args.verbose):
+                result = SCENARIOS[name](args)
+            print(json.dumps({"scenario": name, **result}))
+            report["results"][name] = result
+    finally:
+        os.chdir(PROJECT_DIR)
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report["results"], baseline.get("results", {}), args.tolerance)
+        old_args = baseline.get("meta", {}).get("args", {})
+        print(json.dumps({
+            "baseline": args.compare,
+            "baseline_commit": baseline.get("meta", {}).get("git_commit"),
+            # Different data sizes or fake latencies make the comparison meaningless
+            "args_differ": sorted(key for key, value in report["meta"]["args"].items() if old_args.get(key) != value),
+            "regressions": regressions,
+        }))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Recall@k and query latency of the local vector backends.
+
+Builds an exact (numpy) and an approximate (IVF) index over the same synthetic,
+clustered 384-d vectors and compares them at each corpus size:
+
+    python benchmarks/vector_search.py --sizes 10000,100000,1000000 --k 10
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.vector_store import LocalIndex
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, rng, block: int = 100_000) -> np.ndarray:
+    """Unit vectors drawn around random topic centres, like real chunk embeddings.
+
+    Generated in float32 blocks so 1M x 384 fits next to the indexes in a few GB.
+    """
+    centres = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for i in range(0, n, block):
+        labels = rng.integers(0, clusters, size=min(block, n - i))
+        part = centres[labels] + 0.6 * rng.standard_normal((len(labels), dim), dtype=np.float32)
+        vectors[i:i + len(labels)] = part / np.linalg.norm(part, axis=1, keepdims=True)
+    return vectors
+
+
+def build(directory: str, vectors: np.ndarray, ivf: bool, batch: int = 50_000) -> tuple:
+    index = LocalIndex(directory, ivf=ivf, ivf_min_size=len(vectors))
+    start = time.perf_counter()
+    for i in range(0, len(vectors), batch):
+        ids = [str(j) for j in range(i, min(i + batch, len(vectors)))]
+        index.upsert(ids, vectors[i:i + batch], [""] * len(ids), [{}] * len(ids))
+    return index, time.perf_counter() - start
+
+
+def time_queries(index: LocalIndex, queries: np.ndarray, k: int) -> tuple:
+    results, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append({row for row, _ in index.search(q, k)})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def run(n: int, k: int, num_queries: int, nprobe: int, workdir: str) -> dict:
+    rng = np.random.default_rng(42)
+    vectors = synthetic_corpus(n, DIM, clusters=max(16, n // 1000), rng=rng)
+    picks = rng.choice(n, size=num_queries, replace=False)
+    queries = vectors[picks] + 0.3 * rng.standard_normal((num_queries, DIM), dtype=np.float32)
+
+    exact, exact_build = build(os.path.join(workdir, f"exact-{n}"), vectors, ivf=False)
+    ivf, ivf_build = build(os.path.join(workdir, f"ivf-{n}"), vectors, ivf=True)
+    ivf.nprobe = nprobe
+
+    truth, exact_ms = time_queries(exact, queries, k)
+    approx, ivf_ms = time_queries(ivf, queries, k)
+    recall = np.mean([len(a & t) / k for a, t in zip(approx, truth)])
+
+    return {
+        "n": n,
+        "k": k,
+        "nprobe": nprobe,
+        "recall_at_k": round(float(recall), 4),
+        "exact": {"build_s": round(exact_build, 2), "p50_ms": round(float(np.percentile(exact_ms, 50)), 3),
+                  "p99_ms": round(float(np.percentile(exact_ms, 99)), 3)},
+        "ivf": {"build_s": round(ivf_build, 2), "lists": len(ivf.lists),
+                "p50_ms": round(float(np.percentile(ivf_ms, 50)), 3),
+                "p99_ms": round(float(np.percentile(ivf_ms, 99)), 3)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vector-bench-")
+    results = []
+    try:
+        for n in [int(x) for x in args.sizes.split(",")]:
+            result = run(n, args.k, min(args.queries, n), args.nprobe, workdir)
+            print(json.dumps(result))
+            results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Agents.text_index import ensure_text_index, find_rewriter, vacuum
+
+TABLE = "customer_complaints"
+WORDS = ["account", "credit card", "mortgage", "overdraft", "branch", "fees", "ombudsman", "transfer"]
+QUERIES = [
+    f"SELECT COUNT(*) FROM {TABLE} WHERE Complaint LIKE '%account%'",
+    f"SELECT first_name FROM {TABLE} WHERE LOWER(Complaint) LIKE '%credit card%' ORDER BY first_name",
+    f"SELECT COUNT(*) FROM {TABLE} WHERE (Complaint LIKE '%ombudsman%')",
+    f"SELECT COUNT(*) FROM {TABLE} WHERE Complaint LIKE '%mortgage%' AND Address LIKE '%York%'",
+    f"SELECT COUNT(*) FROM {TABLE} WHERE Complaint LIKE '%fees%' AND age > 40",
+]
+
+
+class TextIndexTest(unittest.TestCase):
+    """MATCH rewrites must return exactly what the LIKE scan returns."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "complaints.db")
+        rng = random.Random(7)
+        conn = sqlite3.connect(self.db)
+        # Same shape as the real table: no INTEGER PRIMARY KEY, so rowids are implicit
+        conn.execute(f"CREATE TABLE {TABLE} (first_name TEXT, Address TEXT, age INTEGER, Complaint TEXT)")
+        conn.executemany(
+            f"INSERT INTO {TABLE} VALUES (?, ?, ?, ?)",
+            [(f"name{i}", rng.choice(["York", "Leeds", "New York"]), rng.randint(18, 90),
+              " ".join(rng.sample(WORDS, 2))) for i in range(600)],
+        )
+        conn.commit()
+        conn.close()
+        self.assertTrue(ensure_text_index(self.db, TABLE))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assertRewriteMatchesLike(self, rewriter):
+        conn = sqlite3.connect(self.db)
+        try:
+            for sql in QUERIES:
+                self.assertEqual(conn.execute(rewriter.rewrite(sql)).fetchall(), conn.execute(sql).fetchall(), sql)
+        finally:
+            conn.close()
+
+    def test_rewrite_matches_like(self):
+        rewriter = find_rewriter(self.db, TABLE)
+        self.assertIsNotNone(rewriter)
+        self.assertIn("MATCH", rewriter.rewrite(QUERIES[0]))
+        self.assertRewriteMatchesLike(rewriter)
+
+    def test_only_sole_like_predicate_is_rewritten(self):
+        rewriter = find_rewriter(self.db, TABLE)
+        self.assertIn("MATCH", rewriter.rewrite(QUERIES[2]))
+        for sql in QUERIES[3:]:
+            self.assertEqual(rewriter.rewrite(sql), sql)
+
+    def test_rewrite_matches_like_after_writes(self):
+        conn = sqlite3.connect(self.db)
+        with conn:
+            conn.execute(f"DELETE FROM {TABLE} WHERE rowid % 3 = 0")
+            conn.execute(f"UPDATE {TABLE} SET Complaint = 'account closed' WHERE rowid % 5 = 0")
+            conn.execute(f"INSERT INTO {TABLE} VALUES ('late', 'York', 30, 'account fees')")
+        conn.close()
+        self.assertRewriteMatchesLike(find_rewriter(self.db, TABLE))
+
+    def test_vacuum_disables_rewrite_until_rebuilt(self):
+        conn = sqlite3.connect(self.db)
+        with conn:
+            conn.execute(f"DELETE FROM {TABLE} WHERE rowid % 3 = 0")
+        conn.execute("VACUUM")
+        conn.close()
+        self.assertIsNone(find_rewriter(self.db, TABLE))
+
+        self.assertTrue(vacuum(self.db, TABLE))
+        rewriter = find_rewriter(self.db, TABLE)
+        self.assertIsNotNone(rewriter)
+        self.assertRewriteMatchesLike(rewriter)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# -----------------------------
+# Configuration
+# -----------------------------
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOCUMENT_MANIFEST_PATH = os.getenv("DOCUMENT_MANIFEST_PATH", os.path.join(PROJECT_DIR, "document_manifest.db"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    chunks INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    chunk_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_doc_id ON chunks(doc_id);
+"""
+
+
+def document_id(doc_key: str) -> str:
+    """Stable id for a document, derived from its key (the upload's file name unless the client gives one).
+
+    Every version of a document maps to the same id, so re-ingesting it replaces
+    the previous version's chunks; the content hash only decides whether it changed.
+    """
+    return hashlib.sha256(doc_key.strip().lower().encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_id(doc_id: str, page: int, offset: int) -> str:
+    """Deterministic vector id: document id + page + character offset of the chunk."""
+    return f"{doc_id}-p{page}-c{offset}"
+
+
+def file_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def data_hash(data: bytes) -> str:
+    """file_hash of content held in memory."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DocumentManifest:
+    """Local record of which chunks of which documents are in the vector index."""
+
+    def __init__(self, path: str = DOCUMENT_MANIFEST_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.executescript(SCHEMA)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            self._rekey_by_content()
+
+    def _rekey_by_content(self) -> None:
+        """Move documents recorded under content-hash ids back to their file-name ids (one-time migration).
+
+        Chunk ids keep their old prefix, so the next upload of the document
+        upserts it under the stable id and deletes every chunk of the old ones.
+        """
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT doc_id, source, content_hash, updated FROM documents "
+                "WHERE doc_id = substr(content_hash, 1, 16) ORDER BY updated"
+            ).fetchall()
+            for old_id, source, content_hash, updated in rows:
+                new_id = document_id(source)
+                if new_id == old_id:
+                    continue
+                merged = self._conn.execute("SELECT updated FROM documents WHERE doc_id = ?", (new_id,)).fetchone()
+                self._conn.execute("UPDATE chunks SET doc_id = ? WHERE doc_id = ?", (new_id, old_id))
+                self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (old_id,))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents(doc_id, source, content_hash, chunks, updated) "
+                    "VALUES (?, ?, ?, (SELECT COUNT(*) FROM chunks WHERE doc_id = ?), ?)",
+                    # Several versions now share one id: forget the hash so the next upload cleans them up
+                    (new_id, source, "" if merged else content_hash, new_id, max(updated, merged[0] if merged else 0)),
+                )
+            if rows:
+                print(f"[Document Manifest] Re-keyed {len(rows)} document(s) by file name")
+            self._conn.execute("PRAGMA user_version = 1")
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id, source, content_hash, chunks, updated FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("doc_id", "source", "content_hash", "chunks", "updated"), row))
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id, source, chunks, updated FROM documents ORDER BY updated DESC"
+            ).fetchall()
+        return [dict(zip(("doc_id", "source", "chunks", "updated"), row)) for row in rows]
+
+    def chunk_ids(self, doc_id: str) -> Dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_id, chunk_hash FROM chunks WHERE doc_id = ?", (doc_id,))
+            return dict(rows.fetchall())
+
+    def is_unchanged(self, doc_id: str, content_hash: str) -> bool:
+        doc = self.get(doc_id)
+        return doc is not None and doc["content_hash"] == content_hash
+
+    def diff(self, doc_id: str, chunks: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """Split a new chunk set into ids to upsert (new or changed) and stale ids to delete."""
+        existing = self.chunk_ids(doc_id)
+        to_upsert = [cid for cid, chash in chunks.items() if existing.get(cid) != chash]
+        to_delete = [cid for cid in existing if cid not in chunks]
+        return to_upsert, to_delete
+
+    def record(self, doc_id: str, source: str, content_hash: str, chunks: Dict[str, str]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+            self._conn.executemany(
+                "INSERT INTO chunks(chunk_id, doc_id, chunk_hash) VALUES (?, ?, ?)",
+                [(cid, doc_id, chash) for cid, chash in chunks.items()],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents(doc_id, source, content_hash, chunks, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (doc_id, source, content_hash, len(chunks), time.time()),
+            )
+
+    def delete(self, doc_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
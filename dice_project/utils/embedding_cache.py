@@ -0,0 +1,130 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils import metrics
+
+# -----------------------------
+# Configuration
+# -----------------------------
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(PROJECT_DIR, "embedding_cache.db"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "1"))
+
+
+def chunk_key(text: str, model: str) -> str:
+    """Content address of a chunk: the model name plus its whitespace-normalised text."""
+    normalized = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha256(f"{model}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Persistent float32 vectors keyed by chunk hash."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings(key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()],
+            )
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the underlying model.
+
+    Misses are de-duplicated, split into batches of batch_size and encoded on
+    up to `threads` worker threads. Create one instance per ingestion job to
+    get per-job stats; the store can be shared.
+    """
+
+    def __init__(self, base: Embeddings, model_name: str, store: Optional[EmbeddingStore] = None,
+                 batch_size: int = EMBEDDING_BATCH_SIZE, threads: int = EMBEDDING_THREADS):
+        self.base = base
+        self.model_name = model_name
+        self.store = store or EmbeddingStore()
+        self.batch_size = batch_size
+        self.threads = threads
+        self.chunks = 0
+        self.misses = 0
+        self.seconds = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        keys = [chunk_key(text, self.model_name) for text in texts]
+        cached = self.store.get_many(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        computed: Dict[str, List[float]] = {}
+        if missing:
+            miss_keys = list(missing)
+            batches = [miss_keys[i:i + self.batch_size] for i in range(0, len(miss_keys), self.batch_size)]
+
+            def encode(batch):
+                vectors = np.asarray(self.base.embed_documents([missing[k] for k in batch]), dtype=np.float32)
+                return dict(zip(batch, vectors.tolist()))
+
+            if self.threads > 1 and len(batches) > 1:
+                with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                    for result in pool.map(encode, batches):
+                        computed.update(result)
+            else:
+                for batch in batches:
+                    computed.update(encode(batch))
+            self.store.put_many(computed)
+
+        self.chunks += len(texts)
+        self.misses += len(computed)
+        self.seconds += time.perf_counter() - start
+        metrics.cache_lookups.inc("embedding", "hit", amount=len(texts) - len(computed))
+        metrics.cache_lookups.inc("embedding", "miss", amount=len(computed))
+
+        vectors = {**cached, **computed}
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> Dict:
+        hits = self.chunks - self.misses
+        return {
+            "chunks": self.chunks,
+            "cache_hits": hits,
+            "model_encoded": self.misses,
+            "hit_ratio": round(hits / self.chunks, 3) if self.chunks else 0.0,
+            "chunks_per_sec": round(self.chunks / self.seconds, 1) if self.seconds > 0 else 0.0,
+        }
+
+    def embed_query(self, text: str) -> List[float]:
+        # Queries are rarely repeated verbatim; go straight to the model
+        return self.base.embed_query(text)
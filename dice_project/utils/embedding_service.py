@@ -0,0 +1,262 @@
+"""Out-of-process embedding service shared by every API worker and the UI.
+
+One process owns the sentence-transformer; clients talk to it over a Unix
+socket. Requests arriving within EMBEDDING_SERVICE_MAX_WAIT_MS of each other
+are encoded together as one micro-batch (up to EMBEDDING_SERVICE_MAX_BATCH
+texts), so N workers cost one model in memory and share its batching:
+
+    python -m utils.embedding_service --socket /tmp/dice-embeddings.sock
+
+Clients opt in by setting EMBEDDING_SOCKET to the same path.
+"""
+import argparse
+import importlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# -----------------------------
+# Configuration
+# -----------------------------
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Empty: every process loads its own model, as before
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET", "")
+MAX_BATCH = int(os.getenv("EMBEDDING_SERVICE_MAX_BATCH", "256"))
+MAX_WAIT_MS = float(os.getenv("EMBEDDING_SERVICE_MAX_WAIT_MS", "5"))
+ENCODE_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# A connection counts as an active client if it sent a request this recently
+ACTIVE_CLIENT_SECONDS = 1.0
+
+
+def load_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+# -----------------------------
+# Micro-batching
+# -----------------------------
+class MicroBatcher:
+    """Merges concurrent encode requests into one model call.
+
+    The first waiting request opens a window of max_wait_ms; everything that
+    arrives before it closes (or until max_batch texts) is encoded together
+    and the rows are handed back to each caller. Clients send one request at a
+    time, so the window also closes as soon as every recently active client
+    has a request in the batch: a lone client never waits.
+    """
+
+    def __init__(self, model, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._last_seen: Dict[int, float] = {}
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.encode_seconds = 0.0
+        threading.Thread(target=self._run, name="micro-batcher", daemon=True).start()
+
+    def submit(self, texts: List[str], normalize: bool, client: int = 0) -> Future:
+        future: Future = Future()
+        with self._lock:
+            self._last_seen[client] = time.perf_counter()
+        self._queue.put((texts, normalize, future))
+        return future
+
+    def disconnected(self, client: int) -> None:
+        with self._lock:
+            self._last_seen.pop(client, None)
+
+    def active_clients(self) -> int:
+        cutoff = time.perf_counter() - ACTIVE_CLIENT_SECONDS
+        with self._lock:
+            return sum(1 for seen in self._last_seen.values() if seen >= cutoff)
+
+    def _collect(self) -> List[tuple]:
+        first = self._queue.get()
+        items, size = [first], len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        expected = self.active_clients()
+        while size < self.max_batch and len(items) < expected:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    def _run(self) -> None:
+        while True:
+            items = self._collect()
+            for normalize in (False, True):
+                group = [item for item in items if item[1] == normalize]
+                if group:
+                    self._encode(group, normalize)
+
+    def _encode(self, group: List[tuple], normalize: bool) -> None:
+        texts = [text for item in group for text in item[0]]
+        start = time.perf_counter()
+        try:
+            vectors = np.asarray(
+                self.model.encode(texts, batch_size=ENCODE_BATCH_SIZE, normalize_embeddings=normalize,
+                                  show_progress_bar=False),
+                dtype=np.float32,
+            )
+        except Exception as e:
+            for _, _, future in group:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.requests += len(group)
+            self.texts += len(texts)
+            self.batches += 1
+            self.encode_seconds += time.perf_counter() - start
+        offset = 0
+        for item_texts, _, future in group:
+            future.set_result(vectors[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+    def stats(self) -> Dict:
+        active = self.active_clients()
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "mean_batch_texts": self.texts / self.batches if self.batches else 0.0,
+                "encode_seconds": round(self.encode_seconds, 3),
+                "active_clients": active,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+
+# -----------------------------
+# Server
+# -----------------------------
+def _serve_connection(conn, batcher: MicroBatcher, started: float) -> None:
+    try:
+        _handle(conn, batcher, started)
+    finally:
+        batcher.disconnected(id(conn))
+        conn.close()
+
+
+def _handle(conn, batcher: MicroBatcher, started: float) -> None:
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            if request["op"] == "encode":
+                reply = {"vectors": batcher.submit(request["texts"], request["normalize"], id(conn)).result()}
+            elif request["op"] == "stats":
+                reply = {"stats": dict(batcher.stats(), pid=os.getpid(), uptime_s=time.time() - started)}
+            else:
+                reply = {"error": f"Unknown op {request['op']!r}"}
+        except Exception as e:
+            reply = {"error": str(e)}
+        conn.send(reply)
+
+
+def serve(address: str, model, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS) -> None:
+    if os.path.exists(address):
+        os.remove(address)
+    batcher = MicroBatcher(model, max_batch, max_wait_ms)
+    listener = Listener(address, family="AF_UNIX")
+    # Requests are pickled; only the owning user may connect
+    os.chmod(address, 0o600)
+    started = time.time()
+    print(f"[Embedding Service] Listening on {address} (max batch {max_batch}, max wait {max_wait_ms} ms)")
+    try:
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_serve_connection, args=(conn, batcher, started), daemon=True).start()
+    finally:
+        listener.close()
+
+
+# -----------------------------
+# Client
+# -----------------------------
+class RemoteEmbeddings(Embeddings):
+    """Embeddings computed by the embedding service.
+
+    Matches HuggingFaceEmbeddings (newlines replaced, no normalisation) unless
+    normalize=True. Each thread keeps its own connection to the service.
+    """
+
+    def __init__(self, address: str = EMBEDDING_SOCKET, normalize: bool = False):
+        self.address = address
+        self.normalize = normalize
+        self._local = threading.local()
+
+    def _call(self, request: Dict) -> Dict:
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            try:
+                if conn is None:
+                    conn = self._local.conn = Client(self.address, family="AF_UNIX")
+                conn.send(request)
+                reply = conn.recv()
+                break
+            except (EOFError, OSError):
+                # Service restarted: reconnect once
+                self._local.conn = None
+                if attempt:
+                    raise
+        if "error" in reply:
+            raise RuntimeError(f"Embedding service: {reply['error']}")
+        return reply
+
+    def encode(self, texts: List[str], normalize: Optional[bool] = None) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        normalize = self.normalize if normalize is None else normalize
+        return self._call({"op": "encode", "texts": list(texts), "normalize": normalize})["vectors"]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode([text.replace("\n", " ") for text in texts]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict:
+        return self._call({"op": "stats"})["stats"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=EMBEDDING_SOCKET or "/tmp/dice-embeddings.sock")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--factory", help="module:function returning the model (default: sentence-transformers)")
+    args = parser.parse_args()
+
+    factory = load_model
+    if args.factory:
+        module, name = args.factory.split(":")
+        factory = getattr(importlib.import_module(module), name)
+    start = time.perf_counter()
+    model = factory()
+    print(f"[Embedding Service] Model loaded in {time.perf_counter() - start:.1f}s")
+    serve(args.socket, model, args.max_batch, args.max_wait_ms)
+
+
+if __name__ == "__main__":
+    main()
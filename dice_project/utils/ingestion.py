@@ -0,0 +1,216 @@
+import io
+import os
+import zipfile
+from typing import BinaryIO, Dict, Iterator, List, Optional
+from xml.etree import ElementTree
+
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+# -----------------------------
+# Ingestion stages
+# -----------------------------
+# Kept in an importable module (not the API script) so the stages can run in
+# worker processes.
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+# TXT and DOCX have no pages: their text is cut into pages of about this many characters
+PAGE_CHARS = int(os.getenv("PARSE_PAGE_CHARS", "4000"))
+# PDFs with at least this many pages are parsed in page ranges across the CPU pool
+PARSE_PARALLEL_MIN_PAGES = int(os.getenv("PARSE_PARALLEL_MIN_PAGES", "64"))
+PARSE_PAGES_PER_TASK = int(os.getenv("PARSE_PAGES_PER_TASK", "32"))
+
+# add_start_index records each chunk's character offset, used for stable chunk ids
+text_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True
+)
+
+CONTENT_TYPES = {
+    "application/pdf": "pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "text/plain": "txt",
+}
+EXTENSIONS = {".pdf": "pdf", ".docx": "docx", ".txt": "txt"}
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class UnsupportedFormat(ValueError):
+    """Raised for uploads that are not PDF, DOCX or TXT."""
+
+
+def detect_format(filename: str, content_type: Optional[str]) -> str:
+    """"pdf", "docx" or "txt" from the content type, falling back to the extension."""
+    fmt = CONTENT_TYPES.get((content_type or "").split(";")[0].strip())
+    if fmt is None:
+        fmt = EXTENSIONS.get(os.path.splitext(filename or "")[1].lower())
+    if fmt is None:
+        raise UnsupportedFormat("Only PDF, DOCX and TXT files are allowed.")
+    return fmt
+
+
+# -----------------------------
+# Page readers
+# -----------------------------
+# Each reader yields one Document per page with metadata {"page": n} and
+# holds at most one page of text, so memory does not grow with the file.
+def iter_pdf_pages(source, start: int = 0, stop: Optional[int] = None) -> Iterator[Document]:
+    """source: a binary file or an open PdfReader."""
+    reader = source if isinstance(source, PdfReader) else PdfReader(source)
+    stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+    for i in range(start, stop):
+        text = reader.pages[i].extract_text()
+        # pypdf keeps every object it has parsed (content streams, fonts); drop them page by page
+        reader.resolved_objects.clear()
+        yield Document(page_content=text, metadata={"page": i})
+
+
+def iter_txt_pages(source: BinaryIO, encoding: str = "utf-8") -> Iterator[Document]:
+    text = io.TextIOWrapper(source, encoding=encoding, errors="replace")
+    try:
+        page = 0
+        while True:
+            block = text.read(PAGE_CHARS)
+            if not block:
+                return
+            # Finish the current line so pages do not cut words in half
+            block += text.readline(PAGE_CHARS)
+            yield Document(page_content=block, metadata={"page": page})
+            page += 1
+    finally:
+        # Leave the caller's file open
+        text.detach()
+
+
+def iter_docx_pages(source: BinaryIO) -> Iterator[Document]:
+    """Paragraphs of word/document.xml, streamed, grouped into pages at explicit page breaks or PAGE_CHARS."""
+    with zipfile.ZipFile(source) as archive, archive.open("word/document.xml") as xml:
+        page, lines, size, body = 0, [], 0, None
+        for event, elem in ElementTree.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                if elem.tag == f"{W}body":
+                    body = elem
+                continue
+            if elem.tag != f"{W}p":
+                continue
+            parts, page_break = [], False
+            for node in elem.iter():
+                if node.tag == f"{W}t" and node.text:
+                    parts.append(node.text)
+                elif node.tag == f"{W}tab":
+                    parts.append("\t")
+                elif node.tag in (f"{W}br", f"{W}cr"):
+                    if node.get(f"{W}type") == "page":
+                        page_break = True
+                    else:
+                        parts.append("\n")
+            elem.clear()
+            if body is not None:
+                # Detach finished blocks; open ones (a table being read) are held by the parser
+                del body[:]
+            line = "".join(parts)
+            lines.append(line)
+            size += len(line) + 1
+            if page_break or size >= PAGE_CHARS:
+                yield Document(page_content="\n".join(lines), metadata={"page": page})
+                page, lines, size = page + 1, [], 0
+        if lines:
+            yield Document(page_content="\n".join(lines), metadata={"page": page})
+
+
+def iter_pages(source: BinaryIO, fmt: str) -> Iterator[Document]:
+    if fmt == "pdf":
+        return iter_pdf_pages(source)
+    if fmt == "docx":
+        return iter_docx_pages(source)
+    return iter_txt_pages(source)
+
+
+def split_pages(pages: Iterator[Document]) -> Iterator[Document]:
+    """Chunks of each page as it arrives (start_index is relative to the page, as before)."""
+    for page in pages:
+        yield from text_splitter.split_documents([page])
+
+
+# -----------------------------
+# Worker-process entry points
+# -----------------------------
+# Opening a PDF reads its whole page tree (about 0.7 s for 5,000 pages), so
+# each worker process keeps the last one open for the following page ranges
+_open_pdf: Dict[str, object] = {}
+
+
+def _pdf_reader(file_path: str) -> PdfReader:
+    key = (file_path, os.stat(file_path).st_mtime_ns)
+    if _open_pdf.get("key") != key:
+        if "file" in _open_pdf:
+            _open_pdf["file"].close()
+        f = open(file_path, "rb")
+        _open_pdf.update(key=key, file=f, reader=PdfReader(f))
+    return _open_pdf["reader"]
+
+
+def split_pdf_range(file_path: str, start: int, stop: int) -> List[Document]:
+    """Chunks of pages [start, stop) of a PDF on disk."""
+    return list(split_pages(iter_pdf_pages(_pdf_reader(file_path), start, stop)))
+
+
+def split_document(data: bytes, fmt: str) -> List[Document]:
+    """Chunks of a whole (small) document held in memory."""
+    return list(split_pages(iter_pages(io.BytesIO(data), fmt)))
+
+
+# -----------------------------
+# Chunk stream
+# -----------------------------
+def pdf_page_count(file_path: str) -> int:
+    with open(file_path, "rb") as f:
+        reader = PdfReader(f)
+        # /Count of the root page tree; len(reader.pages) would load every page object
+        try:
+            return int(reader.root_object["/Pages"]["/Count"])
+        except (KeyError, TypeError, ValueError):
+            return len(reader.pages)
+
+
+def iter_chunks(fmt: str, file_path: str = "", data: Optional[bytes] = None,
+                executor=None, window: int = 2) -> Iterator[Document]:
+    """Chunks of an uploaded document, in page order, produced lazily.
+
+    In-memory uploads are small and go to the executor as one task. PDFs on
+    disk go to the executor in page ranges (one range below
+    PARSE_PARALLEL_MIN_PAGES), with at most `window` ranges in flight; TXT and
+    DOCX files are streamed page by page in the calling thread. Without an
+    executor everything runs in the caller.
+    """
+    if data is not None:
+        if executor is None:
+            yield from split_pages(iter_pages(io.BytesIO(data), fmt))
+        else:
+            yield from executor.submit(split_document, data, fmt).result()
+        return
+
+    if fmt == "pdf" and executor is not None:
+        pages = pdf_page_count(file_path)
+        step = PARSE_PAGES_PER_TASK if pages >= PARSE_PARALLEL_MIN_PAGES else max(pages, 1)
+        ranges = iter(range(0, pages, step))
+        running = []
+        try:
+            for start in ranges:
+                running.append(executor.submit(split_pdf_range, file_path, start, start + step))
+                if len(running) >= window:
+                    break
+            while running:
+                chunks = running.pop(0).result()
+                start = next(ranges, None)
+                if start is not None:
+                    running.append(executor.submit(split_pdf_range, file_path, start, start + step))
+                yield from chunks
+        finally:
+            for future in running:
+                future.cancel()
+        return
+
+    with open(file_path, "rb") as f:
+        yield from split_pages(iter_pages(f, fmt))
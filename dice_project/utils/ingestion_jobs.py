@@ -0,0 +1,246 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+# -----------------------------
+# Configuration
+# -----------------------------
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INGESTION_JOBS_PATH = os.getenv("INGESTION_JOBS_PATH", os.path.join(PROJECT_DIR, "ingestion_jobs.db"))
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_MAX_PENDING = int(os.getenv("INGESTION_MAX_PENDING", "100"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    doc_key TEXT,
+    content_type TEXT,
+    file_path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    chunks INTEGER NOT NULL DEFAULT 0,
+    timings TEXT NOT NULL DEFAULT '{}',
+    details TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    owner INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ingestion_jobs_status ON ingestion_jobs(status);
+"""
+
+COLUMNS = ("id", "filename", "doc_key", "content_type", "file_path", "status", "stage",
+           "chunks", "timings", "details", "error", "created", "updated")
+
+
+def _process_start(pid: int) -> Optional[float]:
+    """Epoch start time of a process (Linux only), to tell a reused pid from the original."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, StopIteration):
+        return None
+
+
+def _owner_alive(pid: int, updated: float) -> bool:
+    """Whether the process that claimed a job (last updated at `updated`) is still running."""
+    if pid <= 0 or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    started = _process_start(pid)
+    # A process that started after the job's last update only reuses the pid (e.g. after a container restart)
+    return started is None or started <= updated + 1
+
+
+class QueueFull(Exception):
+    """Raised when too many ingestion jobs are already waiting."""
+
+
+class JobReporter:
+    """Handed to the job function so it can report progress stage by stage."""
+
+    def __init__(self, jobs: "IngestionJobs", job_id: str):
+        self.jobs = jobs
+        self.job_id = job_id
+        self.timings: Dict[str, float] = {}
+        self._stage: Optional[str] = None
+        self._stage_start = 0.0
+
+    def stage(self, name: str, **fields) -> None:
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.timings[self._stage] = round((now - self._stage_start) * 1000, 1)
+        self._stage, self._stage_start = name, now
+        self.jobs._update(self.job_id, stage=name, timings=json.dumps(self.timings), **fields)
+
+    def progress(self, **fields) -> None:
+        """Update counters (e.g. chunks so far) without starting a new stage."""
+        self.jobs._update(self.job_id, **fields)
+
+    def details(self, **details) -> None:
+        """Attach free-form stats (e.g. embedding cache hit ratio) to the job."""
+        self.jobs._update(self.job_id, details=json.dumps(details))
+
+    def finish(self) -> None:
+        if self._stage is not None:
+            self.timings[self._stage] = round((time.perf_counter() - self._stage_start) * 1000, 1)
+        self._stage = None
+
+
+class IngestionJobs:
+    """SQLite-backed ingestion job queue processed by a fixed pool of worker threads.
+
+    Jobs that were queued or running when the process stopped are picked up
+    again on start(). Several API worker processes may share the database: a
+    job is claimed atomically before it runs, and only jobs whose owning
+    process has died are resumed. A job submitted with an in-memory payload
+    (instead of a file on disk) gets it as job["payload"]; the payload only
+    lives in this process's memory, so after a restart such a job fails and
+    the file has to be uploaded again.
+    """
+
+    def __init__(self, process: Callable[[Dict, JobReporter], None], path: str = INGESTION_JOBS_PATH,
+                 workers: int = INGESTION_WORKERS, max_pending: int = INGESTION_MAX_PENDING):
+        self.process = process
+        self.workers = workers
+        self.max_pending = max_pending
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.executescript(SCHEMA)
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(ingestion_jobs)")}
+        if "details" not in existing:
+            self._conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN details TEXT NOT NULL DEFAULT '{}'")
+        if "owner" not in existing:
+            self._conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN owner INTEGER NOT NULL DEFAULT 0")
+        if "doc_key" not in existing:
+            self._conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN doc_key TEXT")
+        if "payload" in existing:
+            # Left by a version that copied small uploads into the database
+            with self._conn:
+                self._conn.execute("UPDATE ingestion_jobs SET payload = NULL WHERE payload IS NOT NULL")
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._payloads: Dict[str, bytes] = {}
+        self._threads = []
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def _update(self, job_id: str, **fields) -> None:
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE ingestion_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _claim(self, job_id: str) -> bool:
+        """Mark a queued job as running in this process; False if another worker got it first."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE ingestion_jobs SET status = 'running', owner = ?, updated = ? WHERE id = ? AND status = 'queued'",
+                (os.getpid(), time.time(), job_id),
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM ingestion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(COLUMNS, row))
+        job["timings"] = json.loads(job["timings"])
+        job["details"] = json.loads(job["details"])
+        return job
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM ingestion_jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()[0]
+
+    # -----------------------------
+    # Queue
+    # -----------------------------
+    def submit(self, filename: str, content_type: str, file_path: str = "", payload: Optional[bytes] = None,
+               doc_key: Optional[str] = None) -> str:
+        if self.pending() >= self.max_pending:
+            raise QueueFull(f"{self.max_pending} ingestion jobs are already pending")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO ingestion_jobs(id, filename, doc_key, content_type, file_path, status, stage, owner, "
+                "created, updated) VALUES (?, ?, ?, ?, ?, 'queued', 'queued', ?, ?, ?)",
+                (job_id, filename, doc_key, content_type, file_path, os.getpid(), now, now),
+            )
+        if payload is not None:
+            self._payloads[job_id] = payload
+        self._queue.put(job_id)
+        return job_id
+
+    def start(self) -> None:
+        # Resume work interrupted by a restart; jobs of live sibling workers are left alone
+        with self._lock:
+            running = self._conn.execute(
+                "SELECT id, owner, updated FROM ingestion_jobs WHERE status = 'running'"
+            ).fetchall()
+        for job_id, owner, updated in running:
+            if not _owner_alive(owner, updated):
+                with self._lock, self._conn:
+                    self._conn.execute(
+                        "UPDATE ingestion_jobs SET status = 'queued', stage = 'queued', updated = ? "
+                        "WHERE id = ? AND status = 'running' AND owner = ?",
+                        (time.time(), job_id, owner),
+                    )
+        with self._lock:
+            queued = self._conn.execute(
+                "SELECT id, owner, updated FROM ingestion_jobs WHERE status = 'queued' ORDER BY created"
+            ).fetchall()
+        # A live sibling runs the jobs it submitted (it may hold their payloads in memory)
+        unfinished = [job_id for job_id, owner, updated in queued if not _owner_alive(owner, updated)]
+        for job_id in unfinished:
+            self._queue.put(job_id)
+        if unfinished:
+            print(f"[Ingestion Jobs] Resuming {len(unfinished)} unfinished job(s)")
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"ingestion-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def _worker(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            if not self._claim(job_id):
+                continue
+            job = self.get(job_id)
+            job["payload"] = self._payloads.pop(job_id, None)
+            reporter = JobReporter(self, job_id)
+            try:
+                self.process(job, reporter)
+                reporter.finish()
+                self._update(job_id, status="done", stage="done", timings=json.dumps(reporter.timings))
+            except Exception as e:
+                reporter.finish()
+                self._update(job_id, status="failed", error=str(e), timings=json.dumps(reporter.timings))
+                print(f"[Ingestion Jobs] Job {job_id} failed: {e}")
@@ -1,46 +1,130 @@
 import os
+import shutil
+import sys
+import time
 import uuid
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, Form, Request, UploadFile, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import json
 from pydantic import BaseModel
-import pinecone
-from langchain_groq import ChatGroq
-from langchain.chains import RetrievalQA
-from langchain.vectorstores import Pinecone
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import List, Optional
+
+# Make the project root importable so the API can share modules with the agents
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Agents.answer_cache import bump_kb_version
+from Agents.batch import BATCH_CONCURRENCY, BATCH_MAX_QUESTIONS, BatchRunner
+from utils.qa_pipeline import QAPipeline, server_timing_header, source_chunks, timings_trace
+from utils.ingestion import UnsupportedFormat, detect_format, iter_chunks
+from utils.workers import Overloaded, cpu_pool, io_pool
+from utils.ingestion_jobs import IngestionJobs, QueueFull
+from utils.embedding_cache import CachedEmbeddings, EmbeddingStore, EMBEDDING_BATCH_SIZE, chunk_key
+from utils.embedding_service import EMBEDDING_SOCKET, RemoteEmbeddings
+from utils.document_manifest import DocumentManifest, chunk_id, data_hash, document_id, file_hash
+from utils.vector_store import VECTOR_BACKEND, get_vectorstore
+from utils.lazy import LazyResource, WarmUp, readiness
+from utils.llm_gateway import chat_model, gateway_stats
+from utils import metrics
 
 # Load environment variables
 load_dotenv()
 
 class QueryRequest(BaseModel):
     query: str
+    # Optional per-request retrieval overrides
+    k: Optional[int] = None
+    score_threshold: Optional[float] = None
+    search_type: Optional[str] = None  # "similarity" or "mmr"
+    # Return a text/event-stream of answer tokens instead of a single JSON body
+    stream: bool = False
+    # Include per-stage spans in the response
+    trace: bool = False
+
+class BatchQuestionRequest(BaseModel):
+    questions: List[str]
+    # Questions answered at the same time; defaults to BATCH_CONCURRENCY
+    concurrency: Optional[int] = None
+    # Attach each question's node / LLM / SQL spans to its result line
+    trace: bool = False
 
 # Set environment variables (replace with your own keys)
-os.environ["HUGGINGFACEHUB_API_TOKEN"] = os.getenv("HUGGINGFACEHUB_API_TOKEN")
-os.environ["PINECONE_API_KEY"] = os.getenv("PINECONE_API_KEY")
+# HUGGINGFACEHUB_API_TOKEN and PINECONE_API_KEY are read from the environment / .env;
+# the Pinecone key is only needed when VECTOR_BACKEND=pinecone
 os.environ["PINECONE_ENV"] = "us-east-1"
 os.environ["INDEX_NAME"] =  os.getenv("INDEX_NAME", "gen-ai") 
 os.environ["GROQ_API_KEY"] = os.getenv("GROQ_API_KEY") 
 
-# Initialize components once at app startup
-hugging_face_embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
+# Heavy components are built on first use (or by the warm-up thread), so
+# uvicorn starts accepting requests without waiting for the model download,
+# the Pinecone handshake or the Groq client
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Load the model and ping the LLM in the background right after startup
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+
+
+def load_embeddings():
+    if EMBEDDING_SOCKET:
+        # Shared model in the embedding service; fail here (not on first query) if it is down
+        embeddings = RemoteEmbeddings(EMBEDDING_SOCKET)
+        embeddings.stats()
+        return embeddings
+    from langchain.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE},
+    )
+
+
+def load_llm():
+    # Same gateway (connection pool, rate-limit budget) as the agents' client
+    return chat_model(
+        temperature=0.7,
+        model_name="llama-3.3-70b-versatile",
+    )
+
+
+hugging_face_embeddings = LazyResource("embeddings", load_embeddings)
+# Pinecone or an in-process index, selected by VECTOR_BACKEND
+vectorstore = LazyResource(
+    f"vectorstore:{VECTOR_BACKEND}",
+    lambda: get_vectorstore(hugging_face_embeddings.get(), index_name="gen-ai"),
 )
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-
-vectorstore = Pinecone.from_existing_index(
-    index_name="gen-ai", embedding=hugging_face_embeddings
-)
-retriever = vectorstore.as_retriever()
-print("[+]  RETRIEVER Loaded")
-llm = ChatGroq(
-    temperature=0.7,
-    model_name="llama-3.3-70b-versatile",
+llm = LazyResource("llm", load_llm)
+# Long-lived QA pipeline shared by every /chatbot request
+qa_pipeline = LazyResource(
+    "qa_pipeline",
+    lambda: QAPipeline(llm=llm.get(), embeddings=hugging_face_embeddings.get(), vectorstore=vectorstore.get()),
 )
-print("[+]  LLM Loaded")
+
+def load_graph():
+    # The DB/KB agent graph, only imported when /ask/batch is first used
+    from Agents import KB_agent
+    from Agents.app_graph import build_cached_app
+    # Its KB node answers from this process's pipeline instead of POSTing back to /chatbot
+    KB_agent.use_pipeline(qa_pipeline)
+    return build_cached_app()
+
+
+graph = LazyResource("graph", load_graph)
+warm_up = WarmUp()
+
+# Content-addressed cache so re-ingested chunks skip the model
+embedding_store = EmbeddingStore()
+# What has been ingested, so re-uploads only touch new, changed or stale chunks
+document_manifest = DocumentManifest()
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_THREADS = int(os.getenv("UPSERT_THREADS", "4"))
+DELETE_BATCH_SIZE = 1000
+# Uploads up to this size (Starlette's in-memory spool limit) are parsed straight from
+# memory; larger ones are already spooled to disk and are copied to Documents/
+INGESTION_INLINE_MAX_BYTES = int(os.getenv("INGESTION_INLINE_MAX_BYTES", str(1024 * 1024)))
+
+
+async def get_pipeline() -> QAPipeline:
+    """The QA pipeline, built off the event loop if this is its first use."""
+    if qa_pipeline.loaded:
+        return qa_pipeline.get()
+    return await io_pool.run(qa_pipeline.get)
 
 # Create the folder if it doesn't exist
 folder_name = "Documents"
@@ -50,6 +134,46 @@ if not os.path.exists(folder_name):
 # Step 4 : Initailize FastApi
 app = FastAPI()
 
+
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route template (not the raw path) keeps label cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.http_latency.observe(time.perf_counter() - start, request.method, route)
+        metrics.http_requests.inc(request.method, route, str(status))
+
+
+# Only with metrics on: the middleware wraps every request (and its streaming body)
+if metrics.METRICS_ENABLED:
+    app.middleware("http")(record_request_metrics)
+
+
+@app.on_event("startup")
+def start_warm_up():
+    if STARTUP_WARMUP:
+        warm_up.start([
+            ("embed", lambda: hugging_face_embeddings.get().embed_query("warm up")),
+            ("vectorstore", vectorstore.get),
+            ("llm", lambda: llm.get().invoke("ping")),
+            ("qa_pipeline", qa_pipeline.get),
+        ])
+
+
+@app.on_event("shutdown")
+def shutdown_pools():
+    io_pool.shutdown()
+    cpu_pool.shutdown()
+
+
+def overloaded_response(e: Exception) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
 #Step 5 Get an endpoint 
 
 @app.get("/test")
@@ -58,46 +182,202 @@ def testing():
     return JSONResponse(content={"message": msg})
 
 
-# POST endpoint to handle file ingestion
-@app.post("/ingestion-pipeline")
-async def upload_file(file: UploadFile = File(...)):
-    try:
-        if not file:
-            raise HTTPException(status_code=400, detail="No file provided")
+# Readiness: 200 once the warm-up has loaded every component (or is disabled),
+# 503 while it is running or after it failed; always lists per-component load times
+@app.get("/ready")
+def ready():
+    report = readiness(warm_up)
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
 
-        # Check file type
-        file_type = file.content_type
-        if file_type != "application/pdf":
-            raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
 
-        # Generate unique filename BEFORE saving
-        unique_filename = f"temp_pdf_{uuid.uuid4().hex}.pdf"
-        file_path = os.path.join(folder_name, unique_filename)
+def write_file(file_path: str, source):
+    # Copy the (spooled) upload in blocks rather than reading it whole
+    with open(file_path, "wb") as f:
+        shutil.copyfileobj(source, f, 1 << 20)
 
-        # Save uploaded file into Documents folder
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
 
-        # Load PDF
-        loader = PyPDFLoader(file_path)
-        documents = loader.load()
+def upload_size(file: UploadFile) -> int:
+    source = file.file
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(0)
+    return size
 
-        # Split into smaller chunks
-        splitted_texts = text_splitter.split_documents(documents)
 
-        # Insert into Pinecone Vector Database
-        Pinecone.from_documents(
-            splitted_texts, hugging_face_embeddings, index_name="gen-ai"
-        )
+def delete_vectors(ids):
+    """Remove vectors from the index in batches."""
+    for i in range(0, len(ids), DELETE_BATCH_SIZE):
+        vectorstore.get().delete(ids=ids[i:i + DELETE_BATCH_SIZE])
 
+
+def run_ingestion_job(job, report):
+    """Parse, split, embed and upsert one uploaded file (runs on an ingestion worker)."""
+    file_path = job["file_path"]
+    payload = job.get("payload")
+    source = job["filename"]
+    try:
+        if payload is None and not file_path:
+            raise RuntimeError("The upload was held in memory and lost in a restart; upload it again")
+        # One id per document (its key, else its file name); the hash only tells whether it changed
+        doc_id = document_id(job.get("doc_key") or source)
+        content_hash = data_hash(payload) if payload is not None else file_hash(file_path)
+        if document_manifest.is_unchanged(doc_id, content_hash):
+            report.details(doc_id=doc_id, skipped="unchanged")
+            return
+
+        # Pages are parsed and split lazily (page ranges of large PDFs on the CPU pool)
+        # and each batch of chunks is embedded and upserted as soon as it is ready
+        report.stage("parsing")
+        fmt = detect_format(source, job["content_type"])
+        # Page ranges go through cpu_pool's admission, so they count towards its limit and stats
+        chunks = iter_chunks(fmt, file_path, payload, executor=cpu_pool, window=cpu_pool.max_workers + 1)
+        existing = document_manifest.chunk_ids(doc_id)
+        embeddings = CachedEmbeddings(hugging_face_embeddings.get(), EMBEDDING_MODEL, store=embedding_store)
+        ingest_store = None
+        hashes, pending, upserted = {}, [], 0
+
+        def flush():
+            nonlocal ingest_store, upserted
+            if ingest_store is None:
+                report.stage("embedding")
+                ingest_store = get_vectorstore(embeddings, index_name="gen-ai", pool_threads=UPSERT_THREADS)
+            # Insert new or changed chunks into the vector index, embedding only chunks not seen before
+            ingest_store.add_texts(
+                [doc.page_content for _, doc in pending],
+                metadatas=[dict(doc.metadata) for _, doc in pending],
+                ids=[cid for cid, _ in pending],
+                batch_size=UPSERT_BATCH_SIZE,
+            )
+            upserted += len(pending)
+            pending.clear()
+            report.progress(chunks=len(hashes))
+
+        for doc in chunks:
+            # Deterministic ids so re-ingestion overwrites instead of duplicating
+            cid = chunk_id(doc_id, doc.metadata.get("page", 0), doc.metadata.get("start_index", 0))
+            doc.metadata.update({"source": source, "doc_id": doc_id})
+            hashes[cid] = chunk_key(doc.page_content, EMBEDDING_MODEL)
+            if existing.get(cid) != hashes[cid]:
+                pending.append((cid, doc))
+                if len(pending) >= UPSERT_BATCH_SIZE * UPSERT_THREADS:
+                    flush()
+        if pending:
+            flush()
+        report.progress(chunks=len(hashes))
+
+        # Drop chunks that no longer exist in the new version of the document
+        to_delete = [cid for cid in existing if cid not in hashes]
+        if to_delete:
+            report.stage("deleting")
+            delete_vectors(to_delete)
+
+        document_manifest.record(doc_id, source, content_hash, hashes)
+        report.details(
+            doc_id=doc_id, format=fmt, upserted=upserted, deleted=len(to_delete),
+            unchanged=len(hashes) - upserted, embedding=embeddings.stats(),
+        )
+    finally:
         # Delete file after processing
-        if os.path.exists(file_path):
+        if file_path and os.path.exists(file_path):
             os.remove(file_path)
 
+    # Cached KB answers may now be out of date
+    bump_kb_version()
+
+
+ingestion_jobs = IngestionJobs(process=run_ingestion_job)
+
+
+@app.on_event("startup")
+def start_ingestion_workers():
+    ingestion_jobs.start()
+
+
+@app.on_event("shutdown")
+def stop_ingestion_workers():
+    ingestion_jobs.stop()
+
+
+# POST endpoint to handle file ingestion: queues a background job and returns its id.
+# An upload replaces the document with the same doc_key (default: its file name, case-insensitive)
+@app.post("/ingestion-pipeline", status_code=202)
+async def upload_file(file: UploadFile = File(...), doc_key: Optional[str] = Form(None)):
+    try:
+        if not file:
+            raise HTTPException(status_code=400, detail="No file provided")
+
+        # Check file type: PDF, DOCX or TXT
+        file_type = file.content_type
+        try:
+            fmt = detect_format(file.filename, file_type)
+        except UnsupportedFormat as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        size = await io_pool.run(upload_size, file)
+        if size <= INGESTION_INLINE_MAX_BYTES:
+            # Small uploads are parsed from memory, no trip through Documents/ (re-upload after a restart)
+            job_id = ingestion_jobs.submit(file.filename, file_type, payload=await file.read(), doc_key=doc_key)
+        else:
+            # Generate unique filename BEFORE saving
+            unique_filename = f"temp_{fmt}_{uuid.uuid4().hex}.{fmt}"
+            file_path = os.path.abspath(os.path.join(folder_name, unique_filename))
+
+            # Copy the spooled upload into Documents folder; it is removed once the job finishes
+            await io_pool.run(write_file, file_path, file.file)
+
+            try:
+                job_id = ingestion_jobs.submit(file.filename, file_type, file_path, doc_key=doc_key)
+            except QueueFull:
+                os.remove(file_path)
+                raise
+
         return JSONResponse(
-            content={"message": "Data ingested into vector database successfully."}
+            status_code=202,
+            content={"message": "File queued for ingestion.", "job_id": job_id, "status": "queued"},
         )
 
+    except HTTPException:
+        raise
+    except (Overloaded, QueueFull) as e:
+        raise overloaded_response(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# GET endpoint reporting an ingestion job's stage, chunk count and timings
+@app.get("/ingestion-jobs/{job_id}")
+def ingestion_job_status(job_id: str):
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingestion job")
+    job.pop("file_path", None)
+    return JSONResponse(content=job)
+
+
+# GET endpoint listing ingested documents
+@app.get("/documents")
+def list_documents():
+    return JSONResponse(content={"documents": document_manifest.list()})
+
+
+# DELETE endpoint removing every vector of a document
+@app.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str):
+    try:
+        if document_manifest.get(doc_id) is None:
+            raise HTTPException(status_code=404, detail="Unknown document")
+
+        ids = list(document_manifest.chunk_ids(doc_id))
+        await io_pool.run(delete_vectors, ids)
+        document_manifest.delete(doc_id)
+        bump_kb_version()
+
+        return JSONResponse(content={"doc_id": doc_id, "deleted_chunks": len(ids)})
+
+    except HTTPException:
+        raise
+    except Overloaded as e:
+        raise overloaded_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -128,14 +408,107 @@ async def query_vectorstore(request: QueryRequest):
                 status_code=400, detail="Missing 'query' in request body"
             )
 
-        # Set up QA chain
-        qa = RetrievalQA.from_chain_type(llm=llm, retriever=retriever)
+        if request.search_type not in (None, "similarity", "mmr"):
+            raise HTTPException(
+                status_code=400, detail="search_type must be 'similarity' or 'mmr'"
+            )
 
-        result = qa.invoke({"query": query})
+        if request.stream:
+            return StreamingResponse(
+                stream_answer(request), media_type="text/event-stream"
+            )
 
-        return JSONResponse(content={"results": result["result"]})
+        pipeline = await get_pipeline()
+        result, timings = await pipeline.ainvoke(
+            query,
+            k=request.k,
+            score_threshold=request.score_threshold,
+            search_type=request.search_type,
+            run_blocking=io_pool.run,
+        )
 
+        content = {"results": result["result"], "sources": source_chunks(result["source_documents"])}
+        if request.trace:
+            content["trace"] = timings_trace(timings)
+        return JSONResponse(
+            content=content,
+            headers={"Server-Timing": server_timing_header(timings)},
+        )
+
+    except HTTPException:
+        raise
+    except Overloaded as e:
+        raise overloaded_response(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def stream_answer(request: QueryRequest):
+    """Server-sent events: one "token" event per chunk, then "done" (or "error")."""
+    try:
+        pipeline = await get_pipeline()
+        async for event in pipeline.astream(
+            request.query,
+            k=request.k,
+            score_threshold=request.score_threshold,
+            search_type=request.search_type,
+            run_blocking=io_pool.run,
+        ):
+            yield f"data: {json.dumps(event)}\n\n"
+    except Exception as e:
+        yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+
+
+# POST endpoint answering many questions through the agent graph; streams
+# newline-delimited JSON: a "batch" line, one "result" line per unique
+# question as it finishes, then a "done" line
+@app.post("/ask/batch")
+async def ask_batch(request: BatchQuestionRequest):
+    questions = request.questions
+    if not any(q.strip() for q in questions):
+        raise HTTPException(status_code=400, detail="No questions provided")
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    try:
+        app_graph = graph.get() if graph.loaded else await io_pool.run(graph.get)
+    except Overloaded as e:
+        raise overloaded_response(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    runner = BatchRunner(app_graph, request.concurrency or BATCH_CONCURRENCY, trace=request.trace)
+    unique = len(runner.dedupe(questions))
+
+    def lines():
+        # A sync generator: Starlette iterates it on its thread pool, off the event loop
+        start = time.perf_counter()
+        yield json.dumps({"type": "batch", "questions": len(questions), "unique": unique,
+                          "concurrency": runner.concurrency}) + "\n"
+        failed = 0
+        for item in runner.stream(questions):
+            failed += "error" in item
+            yield json.dumps({"type": "result", **item}, default=str) + "\n"
+        elapsed = time.perf_counter() - start
+        yield json.dumps({"type": "done", "elapsed_s": round(elapsed, 3), "failed": failed,
+                          "unique_questions_per_s": round(unique / elapsed, 2) if elapsed else None}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# Prometheus scrape endpoint (every worker's metrics with METRICS_MULTIPROC_DIR, else this worker's)
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# Per-stage KB latency (embed query, vector search, LLM) over recent requests
+@app.get("/chatbot/metrics")
+def chatbot_metrics():
+    return JSONResponse(content={
+        "stages": qa_pipeline.get().timings.summary() if qa_pipeline.loaded else {},
+        "pools": {"io": io_pool.stats(), "cpu": cpu_pool.stats()},
+        "llm_gateway": gateway_stats(),
+        "embedding_service": hugging_face_embeddings.get().stats()
+        if EMBEDDING_SOCKET and hugging_face_embeddings.loaded else None,
+    })
 
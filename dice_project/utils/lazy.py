@@ -0,0 +1,128 @@
+import threading
+import time
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+# -----------------------------
+# Lazy resources
+# -----------------------------
+class LazyResource(Generic[T]):
+    """A heavy object (model, client, index) built on first use, exactly once.
+
+    get() is thread-safe: concurrent callers wait for the single build.
+    Load time and failures are kept for readiness reporting; a failed build
+    is retried on the next get().
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value: Optional[T] = None
+        self.status = "not_loaded"  # not_loaded | loading | ready | failed
+        self.load_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        registry[name] = self
+
+    @property
+    def loaded(self) -> bool:
+        return self.status == "ready"
+
+    def get(self) -> T:
+        if self.status == "ready":
+            return self._value
+        with self._lock:
+            if self.status != "ready":
+                self.status = "loading"
+                start = time.perf_counter()
+                try:
+                    self._value = self._factory()
+                except Exception as e:
+                    self.status = "failed"
+                    self.error = str(e)
+                    print(f"[Startup] {self.name} failed to load: {e}")
+                    raise
+                self.load_ms = (time.perf_counter() - start) * 1000
+                self.error = None
+                self.status = "ready"
+                print(f"[Startup] {self.name} loaded in {self.load_ms:.0f} ms")
+        return self._value
+
+    def set(self, value: T) -> None:
+        """Install a ready-made value instead of building one (e.g. a stub in benchmarks)."""
+        with self._lock:
+            self._value = value
+            self.load_ms = 0.0
+            self.error = None
+            self.status = "ready"
+
+    def describe(self) -> Dict:
+        return {
+            "status": self.status,
+            "load_ms": round(self.load_ms, 1) if self.load_ms is not None else None,
+            "error": self.error,
+        }
+
+
+registry: Dict[str, LazyResource] = {}
+
+
+# -----------------------------
+# Warm-up
+# -----------------------------
+class WarmUp:
+    """Loads resources (and runs optional probe calls) on a background thread."""
+
+    def __init__(self):
+        self.status = "disabled"  # disabled | running | done | failed
+        self.started: Optional[float] = None
+        self.elapsed_ms: Optional[float] = None
+        self.steps: Dict[str, Dict] = {}
+        self.error: Optional[str] = None
+
+    def start(self, steps: List[tuple]) -> threading.Thread:
+        """steps: (name, callable) pairs run in order; any failure marks warm-up failed."""
+        self.status = "running"
+        self.started = time.perf_counter()
+        thread = threading.Thread(target=self._run, args=(steps,), name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self, steps: List[tuple]) -> None:
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                step()
+                self.steps[name] = {"ms": round((time.perf_counter() - start) * 1000, 1)}
+            except Exception as e:
+                self.steps[name] = {"error": str(e)}
+                self.error = f"{name}: {e}"
+                self.status = "failed"
+                print(f"[Startup] Warm-up step {name} failed: {e}")
+                return
+        self.elapsed_ms = (time.perf_counter() - self.started) * 1000
+        self.status = "done"
+        print(f"[Startup] Warm-up finished in {self.elapsed_ms:.0f} ms")
+
+    @property
+    def ready(self) -> bool:
+        return self.status in ("disabled", "done")
+
+    def describe(self) -> Dict:
+        return {
+            "status": self.status,
+            "elapsed_ms": round(self.elapsed_ms, 1) if self.elapsed_ms is not None else None,
+            "steps": self.steps,
+            "error": self.error,
+        }
+
+
+def readiness(warm_up: WarmUp) -> Dict:
+    """Per-component load state and time, plus the warm-up result."""
+    return {
+        "ready": warm_up.ready,
+        "warm_up": warm_up.describe(),
+        "components": {name: resource.describe() for name, resource in registry.items()},
+    }
@@ -0,0 +1,530 @@
+"""Shared Groq HTTP client: pooled connections, a priority token bucket, retries and coalescing.
+
+Every ChatGroq in the app is built by chat_model(), which hands it this
+module's httpx clients. The gateway is an httpx transport under the Groq SDK,
+so chains, structured output and streaming go through it unchanged:
+
+- one connection pool per process (per event loop for async calls)
+- a tokens-per-minute budget, resynced from Groq's x-ratelimit-* headers;
+  calls waiting for budget are admitted by priority (routing first,
+  summaries last), set with purpose() around the call
+- 429, 5xx and connection errors are retried with jittered exponential
+  backoff; a 429 pauses the whole bucket for its Retry-After
+- identical non-streaming requests in flight at the same time share one
+  upstream call
+
+GROQ_API_BASE points the clients at another server (benchmarks/mock_groq.py).
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from hashlib import sha256
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from utils import metrics
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# Starting budget (llama-3.3-70b-versatile on Groq's free tier); replaced by the
+# limit Groq reports once the first response arrives. 0 disables local throttling
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "12000"))
+# Groq's request limits are per day and come back in the headers; set this for a per-minute cap
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "16"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_S = float(os.getenv("LLM_RETRY_BASE_S", "0.5"))
+LLM_RETRY_MAX_S = float(os.getenv("LLM_RETRY_MAX_S", "30"))
+# Longest a call waits for budget before failing with LLMThrottled
+LLM_QUEUE_TIMEOUT_S = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "60"))
+LLM_COALESCE = os.getenv("LLM_COALESCE", "true").lower() == "true"
+# Completion tokens assumed for a request without max_tokens
+LLM_COMPLETION_ESTIMATE = int(os.getenv("LLM_COMPLETION_ESTIMATE", "256"))
+# Lower runs first; calls without a purpose get DEFAULT_PRIORITY
+LLM_PRIORITIES = {
+    name.strip(): int(value)
+    for name, _, value in (
+        item.partition(":") for item in os.getenv("LLM_PRIORITIES", "route:0,sql:1,answer:1,summary:2").split(",")
+    )
+    if name.strip() and value.strip()
+}
+DEFAULT_PRIORITY = 1
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+POLL_S = 0.05
+
+
+class LLMThrottled(Exception):
+    """Raised when a call waited LLM_QUEUE_TIMEOUT_S without getting rate-limit budget."""
+
+
+# -----------------------------
+# Call purpose
+# -----------------------------
+_purpose: ContextVar = ContextVar("llm_purpose", default=None)
+
+
+@contextmanager
+def purpose(call: str):
+    """Tag the LLM requests made inside the block ("route", "sql", "summary", "answer")."""
+    token = _purpose.set(call)
+    try:
+        yield
+    finally:
+        try:
+            _purpose.reset(token)
+        except ValueError:
+            # An abandoned async generator closed from another context, which never saw the value
+            pass
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds from Groq's reset headers ("7.66s", "2m59.56s", "120ms") or a plain Retry-After."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+# -----------------------------
+# Budget
+# -----------------------------
+class TokenBucket:
+    """Tokens (and optionally requests) per minute, refilled continuously. Not thread-safe on its own."""
+
+    def __init__(self, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+                 requests_per_minute: int = LLM_REQUESTS_PER_MINUTE):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.request_capacity = float(requests_per_minute)
+        self.requests = self.request_capacity
+        self.paused_until = 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.updated = now
+        if self.capacity:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.capacity / 60)
+        if self.request_capacity:
+            self.requests = min(self.request_capacity, self.requests + elapsed * self.request_capacity / 60)
+
+    def wait_time(self, cost: float, now: float) -> float:
+        """Seconds until a call of `cost` tokens fits; 0 when it fits now."""
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        wait = 0.0
+        if self.capacity:
+            # A prompt bigger than the whole budget waits for a full bucket
+            missing = min(cost, self.capacity) - self.tokens
+            if missing > 0:
+                wait = missing * 60 / self.capacity
+        if self.request_capacity and self.requests < 1:
+            wait = max(wait, (1 - self.requests) * 60 / self.request_capacity)
+        return wait
+
+    def take(self, cost: float) -> None:
+        if self.capacity:
+            self.tokens -= min(cost, self.capacity)
+        if self.request_capacity:
+            self.requests -= 1
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], reset_s: Optional[float]) -> None:
+        """Adopt the budget the provider reports."""
+        self._refill(time.monotonic())
+        if limit and self.capacity:
+            self.capacity = limit
+        if remaining is not None and self.capacity:
+            self.tokens = min(self.capacity, remaining)
+            if remaining <= 0 and reset_s:
+                self.pause(reset_s)
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class Scheduler:
+    """Admits calls against the bucket in (priority, arrival) order.
+
+    Sync callers wait on a condition; async callers poll with asyncio.sleep,
+    so neither holds the other up.
+    """
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self._cond = threading.Condition()
+        self._waiting: List[list] = []  # heap of [priority, seq, alive]
+        self._seq = itertools.count()
+
+    def _enqueue(self, priority: int) -> list:
+        entry = [priority, next(self._seq), True]
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            self._depth()
+        return entry
+
+    def _try(self, entry: list, cost: float) -> float:
+        """0 when admitted (entry removed), else seconds to wait before trying again."""
+        with self._cond:
+            while self._waiting and not self._waiting[0][2]:
+                heapq.heappop(self._waiting)
+            if self._waiting[0] is not entry:
+                return POLL_S
+            wait = self.bucket.wait_time(cost, time.monotonic())
+            if wait > 0:
+                return wait
+            heapq.heappop(self._waiting)
+            self.bucket.take(cost)
+            self._depth()
+            self._cond.notify_all()
+            return 0.0
+
+    def _abandon(self, entry: list) -> None:
+        with self._cond:
+            entry[2] = False
+            self._depth()
+            self._cond.notify_all()
+
+    def _depth(self) -> None:
+        metrics.llm_queue_depth.set(sum(1 for e in self._waiting if e[2]))
+        metrics.llm_tokens_available.set(round(self.bucket.tokens))
+
+    def acquire(self, cost: float, priority: int, timeout: float = LLM_QUEUE_TIMEOUT_S) -> float:
+        """Block until admitted; returns the seconds waited."""
+        start = time.monotonic()
+        entry = self._enqueue(priority)
+        while True:
+            wait = self._try(entry, cost)
+            if wait == 0:
+                return time.monotonic() - start
+            if time.monotonic() - start + wait > timeout:
+                self._abandon(entry)
+                raise LLMThrottled(f"No LLM rate-limit budget within {timeout:.0f}s")
+            with self._cond:
+                self._cond.wait(min(wait, POLL_S * 4))
+
+    async def aacquire(self, cost: float, priority: int, timeout: float = LLM_QUEUE_TIMEOUT_S) -> float:
+        start = time.monotonic()
+        entry = self._enqueue(priority)
+        try:
+            while True:
+                wait = self._try(entry, cost)
+                if wait == 0:
+                    return time.monotonic() - start
+                if time.monotonic() - start + wait > timeout:
+                    raise LLMThrottled(f"No LLM rate-limit budget within {timeout:.0f}s")
+                await asyncio.sleep(min(wait, POLL_S))
+        except BaseException:
+            # Includes cancellation of the waiting request
+            if entry[2]:
+                self._abandon(entry)
+            raise
+
+    def depth(self) -> int:
+        with self._cond:
+            return sum(1 for e in self._waiting if e[2])
+
+
+# -----------------------------
+# Gateway
+# -----------------------------
+class _Call:
+    """What the gateway needs to know about one request."""
+
+    __slots__ = ("name", "priority", "cost", "key")
+
+    def __init__(self, request: httpx.Request, coalesce: bool):
+        self.name = _purpose.get() or "other"
+        self.priority = LLM_PRIORITIES.get(self.name, DEFAULT_PRIORITY)
+        self.cost = float(LLM_COMPLETION_ESTIMATE)
+        self.key = None
+        try:
+            body = json.loads(request.content or b"{}")
+        except (httpx.RequestNotRead, ValueError):
+            return
+        # About four characters per token for the prompt, plus the completion allowance
+        prompt_chars = sum(len(str(m.get("content") or "")) for m in body.get("messages", []))
+        prompt_chars += len(json.dumps(body["tools"])) if body.get("tools") else 0
+        self.cost = prompt_chars / 4 + (body.get("max_tokens") or body.get("max_completion_tokens")
+                                        or LLM_COMPLETION_ESTIMATE)
+        if coalesce and not body.get("stream"):
+            self.key = sha256(request.method.encode() + str(request.url).encode() + request.content).hexdigest()
+
+
+class LLMGateway:
+    def __init__(self, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+                 requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+                 max_connections: int = LLM_MAX_CONNECTIONS, max_retries: int = LLM_MAX_RETRIES,
+                 coalesce: bool = LLM_COALESCE, queue_timeout: float = LLM_QUEUE_TIMEOUT_S):
+        self.bucket = TokenBucket(tokens_per_minute, requests_per_minute)
+        self.scheduler = Scheduler(self.bucket)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_retries = max_retries
+        self.coalesce = coalesce
+        self.queue_timeout = queue_timeout
+        self._flights: Dict[str, Future] = {}
+        self._flights_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "upstream": 0, "coalesced": 0, "retries": 0, "throttled_local": 0,
+                       "throttled_429": 0, "rejected": 0, "wait_s": 0.0}
+        self.client = httpx.Client(transport=GatewayTransport(self))
+        self.async_client = httpx.AsyncClient(transport=AsyncGatewayTransport(self))
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    # Admission
+    def _admitted(self, call: _Call, waited: float) -> None:
+        metrics.llm_queue_wait.observe(waited, call.name)
+        self._count("wait_s", waited)
+        if waited > POLL_S:
+            metrics.llm_throttled.inc(call.name, "local")
+            self._count("throttled_local")
+
+    def _rejected(self, call: _Call) -> None:
+        metrics.llm_throttled.inc(call.name, "timeout")
+        self._count("rejected")
+
+    def acquire(self, call: _Call) -> None:
+        try:
+            waited = self.scheduler.acquire(call.cost, call.priority, self.queue_timeout)
+        except LLMThrottled:
+            self._rejected(call)
+            raise
+        self._admitted(call, waited)
+
+    async def aacquire(self, call: _Call) -> None:
+        try:
+            waited = await self.scheduler.aacquire(call.cost, call.priority, self.queue_timeout)
+        except LLMThrottled:
+            self._rejected(call)
+            raise
+        self._admitted(call, waited)
+
+    # Responses
+    def observe(self, call: _Call, response: httpx.Response, attempt: int) -> Optional[float]:
+        """Resync the bucket from the response; seconds to wait before retrying, or None to return it."""
+        self._count("upstream")
+        metrics.llm_upstream.inc(call.name, str(response.status_code))
+        headers = response.headers
+        with self.scheduler._cond:
+            self.bucket.sync(
+                _float(headers.get("x-ratelimit-limit-tokens")),
+                _float(headers.get("x-ratelimit-remaining-tokens")),
+                parse_duration(headers.get("x-ratelimit-reset-tokens")),
+            )
+            if response.status_code == 429:
+                retry_after = parse_duration(headers.get("retry-after")) or \
+                    parse_duration(headers.get("x-ratelimit-reset-tokens")) or self.backoff(attempt)
+                # Nobody gets budget until the provider's window has moved on
+                self.bucket.pause(retry_after)
+            self.scheduler._cond.notify_all()
+        if response.status_code == 429:
+            metrics.llm_throttled.inc(call.name, "429")
+            self._count("throttled_429")
+        if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+            return None
+        self.retried(call, str(response.status_code))
+        # 429s wait in the (paused) scheduler on the next attempt; server errors back off here
+        return 0.0 if response.status_code == 429 else self.backoff(attempt)
+
+    def retried(self, call: _Call, reason: str) -> None:
+        metrics.llm_retries.inc(call.name, reason)
+        self._count("retries")
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max, base * 2^attempt)]."""
+        return random.uniform(0, min(LLM_RETRY_MAX_S, LLM_RETRY_BASE_S * 2 ** attempt))
+
+    # Coalescing
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """The flight for key and whether the caller leads it (sends the request)."""
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = Future()
+            return flight, True
+
+    def land(self, key: str) -> None:
+        with self._flights_lock:
+            self._flights.pop(key, None)
+
+    def follow(self, call: _Call) -> None:
+        metrics.llm_coalesced.inc(call.name)
+        self._count("coalesced")
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        with self.scheduler._cond:
+            self.bucket._refill(time.monotonic())
+            budget = {
+                "tokens_per_minute": self.bucket.capacity,
+                "tokens_available": round(self.bucket.tokens),
+                "paused_for_s": round(max(0.0, self.bucket.paused_until - time.monotonic()), 2),
+            }
+        stats["wait_s"] = round(stats["wait_s"], 2)
+        return dict(stats, queue_depth=self.scheduler.depth(), in_flight_coalesced=len(self._flights), **budget)
+
+
+def _float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _replay(request: httpx.Request, result: Tuple[int, list, bytes]) -> httpx.Response:
+    status, headers, body = result
+    return httpx.Response(status, headers=headers, stream=httpx.ByteStream(body), request=request)
+
+
+# -----------------------------
+# Transports
+# -----------------------------
+class GatewayTransport(httpx.BaseTransport):
+    def __init__(self, gateway: LLMGateway):
+        self.gateway = gateway
+        self._inner = httpx.HTTPTransport(limits=gateway.limits)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        gateway = self.gateway
+        gateway._count("requests")
+        call = _Call(request, gateway.coalesce)
+        if call.key is None:
+            return self._send(request, call)
+        flight, leader = gateway.join(call.key)
+        if not leader:
+            gateway.follow(call)
+            return _replay(request, flight.result())
+        try:
+            response = self._send(request, call)
+            try:
+                result = (response.status_code, response.headers.raw, b"".join(response.stream))
+            finally:
+                response.close()
+            flight.set_result(result)
+            return _replay(request, result)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            gateway.land(call.key)
+
+    def _send(self, request: httpx.Request, call: _Call) -> httpx.Response:
+        gateway = self.gateway
+        attempt = 0
+        while True:
+            gateway.acquire(call)
+            try:
+                response = self._inner.handle_request(request)
+            except httpx.TransportError:
+                if attempt >= gateway.max_retries:
+                    raise
+                gateway.retried(call, "connect")
+                time.sleep(gateway.backoff(attempt))
+                attempt += 1
+                continue
+            delay = gateway.observe(call, response, attempt)
+            if delay is None:
+                return response
+            response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+class AsyncGatewayTransport(httpx.AsyncBaseTransport):
+    def __init__(self, gateway: LLMGateway):
+        self.gateway = gateway
+        # Pooled connections belong to the loop that opened them
+        self._inners = weakref.WeakKeyDictionary()
+
+    def _inner(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        inner = self._inners.get(loop)
+        if inner is None:
+            inner = self._inners[loop] = httpx.AsyncHTTPTransport(limits=self.gateway.limits)
+        return inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        gateway = self.gateway
+        gateway._count("requests")
+        call = _Call(request, gateway.coalesce)
+        if call.key is None:
+            return await self._send(request, call)
+        flight, leader = gateway.join(call.key)
+        if not leader:
+            gateway.follow(call)
+            return _replay(request, await asyncio.wrap_future(flight))
+        try:
+            response = await self._send(request, call)
+            try:
+                result = (response.status_code, response.headers.raw, b"".join([c async for c in response.stream]))
+            finally:
+                await response.aclose()
+            flight.set_result(result)
+            return _replay(request, result)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            gateway.land(call.key)
+
+    async def _send(self, request: httpx.Request, call: _Call) -> httpx.Response:
+        gateway = self.gateway
+        attempt = 0
+        while True:
+            await gateway.aacquire(call)
+            try:
+                response = await self._inner().handle_async_request(request)
+            except httpx.TransportError:
+                if attempt >= gateway.max_retries:
+                    raise
+                gateway.retried(call, "connect")
+                await asyncio.sleep(gateway.backoff(attempt))
+                attempt += 1
+                continue
+            delay = gateway.observe(call, response, attempt)
+            if delay is None:
+                return response
+            await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+gateway = LLMGateway()
+
+
+def chat_model(**kwargs):
+    """ChatGroq on the shared gateway clients; the gateway does the retrying, not the SDK."""
+    from langchain_groq import ChatGroq
+    return ChatGroq(http_client=gateway.client, http_async_client=gateway.async_client, max_retries=0, **kwargs)
+
+
+def gateway_stats() -> Dict:
+    return gateway.stats()
@@ -0,0 +1,422 @@
+"""Prometheus metrics and opt-in per-request traces for the agents and the API.
+
+Metrics are counters, gauges and histograms rendered in the Prometheus text
+format (GET /metrics on the API, or METRICS_PORT for other processes). They
+are process-local unless METRICS_MULTIPROC_DIR is set, in which case every
+process sharing the directory reports the sum over all of them.
+A trace is a list of timed spans for one request, started with trace_request()
+and returned next to the answer. With METRICS_ENABLED=false and no trace
+active, span() hands back a shared no-op context manager.
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# -----------------------------
+# Configuration
+# -----------------------------
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Port of the standalone exposition server (Streamlit process); 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Shared directory where each API worker process writes its metrics, so a scrape
+# of any worker reports all of them (run-all.py sets it with --workers > 1)
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+PREFIX = "dice_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+TOKEN_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+# -----------------------------
+# Metric types
+# -----------------------------
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+        registry.append(self)
+
+    def snapshot(self) -> Dict[Tuple, object]:
+        with self._lock:
+            return {labels: list(value) if isinstance(value, list) else value
+                    for labels, value in self._values.items()}
+
+    def render(self, values: Optional[Dict[Tuple, object]] = None, label_names: Optional[Tuple] = None) -> List[str]:
+        """Exposition lines for this process's values, or for values merged from several processes."""
+        values = self.snapshot() if values is None else values
+        label_names = self.label_names if label_names is None else label_names
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(values.items()):
+            lines.extend(self._render_series(label_names, labels, value))
+        return lines
+
+    def _render_series(self, label_names: Tuple, labels: Tuple, value) -> List[str]:
+        return [f"{self.name}{_labels(label_names, labels)} {value:g}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down (queue depth, budget left); the last set() wins."""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def _render_series(self, label_names: Tuple, labels: Tuple, series) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + ("+Inf",), series):
+            cumulative += count
+            le = 'le="{}"'.format(bound if bound == "+Inf" else f"{bound:g}")
+            lines.append(f"{self.name}_bucket{_labels(label_names, labels, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(label_names, labels)} {series[-1]:g}")
+        lines.append(f"{self.name}_count{_labels(label_names, labels)} {cumulative}")
+        return lines
+
+
+registry: List[_Metric] = []
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format.
+
+    With METRICS_MULTIPROC_DIR set, the sum over every process writing there
+    (e.g. all API workers behind one port), otherwise this process's own.
+    """
+    if METRICS_MULTIPROC_DIR:
+        return _render_multiprocess()
+    return "\n".join(line for metric in registry for line in metric.render()) + "\n"
+
+
+# -----------------------------
+# Several worker processes
+# -----------------------------
+# Each process writes a snapshot of its metrics to METRICS_MULTIPROC_DIR every
+# METRICS_FLUSH_INTERVAL seconds. A scrape merges the snapshots: counters and
+# histograms are summed (files of exited workers are kept so totals never go
+# down), gauges get a pid label and are dropped once their process is gone.
+_snapshot_file = f"{os.getpid()}-{int(time.time() * 1000)}.json"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _snapshot() -> Dict[str, List]:
+    return {metric.name: [[list(labels), value] for labels, value in metric.snapshot().items()]
+            for metric in registry}
+
+
+def flush() -> None:
+    """Write this process's metrics to METRICS_MULTIPROC_DIR."""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    path = os.path.join(METRICS_MULTIPROC_DIR, _snapshot_file)
+    try:
+        with open(path + ".tmp", "w") as f:
+            json.dump(_snapshot(), f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"[Metrics] Could not write {path}: {e}")
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        flush()
+
+
+def _read_snapshots() -> List[Tuple[int, Dict[str, List]]]:
+    snapshots = [(os.getpid(), _snapshot())]
+    try:
+        names = os.listdir(METRICS_MULTIPROC_DIR)
+    except OSError:
+        names = []
+    for name in names:
+        if not name.endswith(".json") or name == _snapshot_file:
+            continue
+        try:
+            with open(os.path.join(METRICS_MULTIPROC_DIR, name)) as f:
+                snapshots.append((int(name.split("-", 1)[0]), json.load(f)))
+        except (OSError, ValueError):
+            continue  # being replaced, or not ours
+    return snapshots
+
+
+def _render_multiprocess() -> str:
+    snapshots = _read_snapshots()
+    lines = []
+    for metric in registry:
+        merged: Dict[Tuple, object] = {}
+        for pid, snapshot in snapshots:
+            if isinstance(metric, Gauge) and not _pid_alive(pid):
+                continue
+            for labels, value in snapshot.get(metric.name, []):
+                labels = tuple(labels)
+                if isinstance(metric, Gauge):
+                    merged[labels + (str(pid),)] = value
+                elif labels not in merged:
+                    merged[labels] = value
+                elif isinstance(metric, Histogram):
+                    merged[labels] = [a + b for a, b in zip(merged[labels], value)]
+                else:
+                    merged[labels] += value
+        label_names = metric.label_names + ("pid",) if isinstance(metric, Gauge) else None
+        lines.extend(metric.render(merged, label_names))
+    return "\n".join(lines) + "\n"
+
+
+if METRICS_MULTIPROC_DIR and METRICS_ENABLED:
+    os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+    atexit.register(flush)
+    threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+
+
+# -----------------------------
+# Metrics
+# -----------------------------
+http_requests = Counter("http_requests_total", "API requests.", ("method", "route", "status"))
+http_latency = Histogram("http_request_seconds", "API request latency (until the response starts).",
+                         ("method", "route"))
+span_latency = Histogram("span_seconds", "Latency of graph nodes and the work inside them.", ("span",))
+span_errors = Counter("span_errors_total", "Spans that raised.", ("span",))
+llm_calls = Counter("llm_calls_total", "LLM calls by purpose and outcome.", ("call", "outcome"))
+llm_tokens = Histogram("llm_tokens", "Tokens per LLM call.", ("call", "kind"), buckets=TOKEN_BUCKETS)
+cache_lookups = Counter("cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result"))
+sql_rows = Histogram("sql_rows_returned", "Rows returned by generated SELECT queries.", buckets=ROW_BUCKETS)
+sql_errors = Counter("sql_errors_total", "SQL errors by kind.", ("kind",))
+db_paths = Counter("db_agent_path_total", "How the DB agent produced its SQL and answer.", ("path",))
+route_decisions = Counter("route_decisions_total", "Routing decisions by router tier.", ("tier", "route"))
+llm_queue_depth = Gauge("llm_gateway_queue_depth", "LLM calls waiting for rate-limit budget.")
+llm_tokens_available = Gauge("llm_gateway_tokens_available", "Tokens left in the LLM gateway's per-minute budget.")
+llm_queue_wait = Histogram("llm_gateway_wait_seconds", "Time LLM calls waited for rate-limit budget.", ("call",))
+llm_throttled = Counter("llm_gateway_throttled_total",
+                        "LLM calls delayed or rejected by rate limits, by where the limit was hit.", ("call", "reason"))
+llm_retries = Counter("llm_gateway_retries_total", "LLM requests retried, by cause.", ("call", "reason"))
+llm_coalesced = Counter("llm_gateway_coalesced_total", "LLM calls answered by an identical call in flight.", ("call",))
+llm_upstream = Counter("llm_gateway_upstream_requests_total", "Requests sent to the LLM provider, by status.",
+                       ("call", "status"))
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    cache_lookups.inc(cache, "hit" if hit else "miss")
+
+
+# -----------------------------
+# Traces
+# -----------------------------
+class Trace:
+    """Spans of one request; parallel graph branches append from their own threads."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: List[Dict] = []
+
+    def add(self, name: str, start: float, end: float, **attrs) -> None:
+        span = {
+            "span": name,
+            "start_ms": round((start - self.started) * 1000, 2),
+            "duration_ms": round((end - start) * 1000, 2),
+        }
+        span.update({key: value for key, value in attrs.items() if value is not None})
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start_ms"])
+        return {"total_ms": round((time.perf_counter() - self.started) * 1000, 2), "spans": spans}
+
+
+_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextmanager
+def trace_request(enabled: bool = True):
+    """Collect spans for the code run inside the block (and threads started with its context)."""
+    if not enabled:
+        yield None
+        return
+    trace = Trace()
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+class _Span:
+    __slots__ = ("name", "trace", "attrs", "start")
+
+    def __init__(self, name: str, trace: Optional[Trace]):
+        self.name = name
+        self.trace = trace
+        self.attrs: Dict = {}
+
+    def set(self, **attrs) -> None:
+        """Attach attributes (rows, tokens, cache hit...) shown in the trace."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        span_latency.observe(end - self.start, self.name)
+        if exc_type is GeneratorExit:
+            # A streaming consumer stopped early (e.g. a cancelled speculative branch)
+            self.attrs["cancelled"] = True
+        elif exc_type is not None:
+            span_errors.inc(self.name)
+            self.attrs["error"] = str(exc)
+        if self.trace is not None:
+            self.trace.add(self.name, self.start, end, **self.attrs)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str):
+    """Time a block into dice_span_seconds{span=name} and the current trace, if any."""
+    trace = _trace.get()
+    if not METRICS_ENABLED and trace is None:
+        return _NOOP
+    return _Span(name, trace)
+
+
+def add_remote_spans(prefix: str, timings: Dict[str, float], remote: bool = True) -> None:
+    """Record stage timings measured by another service (e.g. the KB API's Server-Timing) in the trace.
+
+    remote=False is for stage timings a component measured in this process (the in-process KB pipeline).
+    """
+    trace = _trace.get()
+    if trace is None:
+        return
+    end = time.perf_counter()
+    for stage, ms in timings.items():
+        trace.add(f"{prefix}.{stage}", end - ms / 1000, end, remote=remote or None)
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    timings = {}
+    for part in (header or "").split(","):
+        name, _, duration = part.strip().partition(";dur=")
+        try:
+            timings[name] = float(duration)
+        except ValueError:
+            continue
+    return timings
+
+
+# -----------------------------
+# Exposition server
+# -----------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics for processes without the API (the Streamlit UI); no-op when port is 0."""
+    if not port or not METRICS_ENABLED:
+        return None
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    except OSError as e:
+        print(f"[Metrics] Could not listen on port {port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"[Metrics] Serving on :{port}/metrics")
+    return server
@@ -0,0 +1,261 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain.chains import RetrievalQA
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import format_document
+
+from utils import llm_gateway, metrics
+
+# -----------------------------
+# Retrieval defaults (overridable per request)
+# -----------------------------
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+RETRIEVAL_SCORE_THRESHOLD = os.getenv("RETRIEVAL_SCORE_THRESHOLD")
+RETRIEVAL_SEARCH_TYPE = os.getenv("RETRIEVAL_SEARCH_TYPE", "similarity")  # "similarity" or "mmr"
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+RETRIEVAL_LAMBDA_MULT = float(os.getenv("RETRIEVAL_LAMBDA_MULT", "0.5"))
+# Characters of each retrieved chunk returned as a source next to the answer; 0 keeps the whole chunk
+SOURCE_TEXT_CHARS = int(os.getenv("SOURCE_TEXT_CHARS", "500"))
+
+STAGES = ("embed", "search", "llm")
+
+
+class StageTimings:
+    """Rolling window of per-stage latencies for the metrics endpoint."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {stage: deque(maxlen=window) for stage in STAGES + ("total",)}
+
+    def record(self, timings: Dict[str, float]) -> None:
+        with self._lock:
+            for stage, ms in timings.items():
+                self._samples[stage].append(ms)
+        for stage, ms in timings.items():
+            metrics.span_latency.observe(ms / 1000, f"qa.{stage}")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            out = {}
+            for stage, samples in self._samples.items():
+                ordered = sorted(samples)
+                if not ordered:
+                    out[stage] = {"count": 0}
+                    continue
+                out[stage] = {
+                    "count": len(ordered),
+                    "mean_ms": round(sum(ordered) / len(ordered), 2),
+                    "p50_ms": round(ordered[len(ordered) // 2], 2),
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                }
+            return out
+
+
+class QAPipeline:
+    """RetrievalQA built once at startup and run stage by stage.
+
+    The chain (prompt template + stuff documents chain) is constructed a single
+    time; each query runs embed -> vector search -> LLM explicitly so every
+    stage can be timed and the retrieval parameters overridden per request.
+    """
+
+    def __init__(self, llm, embeddings, vectorstore,
+                 k: int = RETRIEVAL_K,
+                 score_threshold: Optional[float] = (
+                     float(RETRIEVAL_SCORE_THRESHOLD) if RETRIEVAL_SCORE_THRESHOLD else None
+                 ),
+                 search_type: str = RETRIEVAL_SEARCH_TYPE,
+                 fetch_k: int = RETRIEVAL_FETCH_K,
+                 lambda_mult: float = RETRIEVAL_LAMBDA_MULT):
+        self.embeddings = embeddings
+        self.vectorstore = vectorstore
+        self.k = k
+        self.score_threshold = score_threshold
+        self.search_type = search_type
+        self.fetch_k = fetch_k
+        self.lambda_mult = lambda_mult
+        self.chain = RetrievalQA.from_chain_type(llm=llm, retriever=vectorstore.as_retriever())
+        self.combine_documents_chain = self.chain.combine_documents_chain
+        # Same prompt and LLM as the stuff chain, as a runnable that can stream tokens
+        llm_chain = self.combine_documents_chain.llm_chain
+        self.answer_stream = llm_chain.prompt | llm_chain.llm | StrOutputParser()
+        self.timings = StageTimings()
+
+    def retrieve(self, vector: List[float], k: int, score_threshold: Optional[float],
+                 search_type: str) -> List:
+        if search_type == "mmr":
+            return self.vectorstore.max_marginal_relevance_search_by_vector(
+                vector, k=k, fetch_k=max(self.fetch_k, k), lambda_mult=self.lambda_mult
+            )
+        docs_and_scores = self.vectorstore.similarity_search_by_vector_with_score(vector, k=k)
+        if score_threshold is not None:
+            docs_and_scores = [(doc, score) for doc, score in docs_and_scores if score >= score_threshold]
+        return [doc for doc, _ in docs_and_scores]
+
+    def invoke(self, query: str, k: Optional[int] = None, score_threshold: Optional[float] = None,
+               search_type: Optional[str] = None) -> Tuple[Dict, Dict[str, float]]:
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        vector = self.embeddings.embed_query(query)
+        timings["embed"] = (time.perf_counter() - start) * 1000
+
+        t = time.perf_counter()
+        docs = self.retrieve(
+            vector,
+            k or self.k,
+            score_threshold if score_threshold is not None else self.score_threshold,
+            search_type or self.search_type,
+        )
+        timings["search"] = (time.perf_counter() - t) * 1000
+
+        t = time.perf_counter()
+        with llm_gateway.purpose("answer"):
+            output = self.combine_documents_chain.invoke({"input_documents": docs, "question": query})
+        timings["llm"] = (time.perf_counter() - t) * 1000
+        timings["total"] = (time.perf_counter() - start) * 1000
+
+        self.timings.record(timings)
+        return {"result": output["output_text"], "source_documents": docs}, timings
+
+    async def ainvoke(self, query: str, k: Optional[int] = None, score_threshold: Optional[float] = None,
+                      search_type: Optional[str] = None,
+                      run_blocking: Optional[Callable[..., Awaitable]] = None) -> Tuple[Dict, Dict[str, float]]:
+        """Async variant: embedding and search go to run_blocking, the LLM call is awaited natively."""
+        run_blocking = run_blocking or asyncio.to_thread
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        vector = await run_blocking(self.embeddings.embed_query, query)
+        timings["embed"] = (time.perf_counter() - start) * 1000
+
+        t = time.perf_counter()
+        docs = await run_blocking(
+            self.retrieve,
+            vector,
+            k or self.k,
+            score_threshold if score_threshold is not None else self.score_threshold,
+            search_type or self.search_type,
+        )
+        timings["search"] = (time.perf_counter() - t) * 1000
+
+        t = time.perf_counter()
+        with llm_gateway.purpose("answer"):
+            output = await self.combine_documents_chain.ainvoke({"input_documents": docs, "question": query})
+        timings["llm"] = (time.perf_counter() - t) * 1000
+        timings["total"] = (time.perf_counter() - start) * 1000
+
+        self.timings.record(timings)
+        return {"result": output["output_text"], "source_documents": docs}, timings
+
+    def prompt_inputs(self, query: str, docs: List) -> Dict[str, str]:
+        """The stuff chain's prompt variables, for streaming the answer outside the chain."""
+        stuff = self.combine_documents_chain
+        return {
+            stuff.document_variable_name: stuff.document_separator.join(
+                format_document(doc, stuff.document_prompt) for doc in docs
+            ),
+            "question": query,
+        }
+
+    def stream(self, query: str, k: Optional[int] = None, score_threshold: Optional[float] = None,
+               search_type: Optional[str] = None) -> Iterator[Dict]:
+        """Synchronous astream(), for callers already on a worker thread (the agent graph)."""
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        vector = self.embeddings.embed_query(query)
+        timings["embed"] = (time.perf_counter() - start) * 1000
+
+        t = time.perf_counter()
+        docs = self.retrieve(
+            vector,
+            k or self.k,
+            score_threshold if score_threshold is not None else self.score_threshold,
+            search_type or self.search_type,
+        )
+        timings["search"] = (time.perf_counter() - t) * 1000
+
+        t = time.perf_counter()
+        parts = []
+        with llm_gateway.purpose("answer"):
+            for token in self.answer_stream.stream(self.prompt_inputs(query, docs)):
+                if not parts:
+                    timings["first_token"] = (time.perf_counter() - start) * 1000
+                parts.append(token)
+                yield {"type": "token", "text": token}
+        timings["llm"] = (time.perf_counter() - t) * 1000
+        timings["total"] = (time.perf_counter() - start) * 1000
+
+        self.timings.record({stage: timings[stage] for stage in STAGES + ("total",)})
+        yield {"type": "done", "results": "".join(parts), "sources": source_chunks(docs), "timings": timings}
+
+    async def astream(self, query: str, k: Optional[int] = None, score_threshold: Optional[float] = None,
+                      search_type: Optional[str] = None,
+                      run_blocking: Optional[Callable[..., Awaitable]] = None) -> AsyncIterator[Dict]:
+        """Yield {"type": "token", "text"} events as the answer is generated, then a "done" event."""
+        run_blocking = run_blocking or asyncio.to_thread
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        vector = await run_blocking(self.embeddings.embed_query, query)
+        timings["embed"] = (time.perf_counter() - start) * 1000
+
+        t = time.perf_counter()
+        docs = await run_blocking(
+            self.retrieve,
+            vector,
+            k or self.k,
+            score_threshold if score_threshold is not None else self.score_threshold,
+            search_type or self.search_type,
+        )
+        timings["search"] = (time.perf_counter() - t) * 1000
+
+        t = time.perf_counter()
+        parts = []
+        with llm_gateway.purpose("answer"):
+            async for token in self.answer_stream.astream(self.prompt_inputs(query, docs)):
+                if not parts:
+                    timings["first_token"] = (time.perf_counter() - start) * 1000
+                parts.append(token)
+                yield {"type": "token", "text": token}
+        timings["llm"] = (time.perf_counter() - t) * 1000
+        timings["total"] = (time.perf_counter() - start) * 1000
+
+        self.timings.record({stage: timings[stage] for stage in STAGES + ("total",)})
+        yield {"type": "done", "results": "".join(parts), "sources": source_chunks(docs), "timings": timings}
+
+
+def source_chunks(docs: List, text_chars: int = SOURCE_TEXT_CHARS) -> List[Dict]:
+    """The retrieved chunks an answer was generated from: document, page and (clipped) text."""
+    sources = []
+    for doc in docs:
+        text = doc.page_content
+        if text_chars and len(text) > text_chars:
+            text = text[:text_chars].rstrip() + "…"
+        sources.append({
+            "source": doc.metadata.get("source", ""),
+            "page": doc.metadata.get("page"),
+            "text": text,
+        })
+    return sources
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format stage timings as a Server-Timing header value."""
+    return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in timings.items())
+
+
+def timings_trace(timings: Dict[str, float]) -> Dict:
+    """Stage timings in the request-trace format (the stages run back to back)."""
+    spans, offset = [], 0.0
+    for stage in STAGES:
+        if stage in timings:
+            spans.append({"span": f"qa.{stage}", "start_ms": round(offset, 2), "duration_ms": round(timings[stage], 2)})
+            offset += timings[stage]
+    return {"total_ms": round(timings.get("total", offset), 2), "spans": spans}
@@ -0,0 +1,392 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: the local backends are then single-process only
+    fcntl = None
+
+# -----------------------------
+# Configuration
+# -----------------------------
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")  # "pinecone", "numpy" or "ivf"
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", os.path.join(PROJECT_DIR, "vector_store"))
+INDEX_NAME = os.getenv("INDEX_NAME", "gen-ai")
+# Below this many vectors the IVF backend just does exact search
+IVF_MIN_SIZE = int(os.getenv("IVF_MIN_SIZE", "20000"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# -----------------------------
+# On-disk index
+# -----------------------------
+class LocalIndex:
+    """Cosine-similarity index persisted as a memory-mapped float32 matrix.
+
+    Row payloads (id, text, metadata) live in a small SQLite file next to the
+    matrix. Deleted rows are tombstoned, not compacted. With ivf=True, rows are
+    bucketed under k-means centroids once the index is large enough, and a
+    query only scores the rows in its nprobe nearest buckets.
+
+    Several processes (API workers) may share a directory: writers hold an
+    exclusive lock on index.lock, and every write bumps a generation counter
+    in the info table; a process that sees a new generation reloads the
+    row count, capacity and IVF state before allocating rows or searching.
+    """
+
+    def __init__(self, directory: str, ivf: bool = False, nprobe: int = IVF_NPROBE,
+                 ivf_min_size: int = IVF_MIN_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ivf = ivf
+        self.nprobe = nprobe
+        self.ivf_min_size = ivf_min_size
+        self._lock = threading.RLock()
+        self._lock_file = open(os.path.join(directory, "index.lock"), "a+")
+        self._lock_depth = 0
+        self._conn = sqlite3.connect(os.path.join(directory, "rows.db"), check_same_thread=False, timeout=30)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rows (row INTEGER PRIMARY KEY, id TEXT UNIQUE, text TEXT, metadata TEXT);
+            CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._load(dict(self._conn.execute("SELECT key, value FROM info").fetchall()))
+
+    def _load(self, info: Dict[str, str]) -> None:
+        self.generation = int(info.get("generation", 0))
+        self.dim = int(info.get("dim", 0))
+        self.size = int(info.get("size", 0))  # rows ever written, including tombstones
+        self.capacity = int(info.get("capacity", 0))
+        self.vectors: Optional[np.memmap] = None
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        if self.dim:
+            self.vectors = self._open_matrix("vectors.f32", np.float32, (self.capacity, self.dim))
+            for (row,) in self._conn.execute("SELECT row FROM rows"):
+                self.alive[row] = True
+
+        # IVF state
+        self.centroids: Optional[np.ndarray] = None
+        self.assign: Optional[np.memmap] = None
+        self.lists: Dict[int, np.ndarray] = {}
+        self.trained_size = int(info.get("trained_size", 0))
+        centroid_path = os.path.join(self.directory, "ivf_centroids.npy")
+        if self.ivf and self.dim and os.path.exists(centroid_path):
+            self.centroids = np.load(centroid_path)
+            self.assign = self._open_matrix("ivf_assign.i32", np.int32, (self.capacity,))
+            self._rebuild_lists()
+
+    # -----------------------------
+    # Storage
+    # -----------------------------
+    def _open_matrix(self, name: str, dtype, shape) -> np.memmap:
+        path = os.path.join(self.directory, name)
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < nbytes:
+                f.truncate(nbytes)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _sync(self) -> None:
+        """Reload the shared state if another process wrote since this one last looked."""
+        row = self._conn.execute("SELECT value FROM info WHERE key = 'generation'").fetchone()
+        if (int(row[0]) if row else 0) != self.generation:
+            self._load(dict(self._conn.execute("SELECT key, value FROM info").fetchall()))
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive across threads and processes, with the state synced first; bumps the generation."""
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                if self._lock_depth == 1:
+                    self._sync()
+                yield
+            finally:
+                try:
+                    if self._lock_depth == 1:
+                        # Also after a failed write, so other processes reload whatever did land
+                        self.generation += 1
+                        self._set_info(generation=self.generation)
+                finally:
+                    self._lock_depth -= 1
+                    if self._lock_depth == 0 and fcntl is not None:
+                        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _set_info(self, **values) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO info(key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()]
+            )
+
+    def _grow(self, needed: int) -> None:
+        if needed <= self.capacity:
+            return
+        capacity = max(1024, self.capacity)
+        while capacity < needed:
+            capacity *= 2
+        if self.vectors is not None:
+            self.vectors.flush()
+        self.capacity = capacity
+        self.vectors = self._open_matrix("vectors.f32", np.float32, (capacity, self.dim))
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+        if self.assign is not None:
+            self.assign.flush()
+            self.assign = self._open_matrix("ivf_assign.i32", np.int32, (capacity,))
+        self._set_info(capacity=capacity)
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, texts: List[str], metadatas: List[dict]) -> None:
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._writing():
+            if not self.dim:
+                self.dim = vectors.shape[1]
+                self._set_info(dim=self.dim)
+            existing = dict(self._conn.execute(
+                f"SELECT id, row FROM rows WHERE id IN ({', '.join('?' * len(ids))})", ids
+            ).fetchall()) if ids else {}
+            rows = []
+            for vector_id in ids:
+                if vector_id in existing:
+                    rows.append(existing[vector_id])
+                else:
+                    rows.append(self.size)
+                    self.size += 1
+            self._grow(self.size)
+
+            rows_arr = np.asarray(rows, dtype=np.int64)
+            self.vectors[rows_arr] = vectors
+            self.vectors.flush()
+            self.alive[rows_arr] = True
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO rows(row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                    [(row, vid, text, json.dumps(meta)) for row, vid, text, meta in zip(rows, ids, texts, metadatas)],
+                )
+            self._set_info(size=self.size)
+
+            if self.ivf:
+                if self.centroids is not None and self.count() < 4 * self.trained_size:
+                    self._assign_rows(rows_arr)
+                elif self.count() >= self.ivf_min_size:
+                    self.train()
+
+    def delete(self, ids: List[str]) -> None:
+        with self._writing():
+            rows = [row for (row,) in self._conn.execute(
+                f"SELECT row FROM rows WHERE id IN ({', '.join('?' * len(ids))})", ids
+            )] if ids else []
+            self.alive[rows] = False
+            with self._conn:
+                self._conn.executemany("DELETE FROM rows WHERE row = ?", [(row,) for row in rows])
+
+    def count(self) -> int:
+        return int(self.alive[:self.size].sum())
+
+    def payloads(self, rows: List[int]) -> Dict[int, Tuple[str, str, dict]]:
+        with self._lock:
+            found = self._conn.execute(
+                f"SELECT row, id, text, metadata FROM rows WHERE row IN ({', '.join('?' * len(rows))})",
+                [int(r) for r in rows],
+            ).fetchall() if rows else []
+        return {row: (vid, text, json.loads(meta)) for row, vid, text, meta in found}
+
+    # -----------------------------
+    # IVF
+    # -----------------------------
+    def train(self, iterations: int = 10, sample_size: int = 100_000, seed: int = 0) -> None:
+        """Spherical k-means over a sample of live rows; nlist ~ sqrt(n)."""
+        with self._writing():
+            live = np.flatnonzero(self.alive[:self.size])
+            rng = np.random.default_rng(seed)
+            nlist = max(1, min(int(np.sqrt(len(live))), len(live)))
+            sample = self.vectors[rng.choice(live, size=min(sample_size, len(live)), replace=False)]
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                # Empty clusters keep their previous centroid
+                filled = np.bincount(labels, minlength=nlist) > 0
+                centroids[filled] = _normalize(sums[filled])
+
+            self.centroids = centroids.astype(np.float32)
+            np.save(os.path.join(self.directory, "ivf_centroids.npy"), self.centroids)
+            self.assign = self._open_matrix("ivf_assign.i32", np.int32, (self.capacity,))
+            self._assign_rows(live, rebuild=True)
+            self.trained_size = len(live)
+            self._set_info(trained_size=self.trained_size)
+            print(f"[Vector Store] Trained IVF with {nlist} lists over {len(live)} vectors")
+
+    def _assign_rows(self, rows: np.ndarray, rebuild: bool = False) -> None:
+        for start in range(0, len(rows), 65536):
+            batch = rows[start:start + 65536]
+            self.assign[batch] = np.argmax(self.vectors[batch] @ self.centroids.T, axis=1)
+        self.assign.flush()
+        if rebuild:
+            self._rebuild_lists()
+        else:
+            for c in np.unique(self.assign[rows]):
+                self.lists[int(c)] = np.union1d(self.lists.get(int(c), np.empty(0, np.int64)),
+                                                rows[self.assign[rows] == c])
+
+    def _rebuild_lists(self) -> None:
+        live = np.flatnonzero(self.alive[:self.size])
+        labels = np.asarray(self.assign[live])
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(len(self.centroids) + 1))
+        self.lists = {c: live[order[bounds[c]:bounds[c + 1]]] for c in range(len(self.centroids))}
+
+    # -----------------------------
+    # Search
+    # -----------------------------
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        with self._lock:
+            self._sync()
+            if not self.size:
+                return []
+            if self.ivf and self.centroids is not None:
+                probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+                candidates = np.unique(np.concatenate(
+                    [self.lists.get(int(c), np.empty(0, np.int64)) for c in probes]
+                ))
+                candidates = candidates[self.alive[candidates]]
+                scores = self.vectors[candidates] @ query
+            else:
+                candidates = np.arange(self.size)
+                scores = np.asarray(self.vectors[:self.size] @ query)
+                scores[~self.alive[:self.size]] = -np.inf
+            if not len(candidates):
+                return []
+            k = min(k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(candidates[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+# -----------------------------
+# LangChain vector store
+# -----------------------------
+class LocalVectorStore(VectorStore):
+    """In-process drop-in for the Pinecone store (ingestion and /chatbot use the same calls)."""
+
+    def __init__(self, index: LocalIndex, embedding: Embeddings):
+        self.index = index
+        self._embedding = embedding
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, batch_size: int = 1000, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        if ids is None:
+            ids = [uuid.uuid4().hex for _ in texts]
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            vectors = np.asarray(self._embedding.embed_documents(batch), dtype=np.float32)
+            self.index.upsert(ids[i:i + batch_size], vectors, batch, metadatas[i:i + batch_size])
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if ids:
+            self.index.delete(ids)
+        return True
+
+    def _documents(self, hits: List[Tuple[int, float]]) -> List[Tuple[Document, float]]:
+        payloads = self.index.payloads([row for row, _ in hits])
+        results = []
+        for row, score in hits:
+            if row in payloads:
+                vid, text, metadata = payloads[row]
+                results.append((Document(page_content=text, metadata=metadata, id=vid), score))
+        return results
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self._documents(self.index.search(np.asarray(embedding), k))
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5, **kwargs: Any) -> List[Document]:
+        from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+        hits = self.index.search(np.asarray(embedding), fetch_k)
+        if not hits:
+            return []
+        candidates = np.asarray(self.index.vectors[[row for row, _ in hits]])
+        selected = maximal_marginal_relevance(
+            np.asarray(embedding, dtype=np.float32), candidates, k=k, lambda_mult=lambda_mult
+        )
+        docs = self._documents(hits)
+        return [docs[i][0] for i in selected if i < len(docs)]
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20,
+                                      lambda_mult: float = 0.5, **kwargs: Any) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k=k, fetch_k=fetch_k, lambda_mult=lambda_mult
+        )
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, index_name: str = INDEX_NAME, ivf: bool = False,
+                   **kwargs: Any) -> "LocalVectorStore":
+        store = cls(get_local_index(index_name, ivf=ivf), embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+
+_indexes: Dict[str, LocalIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_local_index(index_name: str = INDEX_NAME, ivf: bool = False) -> LocalIndex:
+    """One LocalIndex per directory per process, shared by query and ingestion stores."""
+    directory = os.path.join(VECTOR_STORE_DIR, index_name)
+    with _indexes_lock:
+        if directory not in _indexes:
+            _indexes[directory] = LocalIndex(directory, ivf=ivf)
+        return _indexes[directory]
+
+
+def get_vectorstore(embedding: Embeddings, index_name: str = INDEX_NAME,
+                    backend: str = VECTOR_BACKEND, pool_threads: int = 4) -> VectorStore:
+    """Vector store for the configured backend."""
+    if backend == "pinecone":
+        from langchain_community.vectorstores import Pinecone
+        return Pinecone.from_existing_index(index_name=index_name, embedding=embedding, pool_threads=pool_threads)
+    if backend in ("numpy", "ivf"):
+        return LocalVectorStore(get_local_index(index_name, ivf=backend == "ivf"), embedding)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
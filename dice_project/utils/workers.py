@@ -0,0 +1,103 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict
+
+# -----------------------------
+# Bounded executors
+# -----------------------------
+# Blocking work (PDF parsing, embedding, vector store calls) runs off the event
+# loop on these pools. Each pool admits at most max_workers + max_queue jobs;
+# anything beyond that is rejected immediately so the API can answer 503
+# instead of piling up requests. Background work (ingestion jobs) submits from
+# its own threads and waits for a free slot instead.
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))
+IO_QUEUE = int(os.getenv("IO_QUEUE", "32"))
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+CPU_QUEUE = int(os.getenv("CPU_QUEUE", "8"))
+
+
+class Overloaded(Exception):
+    """Raised when a pool's queue-depth limit is reached."""
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, max_workers: int, max_queue: int, processes: bool = False):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.processes = processes
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        self._inflight = 0
+        self.rejected = 0
+        self.completed = 0
+
+    @property
+    def pool(self):
+        # Created on first use so importing the API does not fork worker processes
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if self.processes:
+                        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                    else:
+                        self._pool = ThreadPoolExecutor(
+                            max_workers=self.max_workers, thread_name_prefix=self.name
+                        )
+        return self._pool
+
+    def _acquire(self, wait: bool = False) -> None:
+        with self._lock:
+            while self._inflight >= self.max_workers + self.max_queue:
+                if not wait:
+                    self.rejected += 1
+                    raise Overloaded(f"{self.name} pool is at capacity ({self._inflight} jobs in flight)")
+                self._slot_free.wait()
+            self._inflight += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._inflight -= 1
+            self.completed += 1
+            self._slot_free.notify()
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run a blocking callable on the pool without blocking the event loop."""
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, partial(fn, *args, **kwargs))
+        finally:
+            self._release()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Executor-style submit for worker threads: waits for a free slot, counted like run()."""
+        self._acquire(wait=True)
+        try:
+            future = self.pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def stats(self) -> Dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._inflight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+io_pool = BoundedExecutor("io", IO_WORKERS, IO_QUEUE)
+cpu_pool = BoundedExecutor("cpu", CPU_WORKERS, CPU_QUEUE, processes=True)
@@ -1,34 +1,143 @@
 # run_all.py
+import argparse
+import json
 import subprocess
 import time
 import sys
 import os
+import tempfile
+import urllib.error
+import urllib.request
+from multiprocessing.connection import Client
 
 # Paths to your apps
-FASTAPI_FILE ="Dice-Project\\utils\\kbc-ingestion.py"
-STREAMLIT_FILE ="Dice-Project\\app.py"
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+FASTAPI_FILE = os.path.join(ROOT_DIR, "dice_project", "utils", "kbc-ingestion.py")
+STREAMLIT_FILE = os.path.join(ROOT_DIR, "dice_project", "app.py")
+PROJECT_DIR = os.path.join(ROOT_DIR, "dice_project")
 
-def run_fastapi():
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET", os.path.join(tempfile.gettempdir(), f"dice-embeddings-{os.getuid()}.sock"))
+
+READY_URL = os.getenv("READY_URL", "http://localhost:8000/ready")
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "120"))  # seconds
+READY_POLL_INTERVAL = 0.5
+
+def run_embedding_service():
+    """Run the shared embedding model in its own process"""
+    print(f"[INFO] Starting embedding service on {EMBEDDING_SOCKET}...")
+    return subprocess.Popen(
+        [sys.executable, "-m", "utils.embedding_service", "--socket", EMBEDDING_SOCKET],
+        cwd=PROJECT_DIR
+    )
+
+def wait_for_embedding_service(process, timeout=READY_TIMEOUT):
+    """Wait until the embedding service has loaded its model and answers on the socket"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            print(f"[ERROR] Embedding service exited with code {process.returncode}")
+            return False
+        try:
+            conn = Client(EMBEDDING_SOCKET, family="AF_UNIX")
+            conn.send({"op": "stats"})
+            conn.recv()
+            conn.close()
+            print(f"[INFO] Embedding service ready after {time.perf_counter() - start:.1f}s")
+            return True
+        except (OSError, EOFError):
+            time.sleep(READY_POLL_INTERVAL)
+    print(f"[ERROR] Embedding service not ready after {timeout:.0f}s")
+    return False
+
+def run_fastapi(workers=1, env=None):
     """Run FastAPI app with uvicorn"""
-    print("[INFO] Starting FastAPI...")
+    print(f"[INFO] Starting FastAPI with {workers} worker(s)...")
 
     # Change working directory to the folder containing your FastAPI file
     fastapi_dir = os.path.dirname(FASTAPI_FILE)
     fastapi_module = os.path.splitext(os.path.basename(FASTAPI_FILE))[0]  # filename without .py
 
-    subprocess.Popen(
-        [sys.executable, "-m", "uvicorn", f"{fastapi_module}:app", "--host", "0.0.0.0", "--port", "8000"],
-        cwd=fastapi_dir  # set working directory
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{fastapi_module}:app", "--host", "0.0.0.0", "--port", "8000",
+         "--workers", str(workers)],
+        cwd=fastapi_dir,  # set working directory
+        env=env
     )
     print("[INFO] FastAPI running on http://localhost:8000")
+    return process
 
-def run_streamlit():
+def wait_until_ready(process, url=READY_URL, timeout=READY_TIMEOUT):
+    """Poll the readiness endpoint until the models are warm; False on timeout or exit"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            print(f"[ERROR] FastAPI exited with code {process.returncode}")
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                report = json.load(response)
+            components = {name: c["load_ms"] for name, c in report["components"].items()}
+            print(f"[INFO] FastAPI ready after {time.perf_counter() - start:.1f}s, load times (ms): {components}")
+            return True
+        except urllib.error.HTTPError as e:
+            # 503 while warming up; a failed warm-up will not recover on its own.
+            # Errors from a proxy or the server itself may not have a JSON body.
+            try:
+                report = json.load(e)
+            except ValueError:
+                report = None
+            if isinstance(report, dict) and report.get("warm_up", {}).get("status") == "failed":
+                print(f"[ERROR] FastAPI warm-up failed: {report['warm_up']['error']}")
+                return False
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass  # not accepting connections yet
+        time.sleep(READY_POLL_INTERVAL)
+    print(f"[ERROR] FastAPI not ready after {timeout:.0f}s")
+    return False
+
+def run_streamlit(env=None):
     """Run Streamlit app"""
     print("[INFO] Starting Streamlit...")
-    subprocess.Popen(["streamlit", "run", STREAMLIT_FILE])
+    subprocess.Popen(["streamlit", "run", STREAMLIT_FILE], env=env)
     print("[INFO] Streamlit running")
 
 if __name__ == "__main__":
-    run_fastapi()
-    time.sleep(6)  # wait a few seconds to ensure FastAPI is up
-    run_streamlit()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Start the API and the Streamlit UI")
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="uvicorn worker processes")
+    parser.add_argument("--embedding-service", action="store_true",
+                        help="Share one embedding model across processes (always on with --workers > 1)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    processes = []
+    if args.workers > 1 or args.embedding_service:
+        if args.workers > 1 and os.getenv("VECTOR_BACKEND", "pinecone") != "pinecone" and os.name == "nt":
+            # Workers share the local index through a file lock (fcntl), which Windows lacks
+            print("[WARN] On Windows the local vector backends are single-process; use VECTOR_BACKEND=pinecone "
+                  "with several workers")
+        service_process = run_embedding_service()
+        processes.append(service_process)
+        if not wait_for_embedding_service(service_process):
+            service_process.terminate()
+            sys.exit(1)
+        # API workers and the UI's pre-router embed through the service instead of loading the model
+        env["EMBEDDING_SOCKET"] = EMBEDDING_SOCKET
+
+    api_env = env
+    if args.workers > 1:
+        # Each worker writes its metrics here so /metrics on the shared port reports all of them
+        metrics_dir = os.getenv("METRICS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="dice-metrics-")
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".json"):
+                os.remove(os.path.join(metrics_dir, name))  # counters of a previous run
+        api_env = dict(env, METRICS_MULTIPROC_DIR=metrics_dir)
+
+    fastapi_process = run_fastapi(args.workers, api_env)
+    processes.append(fastapi_process)
+    if not wait_until_ready(fastapi_process):
+        for process in processes:
+            process.terminate()
+        sys.exit(1)
+    run_streamlit(env)